@@ -3,15 +3,139 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from models.state import AgentState
 from utils.llm_factory import initialize_llm
 from prompts.templates import *
+from config import NARRATION_VOICE, NARRATION_CONCURRENCY, NARRATION_RATE, NARRATION_PITCH, NARRATION_MODE
 import asyncio
 import edge_tts
 import os
+import time
+import uuid
 
 
-async def generate_narration_audio(text: str, output_path: str, voice: str = "en-GB-RyanNeural"):
-    """Generate audio narration using Edge TTS."""
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(output_path)
+async def generate_narration_audio(text: str, output_path: str, voice: str = NARRATION_VOICE,
+                                   rate: str = NARRATION_RATE, pitch: str = NARRATION_PITCH):
+    """Generate audio narration using Edge TTS, streaming chunks straight to disk."""
+    communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+    partial_path = f"{output_path}.part"
+    try:
+        with open(partial_path, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+        # Only complete files appear under the final name
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+async def synthesize_narrations(jobs, concurrency: int = NARRATION_CONCURRENCY):
+    """Synthesize (text, output_path) jobs concurrently on one loop.
+
+    Returns one entry per job: the elapsed seconds, or the exception that job raised.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(text, output_path):
+        async with semaphore:
+            started = time.perf_counter()
+            await generate_narration_audio(text, output_path)
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(_one(text, path) for text, path in jobs), return_exceptions=True)
+
+
+async def generate_narration_single_pass(texts, output_path: str, voice: str = NARRATION_VOICE,
+                                         rate: str = NARRATION_RATE, pitch: str = NARRATION_PITCH):
+    """Synthesize several narration lines as one Edge TTS stream.
+
+    Returns the stream's word boundaries as (offset_seconds, duration_seconds, word).
+    """
+    script = " ".join(texts)
+    try:
+        communicate = edge_tts.Communicate(script, voice, rate=rate, pitch=pitch, boundary="WordBoundary")
+    except TypeError:
+        # Older edge-tts releases always emit word boundaries and have no boundary option
+        communicate = edge_tts.Communicate(script, voice, rate=rate, pitch=pitch)
+
+    boundaries = []
+    partial_path = f"{output_path}.part"
+    try:
+        with open(partial_path, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    # Offsets are in 100 ns ticks
+                    boundaries.append((chunk["offset"] / 1e7, chunk["duration"] / 1e7, chunk["text"]))
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return boundaries
+
+
+def shot_time_ranges(texts, boundaries):
+    """Map word boundaries back onto the lines they were spoken from.
+
+    Returns a (start, end) cut range per line, with cuts placed in the pause between the
+    last word of one line and the first word of the next (the last range ends at None,
+    the end of the file), and the time at which speech ends.
+    """
+    script = " ".join(texts)
+    line_ends, position = [], 0
+    for text in texts:
+        position += len(text)
+        line_ends.append(position)
+        position += 1
+
+    first_word = [None] * len(texts)
+    last_word = [None] * len(texts)
+    cursor, line = 0, 0
+    for offset, duration, word in boundaries:
+        index = script.find(word, cursor)
+        if index < 0:
+            continue
+        cursor = index + len(word)
+        while line < len(texts) - 1 and index >= line_ends[line]:
+            line += 1
+        if first_word[line] is None:
+            first_word[line] = offset
+        last_word[line] = offset + duration
+
+    if None in first_word:
+        missing = [i + 1 for i, offset in enumerate(first_word) if offset is None]
+        raise ValueError(f"No word boundaries for line(s) {missing}")
+
+    cuts = [(last_word[i] + first_word[i + 1]) / 2 for i in range(len(texts) - 1)]
+    starts = [0.0] + cuts
+    ends = cuts + [None]
+    return list(zip(starts, ends)), last_word[-1]
+
+
+def _narrate_single_pass(pending, run_id):
+    """Narrate pending shots in one TTS stream and cut it per shot without re-encoding.
+
+    Returns the per-shot results (elapsed seconds) and the timing map.
+    """
+    from utils.media import split_audio
+
+    texts = [text for _, text, _, _ in pending]
+    script_path = f"narrations/{run_id}_script_narration.mp3"
+    started = time.perf_counter()
+    try:
+        boundaries = asyncio.run(generate_narration_single_pass(texts, script_path))
+        ranges, speech_end = shot_time_ranges(texts, boundaries)
+        split_audio(script_path, [(start, end, path) for (start, end), (_, _, _, path) in zip(ranges, pending)])
+    finally:
+        if os.path.exists(script_path):
+            os.remove(script_path)
+    elapsed = time.perf_counter() - started
+
+    timing = [
+        {"shot_number": i + 1, "start": round(start, 3), "end": round(end if end is not None else speech_end, 3)}
+        for (i, _, _, _), (start, end) in zip(pending, ranges)
+    ]
+    return [elapsed] * len(pending), timing
 
 
 def narration_generation_node(state: AgentState) -> AgentState:
@@ -24,24 +148,84 @@ def narration_generation_node(state: AgentState) -> AgentState:
         state["progress_log"] += "ERROR: Missing shots.\n"
         return state
 
+    from utils.tts_cache import tts_cache_key, get_cached_narration, cache_narration, get_tts_cache_stats, NARRATION_FORMAT
+    from utils.media import FFMPEG_AVAILABLE
+
+    single_pass = NARRATION_MODE == "single_pass" and FFMPEG_AVAILABLE
+    # Slices of a single-pass stream sound different from lines synthesized alone
+    audio_format = f"{NARRATION_FORMAT};single-pass" if single_pass else NARRATION_FORMAT
+
+    # Each run writes to its own temp names; the artifact store dedupes by content
+    run_id = state.get("run_id") or uuid.uuid4().hex
+    state["run_id"] = run_id
     os.makedirs("narrations", exist_ok=True)
 
     try:
+        pending = []
         for i, shot in enumerate(shots):
             narration_text = shot.get("narration", "")
             if not narration_text:
                 state["messages"].append(f"Warning: Shot {i + 1} has no narration text.")
+                shot.pop("audio_path", None)
                 continue
 
-            audio_path = f"narrations/shot_{i + 1}_narration.mp3"
-
-            # Run async function in sync context
-            asyncio.run(generate_narration_audio(narration_text, audio_path))
-
-            # Store audio path in shot data
-            shot["audio_path"] = audio_path
+            # Audio already linked into this run (catalog precompute) is kept only if it was
+            # made from this text: refinement rewrites narration but carries audio_path along
+            key = tts_cache_key(narration_text, audio_format=audio_format)
+            if shot.get("narration_key") == key and shot.get("audio_path") and os.path.exists(shot["audio_path"]):
+                continue
 
-        state["messages"].append(f"✅ Generated {len(shots)} narration audio files.")
+            # Lines synthesized before (catalog, re-runs, unchanged shots after a refinement) cost no TTS call
+            cached_path = get_cached_narration(key, run_id, f"shot_{i + 1}_narration.mp3")
+            if cached_path:
+                shot["audio_path"] = cached_path
+                shot["narration_key"] = key
+                continue
+            shot.pop("audio_path", None)
+
+            pending.append((i, narration_text, key, f"narrations/{run_id}_shot_{i + 1}_narration.mp3"))
+
+        started = time.perf_counter()
+        results = None
+        if single_pass and len(pending) > 1:
+            try:
+                results, timing = _narrate_single_pass(pending, run_id)
+                state["narration_timing"] = timing
+                # Shot assembly holds a clip's last frame until its narration span ends
+                for span in timing:
+                    shots[span["shot_number"] - 1]["narration_seconds"] = round(span["end"] - span["start"], 3)
+                round_trips = 1
+            except Exception as e:
+                state["messages"].append(f"Warning: Single-pass narration failed ({e}); narrating shot by shot.")
+
+        if results is None:
+            # All shots on one event loop; the stage takes about as long as the slowest shot
+            results = asyncio.run(synthesize_narrations([(text, path) for _, text, _, path in pending]))
+            round_trips = len(pending)
+        elapsed = time.perf_counter() - started
+
+        failed = 0
+        for (i, _, key, temp_path), result in zip(pending, results):
+            if isinstance(result, Exception):
+                # One failed shot keeps its missing audio; the others are still stored
+                failed += 1
+                state["messages"].append(f"Warning: Narration for shot {i + 1} failed: {result}")
+                continue
+            shots[i]["audio_path"] = cache_narration(key, temp_path, run_id, f"shot_{i + 1}_narration.mp3")
+            shots[i]["narration_key"] = key
+
+        timings = [result for result in results if not isinstance(result, Exception)]
+        if timings:
+            state["progress_log"] += (
+                f"Narrated {len(timings)} shots in {elapsed:.1f}s with {round_trips} TTS round trip(s).\n"
+            )
+
+        cache_stats = get_tts_cache_stats()
+        state["progress_log"] += (
+            f"Narration cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_ratio']:.0%} hit ratio).\n"
+        )
+        state["messages"].append(f"✅ Generated {len(pending) - failed} narration audio files.")
         state["progress_log"] += "Narration generation complete.\n"
 
     except Exception as e:
@@ -137,6 +321,7 @@ def extract_landmark_name_node(state: AgentState) -> AgentState:
         else:
             state["messages"].append(f"Landmark name extracted: {landmark_name}")
             state["progress_log"] += f"Landmark name found: {landmark_name}\n"
+            _serve_catalog_artifacts(state, landmark_name)
 
     except Exception as e:
         state["messages"].append(f"Landmark name extraction failed: {str(e)}")
@@ -147,80 +332,94 @@ def extract_landmark_name_node(state: AgentState) -> AgentState:
     return state
 
 
+def _serve_catalog_artifacts(state: AgentState, landmark_name: str):
+    """Fill story and shots from the offline precompute when the landmark is in the catalog."""
+    try:
+        from utils.catalog_artifacts import resolve_catalog_landmark, load_precomputed
+
+        resolved = resolve_catalog_landmark(landmark_name)
+        if not resolved:
+            return
+        landmark_id, catalog_name = resolved
+
+        state["run_id"] = state.get("run_id") or uuid.uuid4().hex
+        precomputed = load_precomputed(landmark_id, state["run_id"])
+        if not precomputed:
+            return
+
+        state["created_telling_story"] = precomputed["created_telling_story"]
+        state["shots_description"] = precomputed["shots_description"]
+        state["catalog_hit"] = True
+        state["messages"].append(f"Using precomputed story and shots for {catalog_name}.")
+        state["progress_log"] += f"Catalog hit: {catalog_name}\n"
+
+    except Exception as e:
+        print(f"Catalog lookup failed: {e}")
+
+
+# Landmark names and types the image analysis is matched against (English only)
+LANDMARK_KEYWORDS = [
+    # English landmark names and types
+    "pyramid", "giza", "sphinx", "temple", "luxor", "karnak", "abu simbel",
+    "philae", "valley of kings", "citadel", "qaitbay", "mosque", "muhammad ali",
+    "ibn tulun", "al-azhar", "alexandria", "bibliotheca", "catacombs", "montaza",
+    "citadel of saladin", "cairo tower", "egyptian museum", "khan el-khalili",
+    "old cairo", "coptic cairo", "high dam", "aswan dam", "unfinished obelisk",
+    "nubian museum", "elephantine", "aga khan", "kom ombo", "edfu", "kalabsha",
+    "beit el-wali", "dakka", "maharraqa", "souk", "corniche", "nasser lake",
+    "sehel", "fatimid cemetery", "pompey's pillar", "ras el-tin", "abu al-abbas",
+    "kom el-dikka", "roman theater", "stanley bridge", "opera house",
+    "aquarium", "shallalat gardens", "mamoura beach", "agami", "sidi abdel rahman",
+    "marsa matruh", "cleopatra beach", "almaza bay", "mount sinai",
+    "saint catherine", "sharm el sheikh", "ras muhammad", "dahab", "blue hole",
+    "nuweiba", "taba", "hurghada", "giftun island", "el gouna", "soma bay",
+    "safaga", "quseir", "marsa alam", "shalateen", "halayeb", "zafarana",
+    "siwa oasis", "oracle temple", "cleopatra pool", "shali fortress", "bahariya",
+    "white desert", "black desert", "crystal mountain", "farafra", "dakhla",
+    "kharga", "hibis temple", "qasr village", "mut", "bagawat", "nadura",
+    "labakha", "deir al-hagar", "dush", "roman necropolis", "port said lighthouse",
+    "ismailia museum", "bubastis", "damietta", "natrun", "macarius",
+    "mit ghamr", "tanta", "mansoura", "zagazig", "banha", "qalyub",
+    "shibin", "esna", "khnum temple", "silsila", "sohag", "minya",
+    "assiut", "qena", "paul's monastery", "coloured canyon", "fjord bay",
+    "mahmya", "gawhara palace", "ras el bar", "manzala", "degla",
+    "rayan", "faiyum", "meidum", "hawara", "lahun", "karanis",
+    "madi", "qarun", "bernice", "hormos", "soknopaiou", "tebtunis",
+]
+
+# Additional descriptive keywords; any analysis uses these, so they count for less
+DESCRIPTIVE_KEYWORDS = [
+    "ancient", "historical", "pharaonic", "roman", "islamic", "coptic",
+    "museum", "palace", "fortress", "castle", "tower", "bridge",
+    "garden", "park", "beach", "desert", "oasis", "mountain",
+    "valley", "river", "lake", "island", "bay", "sea",
+    "monastery", "church", "cathedral"
+]
+DESCRIPTIVE_KEYWORD_WEIGHT = 0.25
+
+
 def find_similar_landmark_in_db(image_analysis: str) -> str:
     """Find similar landmark in database based on description keywords."""
     try:
         from utils.recommendation import load_landmarks
+        from utils.keyword_matcher import get_keyword_index
 
         # Load landmarks data
         landmarks_df = load_landmarks()
         if landmarks_df.empty:
             return "Unknown"
 
-        # Extract keywords from image analysis
-        analysis_lower = image_analysis.lower()
-
-        # Expanded keywords list - English only
-        keywords = [
-            # English landmark names and types
-            "pyramid", "giza", "sphinx", "temple", "luxor", "karnak", "abu simbel",
-            "philae", "valley of kings", "citadel", "qaitbay", "mosque", "muhammad ali",
-            "ibn tulun", "al-azhar", "alexandria", "bibliotheca", "catacombs", "montaza",
-            "citadel of saladin", "cairo tower", "egyptian museum", "khan el-khalili",
-            "old cairo", "coptic cairo", "high dam", "aswan dam", "unfinished obelisk",
-            "nubian museum", "elephantine", "aga khan", "kom ombo", "edfu", "kalabsha",
-            "beit el-wali", "dakka", "maharraqa", "souk", "corniche", "nasser lake",
-            "sehel", "fatimid cemetery", "pompey's pillar", "ras el-tin", "abu al-abbas",
-            "kom el-dikka", "roman theater", "stanley bridge", "opera house",
-            "aquarium", "shallalat gardens", "mamoura beach", "agami", "sidi abdel rahman",
-            "marsa matruh", "cleopatra beach", "almaza bay", "mount sinai",
-            "saint catherine", "sharm el sheikh", "ras muhammad", "dahab", "blue hole",
-            "nuweiba", "taba", "hurghada", "giftun island", "el gouna", "soma bay",
-            "safaga", "quseir", "marsa alam", "shalateen", "halayeb", "zafarana",
-            "siwa oasis", "oracle temple", "cleopatra pool", "shali fortress", "bahariya",
-            "white desert", "black desert", "crystal mountain", "farafra", "dakhla",
-            "kharga", "hibis temple", "qasr village", "mut", "bagawat", "nadura",
-            "labakha", "deir al-hagar", "dush", "roman necropolis", "port said lighthouse",
-            "ismailia museum", "bubastis", "damietta", "natrun", "macarius",
-            "mit ghamr", "tanta", "mansoura", "zagazig", "banha", "qalyub",
-            "shibin", "esna", "khnum temple", "silsila", "sohag", "minya",
-            "assiut", "qena", "paul's monastery", "coloured canyon", "fjord bay",
-            "mahmya", "gawhara palace", "ras el bar", "manzala", "degla",
-            "rayan", "faiyum", "meidum", "hawara", "lahun", "karanis",
-            "madi", "qarun", "bernice", "hormos", "soknopaiou", "tebtunis",
-            # Additional descriptive keywords
-            "ancient", "historical", "pharaonic", "roman", "islamic", "coptic",
-            "museum", "palace", "fortress", "castle", "tower", "bridge",
-            "garden", "park", "beach", "desert", "oasis", "mountain",
-            "valley", "river", "lake", "island", "bay", "sea",
-            "monastery", "church", "cathedral"
-        ]
-
-        # Find matching landmarks with scoring
-        matches = []
-        for _, landmark in landmarks_df.iterrows():
-            landmark_name = landmark.get('name', '').lower()
-            landmark_category = landmark.get('category', '').lower()
-            score = 0
-
-            # Check for exact keyword matches
-            for keyword in keywords:
-                # Direct keyword matching
-                if keyword in landmark_name or keyword in landmark_category:
-                    score += 3  # Higher score for direct matches
-
-                # Check if keyword appears in analysis
-                if keyword in analysis_lower:
-                    score += 1  # Lower score for analysis matches
-
-            if score > 0:
-                matches.append((landmark.get('name', 'Unknown'), score))
+        # One automaton pass over the analysis, joined against the catalog's keyword postings
+        index = get_keyword_index(
+            landmarks_df,
+            LANDMARK_KEYWORDS + DESCRIPTIVE_KEYWORDS,
+            {keyword: DESCRIPTIVE_KEYWORD_WEIGHT for keyword in DESCRIPTIVE_KEYWORDS},
+        )
+        matches = index.rank(image_analysis, limit=1)
 
         if matches:
-            # Sort by score (highest first) and return the best match
-            matches.sort(key=lambda x: x[1], reverse=True)
-            best_match = matches[0][0]
-            print(f"DEBUG: Keyword-based match found: '{best_match}' with score {matches[0][1]}")
+            _, best_match, score = matches[0]
+            print(f"DEBUG: Keyword-based match found: '{best_match}' with score {score:.2f}")
             return best_match
 
         print("DEBUG: No keyword matches found in database")
@@ -241,6 +440,10 @@ def story_telling_node(state: AgentState) -> AgentState:
         state["progress_log"] += "ERROR: Missing image analysis.\n"
         return state
 
+    if state.get("catalog_hit") and state.get("created_telling_story"):
+        state["progress_log"] += "Story served from catalog precompute.\n"
+        return state
+
     api_provider = state.get("api_provider", "openrouter")
 
     try:
@@ -282,6 +485,10 @@ def shots_creation_node(state: AgentState) -> AgentState:
         state["progress_log"] += "ERROR: Missing story content.\n"
         return state
 
+    if state.get("catalog_hit") and state.get("shots_description"):
+        state["progress_log"] += "Shots served from catalog precompute.\n"
+        return state
+
     try:
         llm = initialize_llm()
         prompt = SHOTS_CREATION_PROMPT.format(
@@ -430,7 +637,8 @@ def video_generation_node(state: AgentState) -> AgentState:
             landmark_name=landmark_name,
             prompt=video_prompt,
             story_type="educational",
-            force_regenerate=False
+            force_regenerate=False,
+            run_id=state.get("run_id")
         )
 
         if was_cached:
@@ -443,6 +651,18 @@ def video_generation_node(state: AgentState) -> AgentState:
         state["generated_video_path"] = video_path
         state["video_cached"] = was_cached
 
+        # Poster frame is encoded in the media worker pool; the node waits for it so the UI has a poster
+        from utils.media import FFMPEG_AVAILABLE, derived_path
+        if FFMPEG_AVAILABLE and video_path:
+            from utils.media_worker import submit_media_task
+            try:
+                thumbnail_path = derived_path(video_path, "_poster.jpg")
+                if not os.path.exists(thumbnail_path):
+                    submit_media_task("thumbnail", video_path, thumbnail_path).result()
+                state["video_thumbnail_path"] = thumbnail_path
+            except Exception as e:
+                print(f"[WARN] Thumbnail extraction failed: {e}")
+
     except Exception as e:
         state["messages"].append(f"❌ Video generation failed: {str(e)}")
         state["progress_log"] += f"ERROR during video generation: {str(e)}\n"
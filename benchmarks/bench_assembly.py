@@ -0,0 +1,92 @@
+"""
+Benchmark full-film assembly on a synthetic 5-shot film.
+
+Compares the moviepy compose + libx264 re-encode path with the ffmpeg concat
+demuxer (stream copy), with and without transitions. Each method runs in its own
+process so peak RSS (including ffmpeg children) is measured independently.
+
+Usage: python benchmarks/bench_assembly.py [--shots 5] [--seconds 8]
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.media import FFMPEG_AVAILABLE, FFMPEG_PATH, concat_videos, concat_videos_moviepy
+
+
+def make_shot(path, seconds, hue):
+    subprocess.run([
+        FFMPEG_PATH, "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=24:duration={seconds},hue=h={hue}",
+        "-f", "lavfi", "-i", f"sine=frequency={220 + hue}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path
+    ], check=True)
+
+
+def run_moviepy(files, output_path):
+    concat_videos_moviepy(files, output_path)
+
+
+def run_copy(files, output_path):
+    concat_videos(files, output_path)
+
+
+def run_transitions(files, output_path):
+    concat_videos(files, output_path, transitions=["Fade in", "Cut", "Dissolve", "Cut", "Fade to black"])
+
+
+def _measure(method, files, output_path, queue):
+    start = time.perf_counter()
+    try:
+        method(files, output_path)
+        error = None
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    queue.put((elapsed, self_rss, child_rss, error))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=5)
+    parser.add_argument("--seconds", type=int, default=8)
+    args = parser.parse_args()
+
+    if not FFMPEG_AVAILABLE:
+        print("ffmpeg/ffprobe not found on PATH - cannot run benchmark.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_assembly_")
+    files = []
+    for i in range(args.shots):
+        path = os.path.join(work_dir, f"shot_{i + 1}.mp4")
+        make_shot(path, args.seconds, i * 40)
+        files.append(path)
+
+    print(f"{args.shots} shots x {args.seconds}s, 1280x720@24 h264/aac\n")
+    print(f"{'method':<22}{'time (s)':>10}{'python RSS (MB)':>18}{'ffmpeg RSS (MB)':>18}")
+    for name, method in [("moviepy re-encode", run_moviepy), ("concat stream copy", run_copy), ("concat + transitions", run_transitions)]:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_measure, args=(method, files, os.path.join(work_dir, f"{name.split()[0]}_final.mp4"), queue)
+        )
+        process.start()
+        elapsed, self_rss, child_rss, error = queue.get()
+        process.join()
+        if error:
+            print(f"{name:<22}  failed: {error}")
+        else:
+            print(f"{name:<22}{elapsed:>10.2f}{self_rss:>18.1f}{child_rss:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark concurrent video cache lookups: sync PyMongo in a thread pool vs the async layer.
+
+Inserts --entries cached_videos documents under a unique "bench-" landmark prefix (removed
+afterwards), then runs --lookups get_cached_video calls at each concurrency level, 90%
+hits and 10% misses. Sync lookups use utils.database from a thread pool of that size;
+async lookups use utils.async_database on one event loop with a semaphore of that size.
+Reports throughput and p50/p99 latency.
+
+Usage: python benchmarks/bench_async_cache.py [--entries 10000] [--lookups 5000] [--concurrency 1 16 64 256]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from utils import async_database
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def _run_sync(keys, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(lambda key: _timed(database.get_cached_video, *key), keys))
+        return time.perf_counter() - start, latencies
+
+
+async def _run_async(keys, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(key):
+        async with semaphore:
+            start = time.perf_counter()
+            await async_database.get_cached_video(*key)
+            return time.perf_counter() - start
+
+    await async_database.get_cached_video(*keys[0])  # open the pool
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_one(key) for key in keys))
+    return time.perf_counter() - start, latencies
+
+
+def _row(mode, concurrency, elapsed, latencies):
+    latencies = np.asarray(latencies) * 1000
+    print(f"{mode:>6}{concurrency:>13}{len(latencies) / elapsed:>14,.0f}"
+          f"{np.percentile(latencies, 50):>11.2f}{np.percentile(latencies, 99):>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    args = parser.parse_args()
+
+    landmarks_collection, videos_collection, db = database.connect_to_db()
+    if videos_collection is None:
+        sys.exit("MongoDB is not reachable")
+    if async_database.AsyncMongoClient is None:
+        sys.exit("No async MongoDB driver installed (pymongo>=4.10 or motor)")
+
+    prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+    rng = random.Random(7)
+    for start in range(0, args.entries, 1000):
+        videos_collection.insert_many([
+            {"landmark_name": f"{prefix}{i}", "story_type": "default", "video_path": f"/tmp/{i}.mp4", "metadata": {}}
+            for i in range(start, min(start + 1000, args.entries))
+        ])
+
+    print(f"Async driver: {async_database.ASYNC_DRIVER}")
+    print(f"{'mode':>6}{'concurrency':>13}{'lookups/s':>14}{'p50 (ms)':>11}{'p99 (ms)':>11}")
+    try:
+        for concurrency in args.concurrency:
+            keys = [
+                (f"{prefix}{rng.randrange(args.entries) if rng.random() < 0.9 else 'missing'}", "default")
+                for _ in range(args.lookups)
+            ]
+            _row("sync", concurrency, *_run_sync(keys, concurrency))
+
+            async def _async_pass():
+                try:
+                    return await _run_async(keys, concurrency)
+                finally:
+                    await async_database.close_async_client()
+
+            _row("async", concurrency, *asyncio.run(_async_pass()))
+    finally:
+        videos_collection.delete_many({"landmark_name": {"$regex": f"^{prefix}"}})
+
+
+if __name__ == "__main__":
+    main()
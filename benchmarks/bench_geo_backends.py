@@ -0,0 +1,100 @@
+"""
+Benchmark the nearest-landmark backends (utils.nearby) against a local mongod.
+
+Synthetic landmarks are scattered over Egypt's bounding box and written to a scratch
+database with GeoJSON locations and the 2dsphere index. For each size it reports mean
+latency of k-NN, k-NN within one category and radius queries for the in-process grid
+index and for MongoDB $geoNear, plus how often the two return the same k-NN set.
+The scratch database is dropped afterwards. With --backends memory no mongod is needed.
+
+Usage: python benchmarks/bench_geo_backends.py [--uri mongodb://localhost:27017] [--sizes 1000 100000]
+                                               [--backends memory mongo]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.nearby import InProcessBackend, MongoBackend
+from utils.database import ensure_landmark_geo_index
+
+CATEGORIES = ["Historical", "Museum", "Religious", "Nature", "Modern", "Market"]
+
+
+def _mean_us(fn, origins):
+    start = time.perf_counter()
+    results = [fn(lat, lon) for lat, lon in origins]
+    return (time.perf_counter() - start) / len(origins) * 1e6, results
+
+
+def _load(collection, landmarks_df, batch=10_000):
+    collection.drop()
+    records = landmarks_df.to_dict("records")
+    for record in records:
+        record["location"] = {"type": "Point", "coordinates": [record["longitude"], record["latitude"]]}
+    for start in range(0, len(records), batch):
+        collection.insert_many(records[start:start + batch], ordered=False)
+    ensure_landmark_geo_index(collection)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="landmark_bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--backends", nargs="+", choices=["memory", "mongo"], default=["memory", "mongo"])
+    args = parser.parse_args()
+
+    client = collection = None
+    if "mongo" in args.backends:
+        from pymongo import MongoClient
+
+        client = MongoClient(args.uri)
+        collection = client[args.db]["landmarks"]
+    rng = np.random.default_rng(42)
+
+    print(f"{'landmarks':>10}{'backend':>9}{'knn (us)':>11}{'knn+cat (us)':>14}{'radius (us)':>13}{'same knn':>10}")
+    try:
+        for n in args.sizes:
+            landmarks_df = pd.DataFrame({
+                "name": [f"Landmark {i}" for i in range(n)],
+                "category": rng.choice(CATEGORIES, n),
+                "latitude": rng.uniform(22.0, 31.7, n),
+                "longitude": rng.uniform(24.7, 36.9, n),
+            })
+            if collection is not None:
+                _load(collection, landmarks_df)
+            origins = list(zip(rng.uniform(22.0, 31.7, args.queries), rng.uniform(24.7, 36.9, args.queries)))
+
+            backends = []
+            if "memory" in args.backends:
+                backends.append(InProcessBackend(landmarks_df))
+            if collection is not None:
+                backends.append(MongoBackend(collection))
+            knn_names = []
+            for backend in backends:
+                backend.knn(*origins[0], args.k)  # warm up (index build / connection)
+                knn, results = _mean_us(lambda a, b: backend.knn(a, b, args.k), origins)
+                knn_names.append([set(r["name"]) for r in results])
+                by_category, _ = _mean_us(lambda a, b: backend.knn(a, b, args.k, category="museum"), origins)
+                radius, _ = _mean_us(lambda a, b: backend.within(a, b, args.radius_km), origins)
+                same = "-"
+                if len(knn_names) == 2:
+                    same = f"{np.mean([x == y for x, y in zip(*knn_names)]):.0%}"
+                print(f"{n:>10}{backend.name:>9}{knn:>11.0f}{by_category:>14.0f}{radius:>13.0f}{same:>10}")
+    finally:
+        if client is not None:
+            client.drop_database(args.db)
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark landmark name resolution (utils.name_index) at 1e3 to 1e6 names.
+
+Synthetic names mix random "proper" words with common words ("temple", "mosque", "of",
+"the"...). Queries are existing names with a typo, a dropped word or a generic prefix.
+Reports build time and mean lookup latency, plus the difflib loop the matcher replaced
+(only at the smallest size).
+
+Usage: python benchmarks/bench_name_index.py [--queries 500] [--sizes 1000 100000 1000000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from difflib import SequenceMatcher
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.name_index import NameIndex
+
+ONSETS = ["b", "d", "f", "g", "h", "k", "kh", "l", "m", "n", "q", "r", "s", "sh", "t", "w", "y", "z", "ph", "th"]
+VOWELS = ["a", "e", "i", "o", "u", "aa", "ou", "ei"]
+CODAS = ["", "", "n", "r", "s", "k", "l", "m", "t"]
+COMMON = ["temple", "mosque", "museum", "palace", "of", "the", "great", "old", "church", "citadel"]
+
+
+def _word(rng):
+    syllables = (rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS) for _ in range(rng.randint(2, 3)))
+    return "".join(syllables).capitalize()
+
+
+def _name(rng):
+    words = [_word(rng) for _ in range(rng.randint(1, 2))]
+    if rng.random() < 0.7:
+        words.insert(rng.randint(0, len(words)), rng.choice(COMMON))
+    return " ".join(words)
+
+
+def _query(rng, name):
+    kind = rng.random()
+    if kind < 0.4 and len(name) > 4:
+        i = rng.randrange(1, len(name) - 2)
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]  # transposition typo
+    if kind < 0.7:
+        return f"the great {name}"
+    return name.split()[-1] if " " in name else name
+
+
+def _difflib_best(query, names):
+    best = (0.0, None)
+    for name in names:
+        best = max(best, (SequenceMatcher(None, query.lower(), name.lower()).ratio(), name))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'names':>10}{'build (s)':>11}{'lookup (us)':>13}{'resolved':>10}{'difflib (us)':>14}")
+    for size in args.sizes:
+        names = [_name(rng) for _ in range(size)]
+        start = time.perf_counter()
+        index = NameIndex(names)
+        build = time.perf_counter() - start
+
+        targets = [rng.randrange(size) for _ in range(args.queries)]
+        queries = [_query(rng, names[t]) for t in targets]
+        index.search(names[0])  # posting arrays are materialized on first use
+        start = time.perf_counter()
+        results = [index.search(q, limit=1, min_score=0.6) for q in queries]
+        lookup = (time.perf_counter() - start) / len(queries)
+        resolved = sum(1 for r in results if r) / len(queries)
+
+        difflib_us = "-"
+        if size <= 1_000:
+            start = time.perf_counter()
+            for q in queries[:50]:
+                _difflib_best(q, names)
+            difflib_us = f"{(time.perf_counter() - start) / 50 * 1e6:.0f}"
+
+        print(f"{size:>10}{build:>11.2f}{lookup * 1e6:>13.1f}{resolved:>10.0%}{difflib_us:>14}")
+
+
+if __name__ == "__main__":
+    main()
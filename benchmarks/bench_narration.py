@@ -0,0 +1,72 @@
+"""
+Compare per-shot and single-pass narration (agents.nodes).
+
+Per-shot mode opens one Edge TTS stream per line (concurrently); single-pass mode speaks the
+whole script in one stream and cuts it per shot by stream copy. Reports TTS round trips and
+wall-clock time for each. Needs network access to Edge TTS and ffmpeg for the cut.
+
+Usage: python benchmarks/bench_narration.py [--shots 5] [--repeat 3]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.media import FFMPEG_AVAILABLE, split_audio
+from agents.nodes import synthesize_narrations, generate_narration_single_pass, shot_time_ranges
+
+LINES = [
+    "Dawn breaks over the Giza plateau, and the great pyramid catches the first light.",
+    "Four and a half thousand years ago, tens of thousands of workers raised these stones.",
+    "Each block was quarried, dragged and set with a precision that still puzzles engineers.",
+    "Inside, narrow passages climb towards the king's chamber, lined with red granite.",
+    "As the sun sets, the monument's shadow stretches across the desert sands once more.",
+    "Pilgrims, conquerors and travellers have all stood here in silent wonder.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not FFMPEG_AVAILABLE:
+        print("ffmpeg/ffprobe not found on PATH - cannot run benchmark.")
+        return
+
+    texts = (LINES * ((args.shots // len(LINES)) + 1))[:args.shots]
+    work_dir = tempfile.mkdtemp(prefix="bench_narration_")
+
+    per_shot, single_pass = [], []
+    for n in range(args.repeat):
+        jobs = [(text, os.path.join(work_dir, f"per_shot_{n}_{i}.mp3")) for i, text in enumerate(texts)]
+        start = time.perf_counter()
+        results = asyncio.run(synthesize_narrations(jobs))
+        per_shot.append(time.perf_counter() - start)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            print(f"Per-shot narration failed: {errors[0]}")
+            return
+
+        script_path = os.path.join(work_dir, f"script_{n}.mp3")
+        start = time.perf_counter()
+        boundaries = asyncio.run(generate_narration_single_pass(texts, script_path))
+        ranges, _ = shot_time_ranges(texts, boundaries)
+        split_audio(script_path, [
+            (begin, end, os.path.join(work_dir, f"single_{n}_{i}.mp3")) for i, (begin, end) in enumerate(ranges)
+        ])
+        single_pass.append(time.perf_counter() - start)
+
+    print(f"{args.shots} shots, {args.repeat} runs")
+    print(f"{'mode':<14}{'round trips':>12}{'best (s)':>10}{'mean (s)':>10}")
+    print(f"{'per-shot':<14}{len(texts):>12}{min(per_shot):>10.2f}{sum(per_shot) / len(per_shot):>10.2f}")
+    print(f"{'single-pass':<14}{1:>12}{min(single_pass):>10.2f}{sum(single_pass) / len(single_pass):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark the local Ken Burns preview clip (utils.media.build_preview_clip).
+
+Renders previews for a synthetic landmark photo with narration of several lengths
+and reports wall-clock render time. No network access is used.
+
+Usage: python benchmarks/bench_preview.py [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.media import FFMPEG_AVAILABLE, FFMPEG_PATH, build_preview_clip
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not FFMPEG_AVAILABLE:
+        print("ffmpeg/ffprobe not found on PATH - cannot run benchmark.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_preview_")
+    image_path = os.path.join(work_dir, "landmark.jpg")
+    subprocess.run([FFMPEG_PATH, "-y", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=1920x1280",
+                    "-frames:v", "1", image_path], check=True)
+
+    print(f"{'narration (s)':<16}{'best (s)':>10}{'mean (s)':>10}")
+    for seconds in (4, 8, 15):
+        audio_path = os.path.join(work_dir, f"narration_{seconds}.mp3")
+        subprocess.run([FFMPEG_PATH, "-y", "-v", "error", "-f", "lavfi", "-i", f"sine=frequency=300:duration={seconds}",
+                        "-c:a", "libmp3lame", audio_path], check=True)
+
+        timings = []
+        for n in range(args.repeat):
+            start = time.perf_counter()
+            build_preview_clip(image_path, audio_path, os.path.join(work_dir, f"preview_{seconds}_{n}.mp4"))
+            timings.append(time.perf_counter() - start)
+        print(f"{seconds:<16}{min(timings):>10.2f}{sum(timings) / len(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark nearest-landmark search (utils.geo) at catalog sizes from 1e3 to 1e6.
+
+Synthetic landmarks are scattered over Egypt's bounding box. For each size it reports the
+per-row haversine loop the recommendations used before (skipped above --loop-max), the
+vectorized single-origin top-k, the batched top-k per origin, and the grid index
+(utils.spatial_index) build time and k-NN latency.
+
+Usage: python benchmarks/bench_recommendations.py [--k 10] [--origins 256] [--loop-max 100000]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.geo import coordinate_arrays, nearest_k, nearest_k_batch
+from utils.spatial_index import LandmarkIndex
+
+
+def _best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--origins", type=int, default=256)
+    parser.add_argument("--loop-max", type=int, default=100_000, help="Largest size to run the per-row loop on")
+    args = parser.parse_args()
+
+    from haversine import haversine, Unit
+
+    rng = np.random.default_rng(42)
+    print(f"{'landmarks':>10}{'loop (ms)':>12}{'vector (ms)':>13}{'batch/origin (ms)':>19}"
+          f"{'index build (s)':>17}{'index knn (us)':>16}")
+    for n in (1_000, 100_000, 1_000_000):
+        latitudes = rng.uniform(22.0, 31.7, n)
+        longitudes = rng.uniform(24.7, 36.9, n)
+        lat, lon, cos_lat = coordinate_arrays(latitudes, longitudes)
+        origin = (29.9792, 31.1342)
+
+        loop_ms = "-"
+        if n <= args.loop_max:
+            def _loop():
+                distances = [haversine(origin, (a, b), unit=Unit.KILOMETERS) for a, b in zip(latitudes, longitudes)]
+                return sorted(range(n), key=distances.__getitem__)[:args.k]
+            loop_ms = f"{_best_of(_loop, 1) * 1000:.1f}"
+
+        vector = _best_of(lambda: nearest_k(origin[0], origin[1], lat, lon, args.k, cos_lat))
+        origin_lats = rng.uniform(22.0, 31.7, args.origins)
+        origin_lons = rng.uniform(24.7, 36.9, args.origins)
+        batch = _best_of(lambda: nearest_k_batch(origin_lats, origin_lons, lat, lon, args.k, cos_lat), 1)
+
+        start = time.perf_counter()
+        index = LandmarkIndex.from_dataframe(pd.DataFrame({"latitude": latitudes, "longitude": longitudes}))
+        build = time.perf_counter() - start
+        knn = _best_of(lambda: [index.knn(a, b, args.k) for a, b in zip(origin_lats, origin_lons)])
+
+        print(f"{n:>10}{loop_ms:>12}{vector * 1000:>13.2f}{batch * 1000 / args.origins:>19.3f}"
+              f"{build:>17.2f}{knn * 1e6 / args.origins:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import argparse
+
+from config import NEIGHBOR_TABLE_K, NEIGHBOR_TABLE_DIR
+from utils.database import connect_to_db
+from utils.neighbor_table import build_neighbor_table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute each landmark's nearest neighbours, overall and per category.")
+    parser.add_argument("--full", action="store_true", help="Recompute every landmark instead of only the changed ones")
+    parser.add_argument("--k", type=int, default=NEIGHBOR_TABLE_K)
+    parser.add_argument("--output-dir", default=NEIGHBOR_TABLE_DIR, help="Where to write the memory-mapped copy")
+    args = parser.parse_args()
+
+    connect_to_db()
+    build_neighbor_table(full=args.full, k=args.k, output_dir=args.output_dir)
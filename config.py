@@ -22,6 +22,79 @@ VEO_MODEL = "veo-2.0-generate-001"    # Google Veo
 
 VIDEO_MODEL = VEO_MODEL
 
+# Narration (Edge TTS)
+NARRATION_VOICE = os.getenv("NARRATION_VOICE", "en-GB-RyanNeural")
+NARRATION_CONCURRENCY = int(os.getenv("NARRATION_CONCURRENCY", "4"))  # simultaneous TTS streams per run
+NARRATION_RATE = os.getenv("NARRATION_RATE", "+0%")
+NARRATION_PITCH = os.getenv("NARRATION_PITCH", "+0Hz")
+# "per_shot" synthesizes each line separately; "single_pass" speaks the whole script once and cuts it per shot
+NARRATION_MODE = os.getenv("NARRATION_MODE", "per_shot")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "500"))  # LRU budget for cached narration audio
+
+# Video Generation Coordination
+# Concurrent requests for the same cached video wait on a single Veo job.
+VIDEO_LEASE_TTL_SECONDS = int(os.getenv("VIDEO_LEASE_TTL_SECONDS", "900"))
+VIDEO_LEASE_POLL_SECONDS = int(os.getenv("VIDEO_LEASE_POLL_SECONDS", "5"))
+# A clip cache admission refused stays published on its lease this long for the waiters;
+# keep it below ARTIFACT_GC_GRACE_SECONDS so the file outlives the lease
+VIDEO_LEASE_RESULT_TTL_SECONDS = int(os.getenv("VIDEO_LEASE_RESULT_TTL_SECONDS", "600"))
+
+# Local Media Processing
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+MEDIA_WORKER_PROCESSES = int(os.getenv("MEDIA_WORKER_PROCESSES", str(max(1, (os.cpu_count() or 2) // 2))))
+MEDIA_TASK_TIMEOUT_SECONDS = int(os.getenv("MEDIA_TASK_TIMEOUT_SECONDS", "600"))
+
+# Content-addressed storage for generated videos and narration audio
+ARTIFACT_ROOT = os.getenv("ARTIFACT_ROOT", "artifacts")
+ARTIFACT_GC_GRACE_SECONDS = int(os.getenv("ARTIFACT_GC_GRACE_SECONDS", "3600"))
+ARTIFACT_RUN_MAX_AGE_SECONDS = int(os.getenv("ARTIFACT_RUN_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+# Offline catalog precompute (precompute_catalog.py)
+CATALOG_PRECOMPUTE_CONCURRENCY = int(os.getenv("CATALOG_PRECOMPUTE_CONCURRENCY", "2"))
+
+# Popularity-driven video cache (warm_video_cache.py)
+POPULARITY_HALF_LIFE_HOURS = float(os.getenv("POPULARITY_HALF_LIFE_HOURS", "72"))
+VIDEO_CACHE_MAX_ENTRIES = int(os.getenv("VIDEO_CACHE_MAX_ENTRIES", "0"))  # 0 = unbounded
+# How long the least-popular-cached ranking used for admission is reused before a rescan
+CACHE_ADMISSION_REFRESH_SECONDS = int(os.getenv("CACHE_ADMISSION_REFRESH_SECONDS", "300"))
+CACHE_WARM_TOP_K = int(os.getenv("CACHE_WARM_TOP_K", "20"))
+CACHE_WARM_VEO_BUDGET = int(os.getenv("CACHE_WARM_VEO_BUDGET", "5"))
+CACHE_WARM_REFRESH_DAYS = int(os.getenv("CACHE_WARM_REFRESH_DAYS", "30"))
+CACHE_WARM_OFFPEAK_HOURS = os.getenv("CACHE_WARM_OFFPEAK_HOURS", "1-6")  # UTC, start-end inclusive
+
+# Cached video entries: expire this many days after their last access (0 = keep forever)
+VIDEO_CACHE_TTL_DAYS = float(os.getenv("VIDEO_CACHE_TTL_DAYS", "0"))
+VIDEO_CACHE_TOUCH_SECONDS = int(os.getenv("VIDEO_CACHE_TOUCH_SECONDS", "3600"))  # last_accessed granularity
+VIDEO_CACHE_STATS_TTL_SECONDS = int(os.getenv("VIDEO_CACHE_STATS_TTL_SECONDS", "30"))  # sidebar stats refresh
+
+# Optional rendition ladder for cached clips and HLS packaging of the final film
+RENDITIONS_ENABLED = os.getenv("RENDITIONS_ENABLED", "false").lower() == "true"
+RENDITION_LADDER = [
+    {"name": "480p", "height": 480, "video_bitrate": "900k"},
+    {"name": "720p", "height": 720, "video_bitrate": "2500k"},
+]
+
+# Landmark Catalog Snapshot
+# Each process keeps one in-memory copy of the catalog, reloaded when the catalog version changes.
+CATALOG_VERSION_CHECK_SECONDS = int(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "30"))
+CATALOG_CHANGE_STREAM = os.getenv("CATALOG_CHANGE_STREAM", "true").lower() == "true"
+
+# Nearest-landmark queries: "memory" searches the catalog snapshot in process, "mongo" runs $geoNear
+RECOMMENDATION_BACKEND = os.getenv("RECOMMENDATION_BACKEND", "memory").lower()
+
+# Catalog ingestion (ingest_landmarks.py)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))  # landmarks per bulk_write round trip
+
+# Precomputed neighbour table (build_neighbors.py); catalog lookups of up to K results read it
+NEIGHBOR_TABLE_K = int(os.getenv("NEIGHBOR_TABLE_K", "10"))
+NEIGHBOR_TABLE_DIR = os.getenv("NEIGHBOR_TABLE_DIR", os.path.join("data", "neighbor_table"))
+
+# Semantic Video Cache
+# Reuse a cached clip when its prompt is this similar (cosine, 0-1) to the new one.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+
 
 def validate_config():
     """Check for valid API keys and print configuration summary."""
@@ -0,0 +1,23 @@
+import argparse
+
+from config import INGEST_BATCH_SIZE
+from utils.database import connect_to_db
+from utils.catalog_ingest import read_landmark_file, ingest_landmarks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load landmarks from CSV, JSON, JSON Lines or GeoJSON files.")
+    parser.add_argument("paths", nargs="+", help="Landmark files; all are loaded as one catalog")
+    parser.add_argument("--replace", action="store_true",
+                        help="Replace the whole catalog (via a shadow collection) instead of upserting into it")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--neighbors", action="store_true",
+                        help="Rebuild the neighbour table afterwards (slow on large catalogs; see build_neighbors.py)")
+    args = parser.parse_args()
+
+    def _rows():
+        for path in args.paths:
+            yield from read_landmark_file(path)
+
+    connect_to_db()
+    ingest_landmarks(_rows(), replace=args.replace, batch_size=args.batch_size, build_neighbors=args.neighbors)
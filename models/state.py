@@ -8,12 +8,14 @@ class AgentState(TypedDict):
     """Workflow state for the Historical Building → Video Story process"""
 
     # Input
+    run_id: str                # Unique id of this run (per-run artifact links)
     image_base64: str          # Base64-encoded image of the landmark
     api_provider: str          # Selected API provider (e.g., gemini, openrouter)
 
     # Processing stages
     image_analysis: str        # Historical and architectural analysis
     landmark_name: str         # Name of the detected landmark
+    catalog_hit: bool          # Story/shots/narration served from the offline precompute
     created_telling_story: str # Generated educational narrative
     shots_description: List[Dict[str, Any]]  # List of generated video shots
 
@@ -23,6 +25,10 @@ class AgentState(TypedDict):
 
     # Output
     final_output: str           # Final combined output in JSON
+    generated_video_path: str   # Path of the generated or cached video
+    video_cached: bool          # Whether the video came from the cache
+    video_thumbnail_path: str   # Poster frame extracted by the media worker
+    narration_timing: List[Dict[str, Any]]  # Single-pass narration: shot_number, start, end (seconds in the script)
 
     # Workflow tracking
     messages: List[str]         # Status messages through pipeline stages
@@ -0,0 +1,52 @@
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from config import CATALOG_PRECOMPUTE_CONCURRENCY
+from utils.database import connect_to_db, get_collections
+from utils.catalog_artifacts import precompute_landmark, template_version
+
+
+def precompute_catalog(concurrency: int = CATALOG_PRECOMPUTE_CONCURRENCY, limit: int = None, force: bool = False):
+    """Precompute story, shots and narration for every landmark in the catalog.
+
+    Safe to re-run: landmarks already completed for the current template version are skipped,
+    so an interrupted run resumes where it stopped.
+    """
+    landmarks_collection, videos_collection, db = get_collections()
+
+    if landmarks_collection is None:
+        print("Database connection not established. Aborting precompute.")
+        return
+
+    # _id is the stable landmark id precompute entries are keyed by
+    landmarks = list(landmarks_collection.find({}, {"location": 0}))
+    if limit:
+        landmarks = landmarks[:limit]
+
+    print(f"Precomputing {len(landmarks)} landmarks (template version {template_version()}, concurrency {concurrency})")
+
+    results = Counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(precompute_landmark, landmark, force): landmark["name"] for landmark in landmarks}
+        with tqdm(total=len(futures), desc="Precomputing Catalog", unit="landmark") as pbar:
+            for future in as_completed(futures):
+                results[future.result()] += 1
+                pbar.set_postfix(results)
+                pbar.update(1)
+
+    print(f"\nCatalog precompute finished: {dict(results)}")
+    return dict(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute catalog stories, shots and narration.")
+    parser.add_argument("--concurrency", type=int, default=CATALOG_PRECOMPUTE_CONCURRENCY)
+    parser.add_argument("--limit", type=int, default=None, help="Only process the first N landmarks")
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that are already complete")
+    args = parser.parse_args()
+
+    connect_to_db()
+    precompute_catalog(concurrency=args.concurrency, limit=args.limit, force=args.force)
@@ -186,3 +186,38 @@ EXAMPLES:
 - Output: "Saqqara Pyramid"
 """
 
+
+
+# 5. CATALOG ANALYSIS PROMPT (offline precompute, no image available)
+CATALOG_ANALYSIS_PROMPT = """
+You are an expert historian and architectural analyst with deep knowledge of historical buildings and landmarks worldwide.
+
+LANDMARK:
+{landmark_name} — {governorate}, Egypt (category: {category})
+
+TASK:
+Write the analysis a visitor would get from a clear photograph of this landmark.
+Follow the same structure:
+
+1. IDENTIFICATION
+   - Name of the landmark
+   - Location (city, country)
+   - Approximate construction era
+   - Architectural style
+
+2. PHYSICAL DESCRIPTION
+   - Key architectural features and materials
+   - Notable design elements
+   - Surrounding environment
+
+3. HISTORICAL CONTEXT
+   - Who built it and why
+   - Original purpose and evolution
+   - Historical or cultural significance
+   - Major events it witnessed
+
+4. VISUAL ELEMENTS
+   - Dominant colors, textures, and typical lighting
+
+Return structured text suitable for storytelling.
+"""
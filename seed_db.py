@@ -1,6 +1,6 @@
 import sys
-from tqdm import tqdm
 from utils.database import connect_to_db, get_collections
+from utils.catalog_ingest import ingest_landmarks
 
 def get_landmarks():
     """Returns a list of 100 Egyptian landmarks."""
@@ -318,8 +318,7 @@ def get_landmarks():
     ]
 
 def seed_database():
-    """Seed the database with a comprehensive list of 300 Egyptian landmarks."""
-    # Ensure DB connection is active and get collections
+    """Replace the catalog with the built-in list of Egyptian landmarks."""
     landmarks_collection, videos_collection, db = get_collections()
 
     if landmarks_collection is None:
@@ -327,22 +326,14 @@ def seed_database():
         return
 
     try:
-        print("Clearing existing landmark data...")
-        landmarks_collection.delete_many({})  # Clear existing data
-        print("Existing data cleared.")
-
         egyptian_landmarks = get_landmarks()
-        total_landmarks = len(egyptian_landmarks)
-        print(f"Found {total_landmarks} landmarks to insert.")
+        print(f"Found {len(egyptian_landmarks)} landmarks to insert.")
 
-        # Insert with a progress bar
-        with tqdm(total=total_landmarks, desc="Seeding Database", unit="landmark") as pbar:
-            for landmark in egyptian_landmarks:
-                landmarks_collection.insert_one(landmark)
-                pbar.update(1)
+        # Loads into a shadow collection and swaps it in, so the live catalog is never empty
+        ingest_landmarks(egyptian_landmarks, replace=True, total=len(egyptian_landmarks), build_neighbors=True)
 
         print("\nDatabase seeding completed successfully!")
-        print(f"Total landmarks inserted: {landmarks_collection.count_documents({})}")
+        print(f"Total landmarks in catalog: {landmarks_collection.count_documents({})}")
 
     except Exception as e:
         print(f"\nAn error occurred during database seeding: {e}")
@@ -0,0 +1,42 @@
+import random
+from collections import Counter
+
+from utils.keyword_matcher import KeywordMatcher
+
+KEYWORDS = ["pyramid", "giza", "temple", "karnak", "karnak temple", "mut", "sphinx", "abu simbel", "tem", "ram"]
+
+
+def _brute_force(keywords, text):
+    text = text.lower()
+    counts = Counter()
+    for keyword in {k.lower() for k in keywords}:
+        start = text.find(keyword)
+        while start != -1:
+            if start == 0 or not text[start - 1].isalnum():
+                counts[keyword] += 1
+            start = text.find(keyword, start + 1)
+    return counts
+
+
+def test_scan_examples():
+    matcher = KeywordMatcher(KEYWORDS)
+    counts = matcher.scan("The Pyramids of Giza; Karnak Temple, the temple of Mut. A commute to the mutual ram-headed sphinx.")
+    assert counts["pyramid"] == 1
+    assert counts["karnak temple"] == 1
+    assert counts["temple"] == 2
+    assert counts["tem"] == 2
+    assert counts["mut"] == 2  # "Mut" and "mutual", not "commute"
+    assert counts["ram"] == 1
+
+
+def test_scan_matches_brute_force():
+    rng = random.Random(5)
+    words = KEYWORDS + ["the", "of", "commute", "temples", "pyramids", "ramses", "karnaks", "a", "gizamut"]
+    matcher = KeywordMatcher(KEYWORDS)
+    for _ in range(500):
+        text = "".join(
+            rng.choice(words) + rng.choice([" ", ", ", "-", ". ", "", "_"])
+            for _ in range(rng.randint(0, 30))
+        )
+        text = "".join(c.upper() if rng.random() < 0.1 else c for c in text)
+        assert matcher.scan(text) == _brute_force(KEYWORDS, text), text
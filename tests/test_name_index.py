@@ -0,0 +1,44 @@
+import pytest
+
+from seed_db import get_landmarks
+from utils.name_index import NameIndex
+
+# Same bar get_recommendations uses for fuzzy_match_landmark
+THRESHOLD = 0.6
+
+
+@pytest.fixture(scope="module")
+def index():
+    return NameIndex([landmark["name"] for landmark in get_landmarks()])
+
+
+def _resolve(index, query):
+    matches = index.search(query, limit=1, min_score=THRESHOLD)
+    return matches[0][1] if matches else None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("The Great Pyramid", "Pyramids of Giza"),
+    ("Great Pyramids", "Pyramids of Giza"),
+    ("Great Pyramid of Giza", "Pyramids of Giza"),
+    ("Great Temple of Abu Simbel", "Abu Simbel Temples"),
+    ("The Great Sphinx", "Great Sphinx of Giza"),
+    ("Karnak", "Karnak Temple"),
+    ("Egyptian Museum", "The Egyptian Museum"),
+    ("Luxor Museum", "Luxor Museum"),
+    ("Luxor Temple", "Luxor Temple"),
+    ("Abydos", "Abydos"),
+    ("hurghad", "Hurghada"),
+])
+def test_seed_queries(index, query, expected):
+    assert _resolve(index, query) == expected
+
+
+def test_great_is_a_stopword(index):
+    assert "great" in index.stopwords
+    assert index.core("The Great Pyramids") == "pyramid"
+
+
+def test_unknown_words_are_ignored(index):
+    assert _resolve(index, "Karnak Qwxzv") == "Karnak Temple"
+    assert _resolve(index, "Qwxzv") is None
@@ -0,0 +1,138 @@
+import copy
+import random
+
+import pytest
+
+from utils import neighbor_table
+
+CATEGORIES = ["Historical", "Museum", "Religious"]
+
+
+class FakeStore:
+    """In-memory stand-in for the landmarks, landmark_neighbors and catalog_meta collections."""
+
+    def __init__(self, landmarks):
+        self.landmarks = landmarks
+        self.entries = {}
+        self.meta = None
+
+    def find(self, query=None, projection=None):
+        return [copy.deepcopy(doc) for doc in self.landmarks]
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(neighbor_table, "get_collections", lambda: (self, None, None))
+        monkeypatch.setattr(neighbor_table, "get_catalog_version", lambda: 1)
+        monkeypatch.setattr(neighbor_table, "get_neighbor_table_meta", lambda: copy.deepcopy(self.meta))
+        monkeypatch.setattr(neighbor_table, "set_neighbor_table_meta", self.set_meta)
+        monkeypatch.setattr(neighbor_table, "get_neighbor_entries", lambda: copy.deepcopy(list(self.entries.values())))
+        monkeypatch.setattr(neighbor_table, "save_neighbor_entries", self.save)
+        monkeypatch.setattr(neighbor_table, "update_neighbor_positions", self.update_positions)
+        monkeypatch.setattr(neighbor_table, "delete_neighbor_entries", self.delete)
+
+    def set_meta(self, catalog_version, k, categories):
+        self.meta = {"catalog_version": catalog_version, "k": k, "categories": list(categories)}
+
+    def save(self, entries):
+        self.entries.update((entry["_id"], copy.deepcopy(entry)) for entry in entries)
+
+    def update_positions(self, positions):
+        for landmark_id, position in positions.items():
+            self.entries[landmark_id]["position"] = position
+
+    def delete(self, landmark_ids=None):
+        for landmark_id in list(self.entries if landmark_ids is None else landmark_ids):
+            self.entries.pop(landmark_id, None)
+
+
+def _landmark(rng, landmark_id, name=None):
+    return {
+        "_id": landmark_id,
+        "name": name or f"Landmark {landmark_id}",
+        "category": rng.choice(CATEGORIES),
+        "latitude": rng.uniform(29.0, 31.0),
+        "longitude": rng.uniform(30.0, 32.0),
+    }
+
+
+def _mutate(rng, landmarks, next_id):
+    """Apply one random catalog edit: move, add, remove or recategorize."""
+    operation = rng.choice(["move", "add", "remove", "recategorize"])
+    if operation == "add" or len(landmarks) < 15:
+        # Sometimes reuse a name, so same-name exclusion and position ordering are exercised
+        name = rng.choice(landmarks)["name"] if rng.random() < 0.3 else None
+        landmarks.insert(rng.randrange(len(landmarks) + 1), _landmark(rng, next_id, name))
+        return next_id + 1
+    target = rng.choice(landmarks)
+    if operation == "remove":
+        landmarks.remove(target)
+    elif operation == "move":
+        target["latitude"] += rng.uniform(-0.2, 0.2)
+        target["longitude"] += rng.uniform(-0.2, 0.2)
+    else:
+        target["category"] = rng.choice([c for c in CATEGORIES if c != target["category"]])
+    return next_id
+
+
+def _table(entries):
+    """Entries reduced to what lookups depend on: position and neighbour ids/distances per slot."""
+    return {
+        landmark_id: (
+            entry["position"],
+            {slot: [(n["landmark_id"], round(n["distance_km"], 9)) for n in neighbors]
+             for slot, neighbors in entry["neighbors"].items()},
+        )
+        for landmark_id, entry in entries.items()
+    }
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_incremental_rebuild_matches_full_rebuild(monkeypatch, tmp_path, seed):
+    rng = random.Random(seed)
+    landmarks = [_landmark(rng, i) for i in range(40)]
+    next_id = len(landmarks)
+
+    incremental = FakeStore(landmarks)
+    incremental.install(monkeypatch)
+    neighbor_table.build_neighbor_table(full=True, k=5, output_dir=str(tmp_path / "incremental"))
+
+    for _ in range(30):
+        # Few edits per round stay under the incremental threshold
+        for _ in range(rng.randint(1, 3)):
+            next_id = _mutate(rng, landmarks, next_id)
+
+        incremental.install(monkeypatch)
+        neighbor_table.build_neighbor_table(k=5, output_dir=str(tmp_path / "incremental"))
+
+        full = FakeStore(landmarks)
+        full.install(monkeypatch)
+        neighbor_table.build_neighbor_table(full=True, k=5, output_dir=str(tmp_path / "full"))
+
+        assert _table(incremental.entries) == _table(full.entries)
+
+
+def test_incremental_rebuild_recomputes_only_affected_landmarks(monkeypatch, tmp_path):
+    rng = random.Random(9)
+    landmarks = [_landmark(rng, i) for i in range(200)]
+    store = FakeStore(landmarks)
+    store.install(monkeypatch)
+    neighbor_table.build_neighbor_table(full=True, k=5, output_dir=str(tmp_path))
+
+    landmarks[0]["latitude"] += 0.01
+    stats = neighbor_table.build_neighbor_table(k=5, output_dir=str(tmp_path))
+    assert 1 <= stats["recomputed"] < len(landmarks) // 2
+
+
+def test_local_table_answers_like_mongo_entries(monkeypatch, tmp_path):
+    rng = random.Random(4)
+    landmarks = [_landmark(rng, i) for i in range(60)]
+    store = FakeStore(landmarks)
+    store.install(monkeypatch)
+    neighbor_table.build_neighbor_table(full=True, k=5, output_dir=str(tmp_path))
+
+    table = neighbor_table.LocalNeighborTable(str(tmp_path))
+    for entry in store.entries.values():
+        for slot in ["all"] + [c.lower() for c in CATEGORIES]:
+            records, distances = table.lookup(entry["name_lower"], slot, 5)
+            expected_records, expected_distances = neighbor_table.entry_neighbors(entry, slot, 5)
+            assert [r["name"] for r in records] == [r["name"] for r in expected_records]
+            assert distances == pytest.approx(expected_distances, rel=1e-6)
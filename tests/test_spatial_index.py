@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.geo import coordinate_arrays, haversine_km
+from utils.spatial_index import LandmarkIndex
+
+CATEGORIES = ["Historical", "Museum", "Religious", "Nature"]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    rng = np.random.default_rng(7)
+    n = 2000
+    # Dense clusters (cities) plus scattered points, like the real catalog
+    centers = rng.uniform([22.0, 25.0], [31.5, 36.0], size=(8, 2))
+    clustered = centers[rng.integers(0, len(centers), n // 2)] + rng.normal(0, 0.05, size=(n // 2, 2))
+    scattered = rng.uniform([22.0, 25.0], [31.5, 36.0], size=(n - n // 2, 2))
+    points = np.vstack([clustered, scattered])
+    return pd.DataFrame({
+        "name": [f"Landmark {i}" for i in range(n)],
+        "category": rng.choice(CATEGORIES, n),
+        "latitude": points[:, 0],
+        "longitude": points[:, 1],
+    })
+
+
+def _brute_force(catalog, lat, lon, category=None):
+    rows = catalog if category is None else catalog[catalog["category"].str.lower() == category.lower()]
+    rlat, rlon, cos_lat = coordinate_arrays(rows["latitude"], rows["longitude"])
+    distances = haversine_km(lat, lon, rlat, rlon, cos_lat)
+    order = np.argsort(distances, kind="stable")
+    return rows.index.to_numpy()[order], distances[order]
+
+
+def _origins(n=50):
+    rng = np.random.default_rng(11)
+    return zip(rng.uniform(22.0, 31.5, n), rng.uniform(25.0, 36.0, n))
+
+
+@pytest.mark.parametrize("category", [None, "museum"])
+@pytest.mark.parametrize("k", [1, 10, 50])
+def test_knn_matches_brute_force(catalog, category, k):
+    index = LandmarkIndex.from_dataframe(catalog)
+    for lat, lon in _origins():
+        ids, distances = index.knn(lat, lon, k, category=category)
+        expected_ids, expected_distances = _brute_force(catalog, lat, lon, category)
+        np.testing.assert_allclose(distances, expected_distances[:k], rtol=1e-9)
+        assert list(ids) == list(expected_ids[:k])
+
+
+def test_knn_excludes_ids(catalog):
+    index = LandmarkIndex.from_dataframe(catalog)
+    for lat, lon in _origins(20):
+        expected_ids, _ = _brute_force(catalog, lat, lon)
+        exclude = set(expected_ids[:3].tolist())
+        ids, _ = index.knn(lat, lon, 5, exclude=exclude)
+        assert list(ids) == list(expected_ids[3:8])
+
+
+@pytest.mark.parametrize("category", [None, "Nature"])
+@pytest.mark.parametrize("radius_km", [5.0, 50.0, 300.0])
+def test_within_matches_brute_force(catalog, category, radius_km):
+    index = LandmarkIndex.from_dataframe(catalog)
+    for lat, lon in _origins():
+        ids, distances = index.within(lat, lon, radius_km, category=category)
+        expected_ids, expected_distances = _brute_force(catalog, lat, lon, category)
+        inside = expected_distances <= radius_km
+        np.testing.assert_allclose(distances, expected_distances[inside], rtol=1e-9)
+        assert list(ids) == list(expected_ids[inside])
+
+
+def test_inserted_points_are_found(catalog):
+    index = LandmarkIndex.from_dataframe(catalog)
+    index.insert(len(catalog), 26.5, 30.0, "Museum")
+    ids, distances = index.knn(26.5, 30.0, 1, category="museum")
+    assert ids[0] == len(catalog)
+    assert distances[0] == pytest.approx(0.0)
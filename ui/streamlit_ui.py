@@ -3,6 +3,9 @@ import sys
 import json
 import time
 import re
+import uuid
+import base64
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 
 # Ensure project root is importable (needed in some run setups)
@@ -15,20 +18,21 @@ from utils.video_generator import (
     generate_video_with_veo,
     generate_or_get_cached_video,
     get_video_cache_info,
+    get_singleflight_stats,
     clear_video_cache,
 )
+from utils.semantic_cache import get_semantic_cache_report
+from utils.media import FFMPEG_AVAILABLE, MOVIEPY_AVAILABLE, derived_path
+from utils.media_worker import submit_media_task, run_media_task
+from utils.artifact_store import store_for_run, RUNS_DIR
+from utils.renditions import pick_rendition, record_delivery, get_delivery_stats, schedule_hls
 from utils.recommendation import load_landmarks, get_recommendations
+from utils.landmark_catalog import get_catalog_stats
+from utils.database import get_db_metrics
 
 import streamlit as st
 from slugify import slugify
 
-# keep features disabled if incompatible (Python 3.13)
-MOVIEPY_AVAILABLE = True
-try:
-    from moviepy.editor import concatenate_videoclips, VideoFileClip, AudioFileClip
-except Exception:
-    MOVIEPY_AVAILABLE = False
-
 
 # Main APP
 def create_interface():
@@ -100,6 +104,24 @@ def render_sidebar():
             with col2:
                 st.metric("Unique Landmarks", cache_info.get("unique_landmarks", 0))
 
+            flight_stats = get_singleflight_stats()
+            coalesced = flight_stats["coalesced_in_process"] + flight_stats["coalesced_cross_process"]
+            st.caption(f"Veo jobs started: {flight_stats['generations_started']} · Requests coalesced: {coalesced}")
+
+            semantic_report = get_semantic_cache_report()
+            if semantic_report["lookups"]:
+                with st.expander("Similar-prompt hit rate"):
+                    st.caption(f"Active threshold: {semantic_report['active_threshold']:.2f} · Lookups: {semantic_report['lookups']}")
+                    for threshold, rate in semantic_report["hit_rate"].items():
+                        st.text(f"≥ {threshold:.2f}: {rate:.0%}")
+
+            delivery_stats = get_delivery_stats()
+            if delivery_stats:
+                with st.expander("Video delivery"):
+                    for rendition, stats in delivery_stats.items():
+                        serve = f"{stats['mean_serve_time'] * 1000:.0f} ms" if stats["mean_serve_time"] is not None else "n/a"
+                        st.text(f"{rendition}: {stats['plays']} plays · {stats['bytes_served'] / (1024 * 1024):.1f} MB · serve {serve}")
+
             if st.button("🗑️ Clear All Cache", type="secondary"):
                 if clear_video_cache():
                     st.success("✅ Cache cleared successfully!")
@@ -109,6 +131,18 @@ def render_sidebar():
         else:
             st.info("💾 Video cache not available")
 
+        db_metrics = get_db_metrics()
+        if db_metrics["commands"]:
+            with st.expander("Database"):
+                pool = db_metrics["pool"]
+                st.caption(
+                    f"Connections open: {pool.get('connections_open', 0)} · In use: {pool.get('checked_out', 0)} · "
+                    f"Checkout failures: {pool.get('checkout_failures', 0)}"
+                )
+                busiest = sorted(db_metrics["commands"].items(), key=lambda item: -item[1]["total_ms"])[:6]
+                for command, stats in busiest:
+                    st.text(f"{command}: {stats['count']} · mean {stats['mean_ms']:.1f} ms · max {stats['max_ms']:.0f} ms")
+
         # Usage Guide
         st.divider()
         st.subheader("📘 Quick Guide")
@@ -161,6 +195,7 @@ def process_generation(uploaded_file, refinement_input, landmark_name_input, api
         image_base64 = image_to_base64(Image.open(uploaded_file))
         refinement_notes = [refinement_input.strip()] if refinement_input.strip() else []
         initial_state = {
+            "run_id": uuid.uuid4().hex,
             "image_base64": image_base64,
             "api_provider": api_provider,
             "image_analysis": "",
@@ -227,28 +262,39 @@ Include the landmark prominently in the frame.
 Dynamic camera motion, realistic atmosphere, natural lighting.
 """.strip()
 
-def _merge_audio_with_moviepy(video_path, audio_path, out_path):
-    try:
-        v = VideoFileClip(video_path)
-        a = AudioFileClip(audio_path)
-        v = v.set_audio(a)
-        v.write_videofile(out_path, codec="libx264", audio_codec="aac", logger=None)
-        v.close()
-        a.close()
-        return out_path
-    except Exception as e:
-        print(f"[WARN] Audio merge failed for {video_path}: {e}")
-        return video_path
+def _merge_audio(video_path, audio_path, out_path, hold_until=None):
+    """Mux narration with ffmpeg (video stream copied), falling back to moviepy for odd inputs.
+
+    hold_until is the shot's narration span; a shorter clip holds its last frame until then.
+    """
+    if FFMPEG_AVAILABLE:
+        try:
+            return run_media_task("mux", video_path, audio_path, out_path, hold_until=hold_until)
+        except Exception as e:
+            print(f"[WARN] ffmpeg mux failed for {video_path}, falling back to moviepy: {e}")
+
+    if MOVIEPY_AVAILABLE:
+        # Still decode/encode in a worker process so the script thread stays free
+        try:
+            return run_media_task("mux_moviepy", video_path, audio_path, out_path)
+        except Exception as e:
+            print(f"[WARN] Audio merge failed for {video_path}: {e}")
+            return video_path
 
+    print("[INFO] Neither ffmpeg nor MoviePy available; skipping audio merge.")
+    return video_path
 
-def generate_tour_shot(shot, landmark):
+
+def generate_tour_shot(shot, landmark, run_id=None):
     """
     Unified shot generator:
       - Prefers cached generation via generate_or_get_cached_video
       - Falls back to generate_video_with_veo
-      - Attempts to merge narration audio using moviepy if available
+      - Attempts to merge narration audio (ffmpeg stream copy, moviepy fallback)
+      - Files land in the artifact store, exposed under artifacts/runs/<run_id>/
     Returns: (video_path, audio_used_bool)
     """
+    run_id = run_id or uuid.uuid4().hex
     shot_number = shot.get("shot_number", shot.get("id", 0))
     filename = f"{slugify(landmark)}_shot_{shot_number}.mp4"
     full_prompt = _build_shot_prompt(shot, landmark)
@@ -268,6 +314,7 @@ def generate_tour_shot(shot, landmark):
             story_type=f"shot_{shot_number}",
             size="832*480",
             force_regenerate=False,
+            run_id=run_id,
         )
         if video_path:
             print(f"{'Using cached' if was_cached else 'Generated new'} video: {video_path}")
@@ -278,9 +325,10 @@ def generate_tour_shot(shot, landmark):
     # Fallback: direct Veo generation
     if not video_path:
         try:
-            video_path = generate_video_with_veo(full_prompt, filename)
+            video_path = generate_video_with_veo(full_prompt, f"{run_id}_{filename}")
             if not os.path.exists(video_path):
                 raise FileNotFoundError(f"Video not found at {video_path}")
+            video_path = store_for_run(video_path, run_id, filename)
         except Exception as e:
             print(f"❌ Veo generation failed for shot {shot_number}: {e}")
             raise e
@@ -288,19 +336,167 @@ def generate_tour_shot(shot, landmark):
     # Merge audio if present
     audio_path = shot.get("audio_path")
     if audio_path and os.path.exists(audio_path):
-        if MOVIEPY_AVAILABLE:
-            out_path = f"narrated_{filename}"
-            merged = _merge_audio_with_moviepy(video_path, audio_path, out_path)
-            if merged and os.path.exists(merged):
-                video_path = merged
-                audio_used = True
-        else:
-            print("[INFO] MoviePy not available; skipping audio merge.")
+        out_path = f"narrated_{run_id}_{filename}"
+        merged = _merge_audio(video_path, audio_path, out_path, shot.get("narration_seconds"))
+        if merged and merged != video_path and os.path.exists(merged):
+            video_path = store_for_run(merged, run_id, f"narrated_{filename}")
+            audio_used = True
+
+    shot["video_path"] = video_path
 
     print(f"✅ Finished shot {shot_number}: {video_path}")
     return video_path, audio_used
 
 
+# Low-bitrate rendition shown before the user asks for full quality
+PREVIEW_RENDITION_HEIGHT = 360
+PREVIEW_RENDITION_BITRATE = "400k"
+
+
+# Preview transcodes submitted by this process, keyed by preview path
+_preview_jobs = {}
+
+
+def _poster_and_preview(video_path):
+    """Poster frame and low-bitrate rendition for a clip.
+
+    The poster is extracted right away; the rendition is transcoded in the media worker
+    in the background and its path is None until the file exists. Both are derived files
+    next to the clip, so a file the artifact GC removed is simply made again.
+    """
+    poster = derived_path(video_path, "_poster.jpg")
+    preview = derived_path(video_path, "_preview.mp4")
+    if not os.path.exists(poster):
+        submit_media_task("thumbnail", video_path, poster).result()
+    if os.path.exists(preview):
+        return poster, preview
+
+    job = _preview_jobs.get(preview)
+    # Not started yet, or finished but its file has since been collected; failed jobs stay failed
+    if job is None or (job.done() and job.future.exception() is None):
+        _preview_jobs[preview] = submit_media_task(
+            "transcode", video_path, preview,
+            height=PREVIEW_RENDITION_HEIGHT, video_bitrate=PREVIEW_RENDITION_BITRATE, crf=30
+        )
+    return poster, None
+
+
+def _client_hints():
+    """Save-Data / ECT / Downlink / Viewport-Width request headers, when Streamlit exposes them."""
+    try:
+        return dict(st.context.headers)
+    except Exception:
+        return {}
+
+
+def render_lazy_video(video_path, key, download_name=None):
+    """Show a poster first; load the preview or full video and the download only when asked."""
+    if not FFMPEG_AVAILABLE:
+        st.video(video_path)
+        return
+
+    try:
+        poster, preview = _poster_and_preview(video_path)
+    except Exception as e:
+        print(f"[WARN] Poster/preview failed for {video_path}: {e}")
+        st.video(video_path)
+        return
+
+    mode_key = f"{key}_mode"
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("▶️ Play preview", key=f"{key}_play_preview"):
+            st.session_state[mode_key] = "preview"
+    with col2:
+        if st.button("🎞️ Full quality", key=f"{key}_play_full"):
+            st.session_state[mode_key] = "full"
+            st.session_state.pop(f"{key}_delivered", None)
+    with col3:
+        if download_name and st.button("📥 Prepare download", key=f"{key}_prepare_download"):
+            st.session_state[f"{key}_download"] = True
+
+    mode = st.session_state.get(mode_key)
+    if mode == "full":
+        # Serve the smallest rendition the browser's client hints call for; the time recorded is
+        # server-side only (pick + queue the video), not the browser's time to first frame
+        started = time.perf_counter()
+        rendition, path = pick_rendition(video_path, _client_hints())
+        st.video(path)
+        # Reruns redraw the same selection; count it once per click and rendition
+        delivered_key = f"{key}_delivered"
+        if st.session_state.get(delivered_key) != rendition:
+            record_delivery(rendition, path, time.perf_counter() - started)
+            st.session_state[delivered_key] = rendition
+    elif mode == "preview" and preview:
+        st.video(preview)
+    elif mode == "preview":
+        st.image(poster, use_container_width=True)
+        st.caption("⏳ Preview not ready yet — it is being encoded, or use Full quality.")
+    else:
+        st.image(poster, use_container_width=True)
+
+    if download_name and st.session_state.get(f"{key}_download"):
+        # File handle instead of bytes read by the script; only created once requested
+        with open(video_path, "rb") as file:
+            st.download_button(
+                label="📥 Download Video",
+                data=file,
+                file_name=download_name,
+                mime="video/mp4",
+                key=f"{key}_download_button",
+            )
+
+
+def _source_image_path(final_state):
+    """Write the uploaded image to the run's artifact folder once and return its path."""
+    path = final_state.get("source_image_path")
+    if path and os.path.exists(path):
+        return path
+
+    image_base64 = final_state.get("image_base64")
+    if not image_base64:
+        return None
+
+    run_id = final_state.get("run_id") or uuid.uuid4().hex
+    temp_path = f"source_{run_id}.png"
+    with open(temp_path, "wb") as f:
+        f.write(base64.b64decode(image_base64))
+    final_state["source_image_path"] = store_for_run(temp_path, run_id, "source_image.png")
+    return final_state["source_image_path"]
+
+
+def _generate_shot_with_preview(shot, landmark, final_state):
+    """Run the Veo render in the background and show a local Ken Burns preview until it lands."""
+    run_id = final_state.get("run_id")
+    placeholder = st.empty()
+
+    preview_job = None
+    image_path = _source_image_path(final_state) if FFMPEG_AVAILABLE else None
+    if image_path:
+        preview_path = f"preview_{run_id}_shot_{shot.get('shot_number', 0)}.mp4"
+        preview_job = submit_media_task("preview", image_path, shot.get("audio_path"), preview_path)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        render = executor.submit(generate_tour_shot, shot, landmark, run_id)
+        while not render.done():
+            pending = [render] if preview_job is None else [render, preview_job.future]
+            wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if preview_job is not None and preview_job.done():
+                try:
+                    with placeholder.container():
+                        st.video(preview_job.result())
+                        st.caption("⏳ Instant preview — the Veo render replaces it when ready.")
+                except Exception as e:
+                    print(f"[WARN] Preview failed: {e}")
+                preview_job = None
+
+        video_path, audio_used = render.result()
+
+    if video_path and os.path.exists(video_path):
+        placeholder.video(video_path)
+    return video_path, audio_used
+
+
 def render_shots_tab(final_state, tab):
     with tab:
         # Get recognized landmark name
@@ -330,13 +526,16 @@ def render_shots_tab(final_state, tab):
                 with st.expander("📝 AI Prompt", expanded=True):
                     st.code(_build_shot_prompt(shot, landmark), language="text")
 
+                # Previously generated clip: poster first, video on demand
+                if shot.get("video_path") and os.path.exists(shot["video_path"]):
+                    render_lazy_video(shot["video_path"], f"shot_video_{i}", os.path.basename(shot["video_path"]))
+
                 # Generate shot button
                 if st.button(f"🎞 Generate Shot {shot.get('shot_number', i+1)}", key=f"gen_shot_{i}"):
                     with st.spinner("Generating cinematic video..."):
                         try:
-                            video_path, audio_used = generate_tour_shot(shot, landmark)
+                            video_path, audio_used = _generate_shot_with_preview(shot, landmark, final_state)
                             if video_path and os.path.exists(video_path):
-                                st.video(video_path)
                                 st.success("✅ Shot generated successfully!")
                             else:
                                 st.error("❌ Shot generated but file missing.")
@@ -349,34 +548,56 @@ def render_shots_tab(final_state, tab):
         st.divider()
 
         # ---------- COMBINE ALL SHOTS ----------
-        if MOVIEPY_AVAILABLE:
+        if MOVIEPY_AVAILABLE or FFMPEG_AVAILABLE:
             if st.button("🚀 Generate the Full Video"):
                 with st.spinner("Combining all generated shots..."):
                     try:
-                        clips = []
+                        files, transitions = [], []
                         for s in shots:
                             base = f"{slugify(landmark)}_shot_{s['shot_number']}.mp4"
                             narrated = f"narrated_{base}"
-                            file = narrated if os.path.exists(narrated) else base
+                            if s.get("video_path") and os.path.exists(s["video_path"]):
+                                file = s["video_path"]
+                            else:
+                                file = narrated if os.path.exists(narrated) else base
                             if os.path.exists(file):
-                                clips.append(VideoFileClip(file))
+                                files.append(file)
+                                transitions.append(s.get("transition", ""))
                             else:
                                 st.warning(f"⚠️ Missing file: {file}")
 
-                        if not clips:
+                        if not files:
                             st.error("No video clips found to combine.")
                             return
 
-                        final_clip = concatenate_videoclips(clips, method="compose")
-                        output_path = f"{slugify(landmark)}_final.mp4"
-                        final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
-                        [c.close() for c in clips]
-                        final_clip.close()
-
+                        run_id = final_state.get("run_id") or uuid.uuid4().hex
+                        output_path = f"{run_id}_{slugify(landmark)}_final.mp4"
+                        if FFMPEG_AVAILABLE:
+                            # Stream-copy concat; only mismatched clips and requested transitions are re-encoded
+                            job = submit_media_task("concat", files, output_path, transitions=transitions)
+                        else:
+                            job = submit_media_task("concat_moviepy", files, output_path)
+
+                        # Wait on the job, refreshing the progress bar while it encodes
+                        progress_bar = st.progress(0.0, text="Assembling video...")
+                        while not job.wait(timeout=0.25):
+                            progress_bar.progress(job.progress, text=f"Assembling video... {job.message}")
+                        job.result()
+                        progress_bar.empty()
+                        output_path = store_for_run(output_path, run_id, f"{slugify(landmark)}_final.mp4")
+
+                        final_state["final_video_path"] = output_path
+                        # Adaptive HLS copy for serving the film from a web server or CDN
+                        hls_job = schedule_hls(output_path, os.path.join(RUNS_DIR, run_id, "hls"))
+                        if hls_job:
+                            final_state["final_hls_path"] = os.path.join(RUNS_DIR, run_id, "hls", "master.m3u8")
                         st.success("✅ Final cinematic video created!")
-                        st.video(output_path)
                     except Exception as e:
                         st.error(f"❌ Combining failed: {e}")
+
+            final_video_path = final_state.get("final_video_path")
+            if final_video_path and os.path.exists(final_video_path):
+                render_lazy_video(final_video_path, "final_video", f"{slugify(landmark)}_final.mp4")
         else:
             st.info(
                 "🎬 Video combination (moviepy) disabled due to compatibility. Individual shot generation still works."
@@ -404,15 +625,7 @@ def render_video_tab(final_state, tab):
         st.info(f"📁 Video file: `{os.path.basename(video_path)}` ({file_size:.1f} MB)")
 
         try:
-            st.video(video_path)
-            with open(video_path, "rb") as file:
-                st.download_button(
-                    label="📥 Download Video",
-                    data=file,
-                    file_name=f"{landmark_name.replace(' ', '_').lower()}_video.mp4",
-                    mime="video/mp4",
-                    key="download_video",
-                )
+            render_lazy_video(video_path, "generated_video", f"{landmark_name.replace(' ', '_').lower()}_video.mp4")
         except Exception as e:
             st.error(f"❌ Error displaying video: {e}")
 
@@ -472,6 +685,13 @@ def render_recommendations_tab(final_state, tab):
             st.error("Landmark dataset is empty or could not be loaded.")
             return
 
+        catalog_stats = get_catalog_stats()
+        if catalog_stats:
+            st.caption(
+                f"Catalog v{catalog_stats['version']}: {catalog_stats['landmarks']} landmarks, "
+                f"loaded in {catalog_stats['load_seconds'] * 1000:.0f} ms, {catalog_stats['memory_bytes'] / (1024 * 1024):.1f} MB"
+            )
+
         recommendations_df = get_recommendations(landmark_name, landmarks_df, top_n=10)
         if recommendations_df.empty:
             st.warning(f"No recommendations available for '{landmark_name}'. It might not be in our dataset.")
@@ -0,0 +1,151 @@
+import os
+import sys
+import glob
+import time
+import shutil
+import hashlib
+import datetime
+
+from config import ARTIFACT_ROOT, ARTIFACT_GC_GRACE_SECONDS, ARTIFACT_RUN_MAX_AGE_SECONDS
+from .database import (
+    add_artifact_ref,
+    release_artifact_refs,
+    find_unreferenced_artifacts,
+    delete_artifact_record,
+)
+
+OBJECTS_DIR = os.path.join(ARTIFACT_ROOT, "objects")
+RUNS_DIR = os.path.join(ARTIFACT_ROOT, "runs")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(sha256: str, ext: str = "") -> str:
+    """Location of an artifact: objects/<first two hex chars>/<sha256><ext>."""
+    return os.path.join(OBJECTS_DIR, sha256[:2], f"{sha256}{ext}")
+
+
+def store_artifact(source_path: str, ref: str, move: bool = True):
+    """Add a file to the store under its SHA-256 and reference it from `ref`.
+
+    Identical content is stored once: if the object already exists the source is
+    simply discarded (when move=True). Returns (sha256, object path).
+    """
+    sha256 = file_sha256(source_path)
+    ext = os.path.splitext(source_path)[1].lower()
+    target = object_path(sha256, ext)
+    size = os.path.getsize(source_path)
+
+    # Reference first so a concurrent GC can't drop the record between the two steps
+    add_artifact_ref(sha256, target, size, ref)
+
+    if os.path.exists(target):
+        if move and os.path.abspath(source_path) != os.path.abspath(target):
+            os.remove(source_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write under a unique temp name, then rename atomically so readers never see partial files
+        tmp_target = f"{target}.{os.getpid()}.tmp"
+        if move:
+            shutil.move(source_path, tmp_target)
+        else:
+            shutil.copyfile(source_path, tmp_target)
+        os.replace(tmp_target, target)
+
+    return sha256, target
+
+
+def run_ref(run_id: str) -> str:
+    return f"run:{run_id}"
+
+
+def link_for_run(object_file: str, run_id: str, name: str) -> str:
+    """Expose a stored object under a per-run name (symlink, hard link or copy as available)."""
+    run_dir = os.path.join(RUNS_DIR, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    link_path = os.path.join(run_dir, name)
+
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    try:
+        os.symlink(os.path.abspath(object_file), link_path)
+    except (OSError, NotImplementedError):
+        try:
+            os.link(object_file, link_path)
+        except OSError:
+            shutil.copyfile(object_file, link_path)
+    return link_path
+
+
+def store_for_run(source_path: str, run_id: str, name: str, move: bool = True) -> str:
+    """Store a file and return its per-run path, referenced by the run."""
+    sha256, target = store_artifact(source_path, run_ref(run_id), move=move)
+    return link_for_run(target, run_id, name)
+
+
+def release_run(run_id: str):
+    """Drop a run's references and its link directory."""
+    release_artifact_refs(run_ref(run_id))
+    shutil.rmtree(os.path.join(RUNS_DIR, run_id), ignore_errors=True)
+
+
+def gc_artifacts(grace_seconds: int = None, run_max_age_seconds: int = None):
+    """Expire old runs, then delete objects that have had no references for the grace period."""
+    grace_seconds = ARTIFACT_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    run_max_age_seconds = ARTIFACT_RUN_MAX_AGE_SECONDS if run_max_age_seconds is None else run_max_age_seconds
+
+    expired_runs = 0
+    if os.path.isdir(RUNS_DIR):
+        cutoff = time.time() - run_max_age_seconds
+        for run_id in os.listdir(RUNS_DIR):
+            if os.path.getmtime(os.path.join(RUNS_DIR, run_id)) < cutoff:
+                release_run(run_id)
+                expired_runs += 1
+
+    # Cache entries expired by MongoDB's TTL monitor never released their references
+    from .video_generator import release_expired_video_refs
+    release_expired_video_refs(grace_seconds)
+
+    released_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=grace_seconds)
+    deleted, freed = 0, 0
+    for artifact in find_unreferenced_artifacts(released_before):
+        # Move the object aside before deleting its record: a store_artifact racing with us
+        # then either writes a fresh copy (record gone) or we put the file back (re-referenced)
+        tombstone = f"{artifact['path']}.{os.getpid()}.gc"
+        try:
+            os.replace(artifact["path"], tombstone)
+        except FileNotFoundError:
+            tombstone = None
+
+        # The record delete is conditional on refcount <= 0, so re-referenced objects survive
+        if not delete_artifact_record(artifact["_id"]):
+            if tombstone:
+                os.replace(tombstone, artifact["path"])
+            continue
+
+        if tombstone:
+            os.remove(tombstone)
+            freed += artifact.get("size", 0)
+        # Posters and renditions derived from the object live next to it
+        for derived in glob.glob(os.path.splitext(artifact["path"])[0] + "_*"):
+            freed += os.path.getsize(derived)
+            os.remove(derived)
+        deleted += 1
+
+    print(f"🧹 Artifact GC: expired {expired_runs} runs, deleted {deleted} objects ({freed / (1024 * 1024):.1f} MB)")
+    return {"expired_runs": expired_runs, "deleted_objects": deleted, "freed_bytes": freed}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "gc":
+        from .database import connect_to_db
+        connect_to_db()
+        gc_artifacts()
+    else:
+        print("Usage: python -m utils.artifact_store gc")
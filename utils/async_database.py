@@ -0,0 +1,468 @@
+import os
+import time
+import asyncio
+import inspect
+import datetime
+import weakref
+
+from pymongo import WriteConcern
+from pymongo.errors import DuplicateKeyError
+
+# PyMongo >= 4.10 ships a native asyncio client; Motor offers the same API on older versions
+try:
+    from pymongo import AsyncMongoClient
+    ASYNC_DRIVER = "pymongo"
+except ImportError:
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+        ASYNC_DRIVER = "motor"
+    except ImportError:
+        AsyncMongoClient = None
+        ASYNC_DRIVER = None
+
+from .database import (
+    get_mongo_uri,
+    client_options,
+    DB_NAME,
+    LANDMARKS_COLLECTION_NAME,
+    VIDEOS_COLLECTION_NAME,
+    VIDEO_JOBS_COLLECTION_NAME,
+    CATALOG_ARTIFACTS_COLLECTION_NAME,
+    CATALOG_META_COLLECTION_NAME,
+    NEIGHBORS_COLLECTION_NAME,
+    CATEGORY_COLLATION,
+    VIDEO_CACHE_STATS_PIPELINE,
+    video_cache_stats,
+    video_touch_filter,
+    expiry_fields,
+    video_lease_fields,
+    video_lease_takeover,
+    video_lease_publish,
+    video_lease_release_filter,
+)
+from .nearby import geo_near_pipeline
+
+# Async clients belong to the event loop they were created on: one pooled client per loop
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """This event loop's pooled client, created on first use (None without an async driver)."""
+    if AsyncMongoClient is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(loop)
+    # A forked worker must not reuse its parent's sockets
+    if entry is None or entry[1] != os.getpid():
+        entry = _clients[loop] = (AsyncMongoClient(get_mongo_uri(), **client_options()), os.getpid())
+    return entry[0]
+
+
+def _collection(name):
+    client = get_async_client()
+    return client[DB_NAME][name] if client is not None else None
+
+
+async def _to_list(cursor):
+    # PyMongo's async aggregate() is a coroutine returning a cursor; Motor returns the cursor
+    if inspect.isawaitable(cursor):
+        cursor = await cursor
+    return await cursor.to_list(None)
+
+
+async def close_async_client():
+    """Close this event loop's client (call before the loop shuts down)."""
+    entry = _clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        result = entry[0].close()
+        if inspect.isawaitable(result):
+            await result
+
+
+async def health_check():
+    """Ping the server; returns {"ok", "latency_ms", "error"}."""
+    started = time.perf_counter()
+    try:
+        client = get_async_client()
+        if client is None:
+            raise RuntimeError("No async MongoDB driver installed (pymongo>=4.10 or motor)")
+        await client.admin.command("ping")
+        return {"ok": True, "latency_ms": (time.perf_counter() - started) * 1000, "error": None}
+    except Exception as e:
+        return {"ok": False, "latency_ms": (time.perf_counter() - started) * 1000, "error": str(e)}
+
+
+async def connect_to_db():
+    """Health-checks this loop's client and returns collections (landmarks, videos, db), or Nones."""
+    health = await health_check()
+    if not health["ok"]:
+        print(f"Failed to connect to MongoDB (async): {health['error']}")
+        return None, None, None
+
+    db = get_async_client()[DB_NAME]
+    return db[LANDMARKS_COLLECTION_NAME], db[VIDEOS_COLLECTION_NAME], db
+
+
+# --- Video Caching Functions ---
+
+async def get_cached_video(landmark_name, story_type="default"):
+    """Check if a video exists in cache for the given landmark and story type."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return None
+
+    try:
+        return await videos_collection.find_one({
+            "landmark_name": landmark_name.lower(),
+            "story_type": story_type
+        })
+    except Exception as e:
+        print(f"Error retrieving cached video: {e}")
+        return None
+
+
+async def get_cached_videos_for_landmark(landmark_name):
+    """Return all cached videos (any story type) for a landmark."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return []
+
+    try:
+        return await _to_list(videos_collection.find(
+            {"landmark_name": landmark_name.lower()},
+            {"_id": 0, "story_type": 1, "video_path": 1, "metadata": 1}
+        ))
+    except Exception as e:
+        print(f"Error retrieving cached videos: {e}")
+        return []
+
+
+async def touch_cached_video(landmark_name, story_type, touch_after_seconds, ttl_seconds=None):
+    """Record an access (unacknowledged, skipped if recently touched); see database.touch_cached_video."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return
+
+    now = datetime.datetime.utcnow()
+    try:
+        await videos_collection.with_options(write_concern=WriteConcern(w=0)).update_one(
+            video_touch_filter(landmark_name, story_type, now, touch_after_seconds),
+            {"$set": expiry_fields(now, ttl_seconds)}
+        )
+    except Exception as e:
+        print(f"Error touching cached video: {e}")
+
+
+async def save_cached_video(landmark_name, story_type, video_path, metadata=None, ttl_seconds=None):
+    """Save a generated video to cache; it expires ttl_seconds after its last access if given."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        await videos_collection.insert_one({
+            "landmark_name": landmark_name.lower(),
+            "story_type": story_type,
+            "video_path": video_path,
+            "metadata": metadata or {},
+            "created_at": now,
+            **expiry_fields(now, ttl_seconds)
+        })
+        return True
+    except Exception as e:
+        print(f"Error saving cached video: {e}")
+        return False
+
+
+async def update_cached_video(landmark_name, story_type, video_path, metadata=None, ttl_seconds=None):
+    """Update an existing cached video."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        result = await videos_collection.update_one(
+            {"landmark_name": landmark_name.lower(), "story_type": story_type},
+            {"$set": {
+                "video_path": video_path,
+                "metadata": metadata or {},
+                "updated_at": now,
+                **expiry_fields(now, ttl_seconds)
+            }}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error updating cached video: {e}")
+        return False
+
+
+async def delete_cached_video(landmark_name, story_type):
+    """Delete a cached video."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return False
+
+    try:
+        result = await videos_collection.delete_one({"landmark_name": landmark_name.lower(), "story_type": story_type})
+        return result.deleted_count > 0
+    except Exception as e:
+        print(f"Error deleting cached video: {e}")
+        return False
+
+
+async def count_cached_videos():
+    """Approximate number of cached videos from collection metadata; None if unavailable."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return None
+
+    try:
+        return await videos_collection.estimated_document_count()
+    except Exception as e:
+        print(f"Error counting cached videos: {e}")
+        return None
+
+
+async def get_cached_video_keys():
+    """Return (landmark_name, story_type) of every cached video; None if they can't be read."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return None
+
+    try:
+        docs = await _to_list(videos_collection.find({}, {"_id": 0, "landmark_name": 1, "story_type": 1}))
+        return [(doc["landmark_name"], doc["story_type"]) for doc in docs]
+    except Exception as e:
+        print(f"Error listing cached videos: {e}")
+        return None
+
+
+async def get_video_cache_stats():
+    """Get statistics about the video cache (one aggregation over the landmark_story index)."""
+    videos_collection = _collection(VIDEOS_COLLECTION_NAME)
+    if videos_collection is None:
+        return None
+
+    try:
+        return video_cache_stats(await _to_list(videos_collection.aggregate(VIDEO_CACHE_STATS_PIPELINE)))
+    except Exception as e:
+        print(f"Error getting cache stats: {e}")
+        return None
+
+
+# --- Video Generation Leases ---
+
+async def acquire_video_lease(cache_key, owner, ttl_seconds):
+    """Try to become the single generator for a cache key. Returns True if the lease is ours.
+
+    An expired lease (crashed owner, or a published result past its TTL) is taken over.
+    """
+    video_jobs_collection = _collection(VIDEO_JOBS_COLLECTION_NAME)
+    if video_jobs_collection is None:
+        # Without Mongo there is nobody to coordinate with - let the caller generate.
+        return True
+
+    now = datetime.datetime.utcnow()
+    lease = video_lease_fields(owner, now, ttl_seconds)
+
+    try:
+        await video_jobs_collection.insert_one({"_id": cache_key, **lease})
+        return True
+    except DuplicateKeyError:
+        pass
+    except Exception as e:
+        print(f"Error acquiring video lease: {e}")
+        return True
+
+    # Someone holds the lease - take it over only if it has expired
+    try:
+        result = await video_jobs_collection.update_one(*video_lease_takeover(cache_key, lease, now))
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error taking over video lease: {e}")
+        return False
+
+
+async def get_video_lease(cache_key):
+    """Return the lease document for a cache key (in progress or published), if any."""
+    video_jobs_collection = _collection(VIDEO_JOBS_COLLECTION_NAME)
+    if video_jobs_collection is None:
+        return None
+
+    try:
+        return await video_jobs_collection.find_one({"_id": cache_key})
+    except Exception as e:
+        print(f"Error reading video lease: {e}")
+        return None
+
+
+async def publish_video_lease(cache_key, owner, video_path, sha256, ttl_seconds):
+    """Hand a result that was not cached to the waiters; see database.publish_video_lease."""
+    video_jobs_collection = _collection(VIDEO_JOBS_COLLECTION_NAME)
+    if video_jobs_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        result = await video_jobs_collection.update_one(
+            *video_lease_publish(cache_key, owner, video_path, sha256, now, ttl_seconds)
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error publishing video lease: {e}")
+        return False
+
+
+async def release_video_lease(cache_key, owner):
+    """Release a lease we hold so waiters can read the cache (or retry after a failure).
+
+    A published lease is kept until it expires.
+    """
+    video_jobs_collection = _collection(VIDEO_JOBS_COLLECTION_NAME)
+    if video_jobs_collection is None:
+        return False
+
+    try:
+        result = await video_jobs_collection.delete_one(video_lease_release_filter(cache_key, owner))
+        return result.deleted_count > 0
+    except Exception as e:
+        print(f"Error releasing video lease: {e}")
+        return False
+
+
+# --- Precomputed Catalog Artifacts ---
+
+async def get_catalog_entry(landmark_id, template_version):
+    """Return the completed precompute for a catalog landmark matching the template version (any when None)."""
+    catalog_artifacts_collection = _collection(CATALOG_ARTIFACTS_COLLECTION_NAME)
+    if catalog_artifacts_collection is None:
+        return None
+
+    try:
+        query = {"_id": landmark_id, "status": "complete"}
+        if template_version is not None:
+            query["template_version"] = template_version
+        return await catalog_artifacts_collection.find_one(query)
+    except Exception as e:
+        print(f"Error retrieving catalog entry: {e}")
+        return None
+
+
+async def save_catalog_entry(landmark_id, landmark_name, template_version, fields):
+    """Publish a precompute for a catalog landmark, replacing the served one and clearing its staging state."""
+    catalog_artifacts_collection = _collection(CATALOG_ARTIFACTS_COLLECTION_NAME)
+    if catalog_artifacts_collection is None:
+        return False
+
+    try:
+        await catalog_artifacts_collection.update_one(
+            {"_id": landmark_id},
+            {"$set": {
+                "landmark_name": landmark_name,
+                "template_version": template_version,
+                "updated_at": datetime.datetime.utcnow(),
+                **fields
+            }, "$unset": {"staging": ""}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error saving catalog entry: {e}")
+        return False
+
+
+async def stage_catalog_entry(landmark_id, template_version, status, error=None):
+    """Record a precompute in progress or failed without touching the published entry."""
+    catalog_artifacts_collection = _collection(CATALOG_ARTIFACTS_COLLECTION_NAME)
+    if catalog_artifacts_collection is None:
+        return False
+
+    try:
+        await catalog_artifacts_collection.update_one(
+            {"_id": landmark_id},
+            {"$set": {"staging": {
+                "template_version": template_version,
+                "status": status,
+                "error": error,
+                "updated_at": datetime.datetime.utcnow(),
+            }}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error staging catalog entry: {e}")
+        return False
+
+
+# --- Landmarks ---
+
+async def get_catalog_version():
+    """Current version counter of the landmarks catalog (0 if never bumped, None if unavailable)."""
+    catalog_meta_collection = _collection(CATALOG_META_COLLECTION_NAME)
+    if catalog_meta_collection is None:
+        return None
+
+    try:
+        doc = await catalog_meta_collection.find_one({"_id": "landmarks"})
+        return doc.get("version", 0) if doc else 0
+    except Exception as e:
+        print(f"Error reading catalog version: {e}")
+        return None
+
+
+async def find_landmark(name):
+    """The landmark with this exact name, ignoring case (first in catalog order); None if absent."""
+    landmarks_collection = _collection(LANDMARKS_COLLECTION_NAME)
+    if landmarks_collection is None:
+        return None
+
+    try:
+        return await landmarks_collection.find_one(
+            {"name": name.strip()}, {"_id": 0, "location": 0}, collation=CATEGORY_COLLATION
+        )
+    except Exception as e:
+        print(f"Error finding landmark: {e}")
+        return None
+
+
+async def geo_near_landmarks(latitude, longitude, limit=None, max_distance_km=None, category=None, exclude_names=()):
+    """Landmarks nearest first, with distance_km, via $geoNear (see utils.nearby.geo_near_pipeline)."""
+    landmarks_collection = _collection(LANDMARKS_COLLECTION_NAME)
+    if landmarks_collection is None:
+        return []
+
+    try:
+        pipeline = geo_near_pipeline(latitude, longitude, limit, max_distance_km, category, exclude_names)
+        return await _to_list(landmarks_collection.aggregate(pipeline, collation=CATEGORY_COLLATION))
+    except Exception as e:
+        print(f"Error querying nearby landmarks: {e}")
+        return []
+
+
+async def get_neighbor_entry(name_lower):
+    """Neighbour entry of the first catalog landmark with this (lowercase) name."""
+    neighbors_collection = _collection(NEIGHBORS_COLLECTION_NAME)
+    if neighbors_collection is None:
+        return None
+
+    try:
+        return await neighbors_collection.find_one({"name_lower": name_lower}, sort=[("position", 1)])
+    except Exception as e:
+        print(f"Error reading neighbour entry: {e}")
+        return None
+
+
+async def get_neighbor_table_meta():
+    """Catalog version, K and categories the stored neighbour table was built for."""
+    catalog_meta_collection = _collection(CATALOG_META_COLLECTION_NAME)
+    if catalog_meta_collection is None:
+        return None
+
+    try:
+        return await catalog_meta_collection.find_one({"_id": "neighbors"})
+    except Exception as e:
+        print(f"Error reading neighbour table metadata: {e}")
+        return None
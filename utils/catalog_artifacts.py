@@ -0,0 +1,160 @@
+import copy
+import hashlib
+import os
+import uuid
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config import GEMINI_MODEL, NARRATION_VOICE, NARRATION_RATE, NARRATION_PITCH, NARRATION_MODE
+from prompts import templates
+from .artifact_store import store_artifact, link_for_run, release_run
+from .catalog_ingest import stable_landmark_id
+from .database import get_catalog_entry, save_catalog_entry, stage_catalog_entry, release_artifact_refs
+
+
+def template_version() -> str:
+    """Hash of everything that shapes a precompute; changing a prompt or voice setting invalidates old entries."""
+    parts = [
+        templates.CATALOG_ANALYSIS_PROMPT,
+        templates.STORY_CREATION_PROMPT,
+        templates.SHOTS_CREATION_PROMPT,
+        GEMINI_MODEL,
+        NARRATION_VOICE,
+        NARRATION_RATE,
+        NARRATION_PITCH,
+        NARRATION_MODE,
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def catalog_ref(landmark_id) -> str:
+    return f"catalog:{landmark_id}"
+
+
+def catalog_landmark_id(landmark) -> str:
+    """Key of a landmark's precompute: its stored _id (landmark_id in snapshots), else its stable id."""
+    for key in ("_id", "landmark_id"):
+        if landmark.get(key) is not None:
+            return str(landmark[key])
+    return stable_landmark_id(landmark)
+
+
+def resolve_catalog_landmark(landmark_name: str):
+    """Map an extracted name onto (landmark id, catalog name) of the landmark it refers to, or None."""
+    from .recommendation import load_landmarks, fuzzy_match_landmark, lowercase_names
+
+    landmarks_df = load_landmarks()
+    if landmarks_df.empty or not landmark_name:
+        return None
+
+    match = landmarks_df[lowercase_names(landmarks_df) == landmark_name.strip().lower()]
+    if match.empty:
+        match = fuzzy_match_landmark(landmark_name, landmarks_df, threshold=0.8)
+    if match.empty:
+        return None
+    landmark = match.iloc[0]
+    return catalog_landmark_id(landmark), landmark["name"]
+
+
+def precompute_landmark(landmark: dict, force: bool = False) -> str:
+    """Generate and store analysis, story, shots and narration for one catalog landmark.
+
+    Returns "skipped" (already done for this template version), "complete" or "failed".
+    Progress and failures are kept in the entry's staging state; the published entry is
+    only replaced once the new one is complete, then its old narration is released.
+    """
+    from agents.nodes import story_telling_node, shots_creation_node, narration_generation_node
+    from utils.llm_factory import initialize_llm
+
+    name = landmark["name"]
+    landmark_id = catalog_landmark_id(landmark)
+    version = template_version()
+    if not force and get_catalog_entry(landmark_id, version):
+        return "skipped"
+
+    previous = get_catalog_entry(landmark_id, None)
+    previous_audio = {shot["audio_sha256"] for shot in (previous or {}).get("shots_description", []) if shot.get("audio_sha256")}
+    new_audio = set()
+    stage_catalog_entry(landmark_id, version, "in_progress")
+    run_id = f"catalog-{uuid.uuid4().hex}"
+
+    try:
+        llm = initialize_llm()
+        prompt = templates.CATALOG_ANALYSIS_PROMPT.format(
+            landmark_name=name,
+            governorate=landmark.get("governorate", ""),
+            category=landmark.get("category", ""),
+        )
+        analysis = llm.invoke([
+            SystemMessage(content=prompt),
+            HumanMessage(content="Write the landmark analysis now.")
+        ]).content.strip()
+
+        state = {
+            "run_id": run_id,
+            "image_analysis": analysis,
+            "landmark_name": name,
+            "messages": [],
+            "progress_log": "",
+        }
+        state = story_telling_node(state)
+        state = shots_creation_node(state)
+        state = narration_generation_node(state)
+
+        shots = state.get("shots_description", [])
+        if not state.get("created_telling_story") or not shots:
+            raise RuntimeError(state["messages"][-1] if state["messages"] else "story or shots missing")
+
+        # Re-reference narration from the catalog so it outlives the temporary run
+        for shot in shots:
+            if shot.get("audio_path"):
+                sha256, object_file = store_artifact(shot["audio_path"], catalog_ref(landmark_id), move=False)
+                shot["audio_sha256"] = sha256
+                shot["audio_path"] = object_file
+                new_audio.add(sha256)
+
+        if not save_catalog_entry(landmark_id, name, version, {
+            "status": "complete",
+            "governorate": landmark.get("governorate"),
+            "category": landmark.get("category"),
+            "image_analysis": analysis,
+            "created_telling_story": state["created_telling_story"],
+            "shots_description": shots,
+        }):
+            raise RuntimeError("could not save the catalog entry")
+
+        # The replaced entry's narration is no longer referenced by the catalog
+        for sha256 in previous_audio - new_audio:
+            release_artifact_refs(catalog_ref(landmark_id), sha256=sha256)
+        return "complete"
+
+    except Exception as e:
+        print(f"Catalog precompute failed for {name}: {e}")
+        stage_catalog_entry(landmark_id, version, "failed", str(e))
+        # Drop references to narration only this attempt stored; the published entry keeps its own
+        for sha256 in new_audio - previous_audio:
+            release_artifact_refs(catalog_ref(landmark_id), sha256=sha256)
+        return "failed"
+    finally:
+        release_run(run_id)
+
+
+def load_precomputed(landmark_id: str, run_id: str):
+    """Return the precomputed story and shots for a catalog landmark, with narration linked into the run."""
+    entry = get_catalog_entry(landmark_id, template_version())
+    if not entry:
+        return None
+
+    shots = copy.deepcopy(entry.get("shots_description", []))
+    for i, shot in enumerate(shots):
+        audio_path = shot.get("audio_path")
+        if audio_path and os.path.exists(audio_path):
+            shot["audio_path"] = link_for_run(audio_path, run_id, f"shot_{i + 1}_narration.mp3")
+        else:
+            shot.pop("audio_path", None)
+
+    return {
+        "landmark_name": entry["landmark_name"],
+        "created_telling_story": entry["created_telling_story"],
+        "shots_description": shots,
+    }
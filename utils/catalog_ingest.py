@@ -0,0 +1,224 @@
+import os
+import csv
+import json
+import math
+import time
+import hashlib
+from collections import Counter
+
+from tqdm import tqdm
+
+from config import INGEST_BATCH_SIZE
+from .database import (
+    get_collections, get_landmarks_shadow_collection, upsert_landmarks, swap_landmarks_collection,
+    ensure_landmark_geo_index, landmark_location, bump_catalog_version,
+)
+from .name_index import normalize_name
+from .neighbor_table import build_neighbor_table
+
+_LATITUDE_KEYS = ("latitude", "lat")
+_LONGITUDE_KEYS = ("longitude", "lon", "lng", "long")
+_ID_KEYS = ("landmark_id", "id")
+# Rejected rows reported by reason, with this many examples each
+_REJECT_SAMPLES = 3
+
+
+# --- Readers ---
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_json_lines(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _geojson_records(features):
+    for feature in features:
+        record = dict(feature.get("properties") or {})
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point" and len(geometry.get("coordinates") or []) >= 2:
+            record["longitude"], record["latitude"] = geometry["coordinates"][:2]
+        if feature.get("id") is not None:
+            record.setdefault("id", feature["id"])
+        yield record
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+        yield from _geojson_records(data.get("features") or [])
+    elif isinstance(data, dict):
+        yield from data.get("landmarks") or []
+    else:
+        yield from data
+
+
+def read_landmark_file(path: str):
+    """Raw landmark rows from a CSV, JSON (array or JSON Lines) or GeoJSON file.
+
+    CSV and JSON Lines are streamed; JSON arrays and GeoJSON are parsed whole.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return _read_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return _read_json_lines(path)
+    if extension in (".json", ".geojson"):
+        return _read_json(path)
+    raise ValueError(f"Unsupported landmark file type: {path}")
+
+
+# --- Validation ---
+
+def _coordinate(raw: dict, keys):
+    for key in keys:
+        value = raw.get(key)
+        if value not in (None, ""):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None
+            return value if math.isfinite(value) else None
+    return None
+
+
+def stable_landmark_id(raw: dict) -> str:
+    """The source's own id if it has one, else a hash of the normalized name and governorate.
+
+    Coordinates are left out so that moving a landmark updates it in place.
+    """
+    for key in _ID_KEYS:
+        if raw.get(key) not in (None, ""):
+            return str(raw[key])
+    key = f"{normalize_name(raw.get('name'))}|{normalize_name(raw.get('governorate'))}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def prepare_landmark(raw: dict):
+    """(document, None) for a valid row, or (None, reason) for a rejected one."""
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        return None, "missing name"
+
+    latitude = _coordinate(raw, _LATITUDE_KEYS)
+    longitude = _coordinate(raw, _LONGITUDE_KEYS)
+    if latitude is None or longitude is None:
+        return None, "missing or non-numeric coordinates"
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        return None, "coordinates out of range"
+    if latitude == 0.0 and longitude == 0.0:
+        return None, "null island (0, 0) coordinates"
+
+    return {
+        "_id": stable_landmark_id(raw),
+        "name": name,
+        "governorate": str(raw.get("governorate") or "").strip(),
+        "category": str(raw.get("category") or "").strip(),
+        "latitude": latitude,
+        "longitude": longitude,
+        "location": landmark_location(latitude, longitude),
+    }, None
+
+
+# --- Ingestion ---
+
+def ingest_landmarks(rows, replace: bool = False, batch_size: int = INGEST_BATCH_SIZE, total: int = None,
+                     build_neighbors: bool = False):
+    """Validate landmark rows and bulk-upsert them by stable id.
+
+    Rows sharing a stable id (the same name and governorate with no source id) are one
+    landmark: the first is kept and the rest are counted as merged.
+
+    With replace, rows load into a shadow collection of this run that then atomically
+    replaces the live one (landmarks missing from the input disappear); if any row fails
+    to write or the shadow can't be given its 2dsphere index, the shadow is dropped and
+    the live catalog left untouched. Otherwise rows are upserted
+    into the live collection. Re-running with the same input changes nothing. The catalog
+    version is bumped afterwards; the neighbour table is only rebuilt with build_neighbors
+    (on a large catalog, run build_neighbors.py separately). Returns ingestion stats.
+    """
+    landmarks_collection, videos_collection, db = get_collections()
+    if landmarks_collection is None:
+        print("Database connection not established. Aborting ingestion.")
+        return None
+
+    target = get_landmarks_shadow_collection() if replace else landmarks_collection
+    stats = Counter()
+    rejected = {}
+    merged = []
+    seen_ids = set()
+    started = time.perf_counter()
+    batch = []
+
+    def _flush():
+        inserted, updated, written = upsert_landmarks(batch, target)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        stats["failed"] += len(batch) - written
+        batch.clear()
+
+    with tqdm(total=total, desc="Ingesting Landmarks", unit="landmark") as pbar:
+        for row_number, raw in enumerate(rows, 1):
+            stats["read"] += 1
+            doc, reason = prepare_landmark(raw)
+            if reason:
+                stats["rejected"] += 1
+                samples = rejected.setdefault(reason, [])
+                if len(samples) < _REJECT_SAMPLES:
+                    samples.append(f"row {row_number}: {raw.get('name') or '?'}")
+            elif doc["_id"] in seen_ids:
+                stats["merged"] += 1
+                if len(merged) < _REJECT_SAMPLES:
+                    merged.append(f"row {row_number}: {doc['name']}")
+            else:
+                seen_ids.add(doc["_id"])
+                batch.append(doc)
+            if len(batch) >= batch_size:
+                _flush()
+            pbar.update(1)
+        if batch:
+            _flush()
+
+    accepted = stats["read"] - stats["rejected"] - stats["merged"]
+    seconds = time.perf_counter() - started
+    stats["seconds"] = seconds
+    print(
+        f"\nIngested {accepted - stats['failed']} landmarks from {stats['read']} rows in {seconds:.1f} s "
+        f"({stats['read'] / max(seconds, 1e-9):,.0f} rows/s): {stats['inserted']} new, {stats['updated']} updated, "
+        f"{stats['merged']} duplicates merged, {stats['rejected']} rejected, {stats['failed']} failed to write"
+    )
+    if merged:
+        print(f"  merged (same stable id as an earlier row): {', '.join(merged)}")
+    for reason, samples in rejected.items():
+        print(f"  rejected ({reason}): {', '.join(samples)}")
+
+    indexed = ensure_landmark_geo_index(target)
+    if replace:
+        if accepted == 0 or stats["failed"]:
+            print("Incomplete load; dropping the shadow collection and keeping the current catalog.")
+            target.drop()
+            return dict(stats)
+        # The $geoNear backend needs the 2dsphere index the moment the catalog goes live
+        if not indexed:
+            print("Shadow collection has no geo index; dropping it and keeping the current catalog.")
+            target.drop()
+            return dict(stats)
+        if not swap_landmarks_collection(target):
+            print("Keeping the current catalog.")
+            target.drop()
+            return dict(stats)
+
+    # Running apps reload their catalog snapshot
+    bump_catalog_version()
+    if build_neighbors:
+        build_neighbor_table()
+    else:
+        print("Neighbour table not rebuilt; run build_neighbors.py to refresh it (stale tables are ignored).")
+
+    return dict(stats)
@@ -1,6 +1,15 @@
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ConfigurationError
+import re
+import math
+import time
+import uuid
+import random
+import datetime
+import threading
+from collections import defaultdict
+from pymongo import MongoClient, ASCENDING, GEOSPHERE, ReplaceOne, UpdateOne, WriteConcern
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, ConfigurationError, DuplicateKeyError, OperationFailure
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -8,90 +17,326 @@ load_dotenv()
 
 # --- Configuration ---
 def get_mongo_uri():
-    """Get MongoDB URI, reloading from environment each time."""
-    load_dotenv()  # Reload environment variables
+    """MongoDB URI from the environment (.env is loaded once, at import)."""
     return os.getenv("MONGO_URI", "mongodb://localhost:27017/historical_videos")
 
 MONGO_URI = get_mongo_uri()
 DB_NAME = "landmark_db"
 LANDMARKS_COLLECTION_NAME = "landmarks"
+# Each full catalog load gets its own "<prefix>_<unix time>_<random>" scratch collection;
+# ones left behind by crashed loads are dropped after a day
+LANDMARKS_SHADOW_COLLECTION_PREFIX = "landmarks_shadow"
+LANDMARKS_SHADOW_MAX_AGE_SECONDS = 24 * 3600
 VIDEOS_COLLECTION_NAME = "cached_videos"
+VIDEO_JOBS_COLLECTION_NAME = "video_jobs"
+ARTIFACTS_COLLECTION_NAME = "artifacts"
+CATALOG_ARTIFACTS_COLLECTION_NAME = "catalog_artifacts"
+POPULARITY_COLLECTION_NAME = "landmark_popularity"
+TTS_CACHE_COLLECTION_NAME = "tts_cache"
+CATALOG_META_COLLECTION_NAME = "catalog_meta"
+NEIGHBORS_COLLECTION_NAME = "landmark_neighbors"
+# catalog_meta document holding the running size of the TTS cache, recounted at most daily
+TTS_CACHE_SIZE_ID = "tts_cache_size"
+TTS_CACHE_SIZE_RECONCILE_SECONDS = 24 * 3600
+# Landmark positions are GeoJSON points in "location"; category filters ignore case
+LANDMARK_GEO_INDEX = [("location", GEOSPHERE), ("category", ASCENDING)]
+CATEGORY_COLLATION = {"locale": "en", "strength": 2}
+
+# Connection pool (one client per process, created on first use)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))  # 0 = no timeout
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+# Failed connection attempts back off exponentially (with jitter) up to the max
+MONGO_RECONNECT_BACKOFF_SECONDS = float(os.getenv("MONGO_RECONNECT_BACKOFF_SECONDS", "1"))
+MONGO_RECONNECT_BACKOFF_MAX_SECONDS = float(os.getenv("MONGO_RECONNECT_BACKOFF_MAX_SECONDS", "60"))
 
 # --- Global Variables ---
 client = None
+client_pid = None
 db = None
 landmarks_collection = None
+videos_collection = None
+video_jobs_collection = None
+artifacts_collection = None
+catalog_artifacts_collection = None
+popularity_collection = None
+tts_cache_collection = None
+catalog_meta_collection = None
+neighbors_collection = None
 
-def connect_to_db():
-    """Establishes a connection to MongoDB and returns collections."""
-    global client, db, landmarks_collection, videos_collection
+_client_lock = threading.Lock()
+_reconnect = {"failures": 0, "next_attempt_at": 0.0, "last_error": None}
 
-    # Get fresh URI each time
-    current_uri = get_mongo_uri()
 
-    if not current_uri:
-        print("ERROR: MONGO_URI is not set in the .env file.")
-        print("Please make sure your .env file contains: MONGO_URI=mongodb://localhost:27017/historical_videos")
-        return None, None, None
+# --- Metrics ---
 
-    try:
-        print(f"Attempting to connect to MongoDB at {current_uri}...")
+class _DatabaseMetrics(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    """Per-command latency and connection pool counts, fed by PyMongo's event listeners."""
 
-        # Close existing connection if any
-        if client:
-            try:
-                client.close()
-            except:
-                pass
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
 
-        # Create new connection
-        client = MongoClient(current_uri)
-        db = client[DB_NAME]
+    def reset(self):
+        with self._lock:
+            self.commands = defaultdict(lambda: {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0})
+            self.pool = defaultdict(int)
 
-        # Test the connection
-        client.admin.command('ping')
-        print(f"Successfully connected to MongoDB!")
+    def _command_done(self, event, failed):
+        ms = event.duration_micros / 1000.0
+        with self._lock:
+            stats = self.commands[event.command_name]
+            stats["count"] += 1
+            stats["failures"] += failed
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
 
-        # Get collections
-        landmarks_collection = db[LANDMARKS_COLLECTION_NAME]
-        videos_collection = db[VIDEOS_COLLECTION_NAME]
+    def started(self, event):
+        pass
 
-        # Create collections if they don't exist
-        try:
-            db.create_collection(LANDMARKS_COLLECTION_NAME)
-            db.create_collection(VIDEOS_COLLECTION_NAME)
-            print(f"Database '{DB_NAME}' and collections '{LANDMARKS_COLLECTION_NAME}', '{VIDEOS_COLLECTION_NAME}' are ready.")
-        except:
-            print(f"Collections already exist in database '{DB_NAME}'.")
+    def succeeded(self, event):
+        self._command_done(event, False)
 
-        return landmarks_collection, videos_collection, db
+    def failed(self, event):
+        self._command_done(event, True)
 
-    except ConnectionFailure as e:
-        print(f"Failed to connect to MongoDB: {e}")
-        print("Please check your internet connection and MongoDB server status.")
-        landmarks_collection, videos_collection, db = None, None, None
+    def _count(self, key, delta=1):
+        with self._lock:
+            self.pool[key] += delta
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count("connections_created")
+        self._count("connections_open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count("connections_closed")
+        self._count("connections_open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._count("checkouts")
+        self._count("checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._count("checked_out", -1)
+
+    def snapshot(self):
+        with self._lock:
+            commands = {
+                name: dict(stats, mean_ms=stats["total_ms"] / stats["count"] if stats["count"] else 0.0)
+                for name, stats in self.commands.items()
+            }
+            return {"commands": commands, "pool": dict(self.pool)}
+
+
+_metrics = _DatabaseMetrics()
+
+
+def get_db_metrics():
+    """Connection pool counts and per-command latency (count, failures, mean/max ms) for this process."""
+    metrics = _metrics.snapshot()
+    metrics["reconnect_failures"] = _reconnect["failures"]
+    metrics["last_error"] = _reconnect["last_error"]
+    return metrics
+
+
+# --- Connection ---
+
+def client_options():
+    """Pool, timeout, read preference and monitoring options shared by the sync and async clients."""
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "event_listeners": [_metrics],
+    }
+
+
+def _create_client():
+    return MongoClient(get_mongo_uri(), **client_options())
+
+
+def _bind_collections(bound_db):
+    """Point the module's collection globals at bound_db (None clears them)."""
+    global landmarks_collection, videos_collection, video_jobs_collection, artifacts_collection
+    global catalog_artifacts_collection, popularity_collection, tts_cache_collection, catalog_meta_collection
+    global neighbors_collection
+
+    if bound_db is None:
+        landmarks_collection = videos_collection = video_jobs_collection = artifacts_collection = None
+        catalog_artifacts_collection = popularity_collection = tts_cache_collection = None
+        catalog_meta_collection = neighbors_collection = None
+        return
+
+    landmarks_collection = bound_db[LANDMARKS_COLLECTION_NAME]
+    videos_collection = bound_db[VIDEOS_COLLECTION_NAME]
+    video_jobs_collection = bound_db[VIDEO_JOBS_COLLECTION_NAME]
+    artifacts_collection = bound_db[ARTIFACTS_COLLECTION_NAME]
+    catalog_artifacts_collection = bound_db[CATALOG_ARTIFACTS_COLLECTION_NAME]
+    popularity_collection = bound_db[POPULARITY_COLLECTION_NAME]
+    tts_cache_collection = bound_db[TTS_CACHE_COLLECTION_NAME]
+    catalog_meta_collection = bound_db[CATALOG_META_COLLECTION_NAME]
+    neighbors_collection = bound_db[NEIGHBORS_COLLECTION_NAME]
+
+
+def get_client():
+    """The process-wide pooled client, created on first use (it connects in the background)."""
+    global client, client_pid, db
+
+    if client is None or client_pid != os.getpid():
+        with _client_lock:
+            if client is None or client_pid != os.getpid():
+                client = _create_client()
+                client_pid = os.getpid()
+                db = client[DB_NAME]
+    return client
+
+
+def _after_fork_in_child():
+    """MongoClient isn't fork-safe: drop the parent's client in a forked worker.
+
+    The child starts disconnected, like a spawned one; its first get_collections() /
+    connect_to_db() opens its own pool, so workers that never touch Mongo open none.
+    """
+    global _client_lock, client, client_pid, db
+    # Locks held by other parent threads at fork time stay locked forever in the child
+    _client_lock = threading.Lock()
+    _metrics._lock = threading.Lock()
+    _metrics.reset()
+    client = client_pid = db = None
+    _bind_collections(None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def health_check():
+    """Ping the server; returns {"ok", "latency_ms", "error"}."""
+    started = time.perf_counter()
+    try:
+        get_client().admin.command("ping")
+        return {"ok": True, "latency_ms": (time.perf_counter() - started) * 1000, "error": None}
+    except Exception as e:
+        return {"ok": False, "latency_ms": (time.perf_counter() - started) * 1000, "error": str(e)}
+
+
+def _record_failure(error):
+    _reconnect["failures"] += 1
+    _reconnect["last_error"] = error
+    delay = min(MONGO_RECONNECT_BACKOFF_MAX_SECONDS, MONGO_RECONNECT_BACKOFF_SECONDS * 2 ** (_reconnect["failures"] - 1))
+    _reconnect["next_attempt_at"] = time.time() + delay * random.uniform(0.5, 1.0)
+    _bind_collections(None)
+
+
+def connect_to_db():
+    """Health-checks the pooled client and returns collections (landmarks, videos, db).
+
+    The client is created once per process and reused, never closed and recreated. While
+    MongoDB is unreachable the collections are None and further attempts are skipped until
+    an exponential backoff delay has passed.
+    """
+    if not get_mongo_uri():
+        print("ERROR: MONGO_URI is not set in the .env file.")
+        print("Please make sure your .env file contains: MONGO_URI=mongodb://localhost:27017/historical_videos")
+        return None, None, None
+
+    if _reconnect["failures"] and time.time() < _reconnect["next_attempt_at"]:
         return None, None, None
+
+    try:
+        get_client()
     except ConfigurationError as e:
         print(f"MongoDB configuration error: {e}")
-        landmarks_collection, videos_collection, db = None, None, None
+        _record_failure(str(e))
         return None, None, None
-    except Exception as e:
-        print(f"Unexpected error connecting to MongoDB: {e}")
-        landmarks_collection, videos_collection, db = None, None, None
+
+    health = health_check()
+    if not health["ok"]:
+        print(f"Failed to connect to MongoDB: {health['error']}")
+        print("Please check your internet connection and MongoDB server status.")
+        _record_failure(health["error"])
         return None, None, None
 
+    _reconnect["failures"] = 0
+    _reconnect["last_error"] = None
+    first_connect = landmarks_collection is None
+    _bind_collections(db)
+    if first_connect:
+        print(f"Successfully connected to MongoDB ({health['latency_ms']:.0f} ms ping, pool of up to {MONGO_MAX_POOL_SIZE}).")
+        ensure_video_cache_indexes()
+    return landmarks_collection, videos_collection, db
 
-def get_collections():
-    """Get current collections, connecting if necessary."""
-    global landmarks_collection, videos_collection, db
 
-    if landmarks_collection is None or videos_collection is None:
-        print("Reconnecting to database...")
+def get_collections():
+    """Current collections, connecting (subject to backoff) if not connected yet."""
+    if landmarks_collection is None or client_pid != os.getpid():
         connect_to_db()
     return landmarks_collection, videos_collection, db
 
 # --- Video Caching Functions ---
 
+def ensure_video_cache_indexes():
+    """Lookup and expiry indexes on cached_videos; safe to call repeatedly.
+
+    One entry per (landmark_name, story_type) is enforced when existing data allows it.
+    Entries with an expires_at date are removed by MongoDB's TTL monitor once it passes.
+    """
+    if videos_collection is None:
+        return False
+
+    try:
+        try:
+            videos_collection.create_index(
+                [("landmark_name", ASCENDING), ("story_type", ASCENDING)], name="landmark_story", unique=True
+            )
+        except OperationFailure as e:
+            # Duplicate entries from before the index existed; keep lookups fast anyway
+            print(f"Cached videos have duplicate keys, lookup index is not unique: {e}")
+            videos_collection.create_index(
+                [("landmark_name", ASCENDING), ("story_type", ASCENDING)], name="landmark_story_lookup"
+            )
+        videos_collection.create_index("expires_at", name="expires_at_ttl", expireAfterSeconds=0)
+        return True
+    except Exception as e:
+        print(f"Error creating cached video indexes: {e}")
+        return False
+
+def expiry_fields(now, ttl_seconds):
+    """last_accessed, plus expires_at when entries expire ttl_seconds after their last access."""
+    fields = {"last_accessed": now}
+    if ttl_seconds:
+        fields["expires_at"] = now + datetime.timedelta(seconds=ttl_seconds)
+    return fields
+
 def get_cached_video(landmark_name, story_type="default"):
     """Check if a video exists in cache for the given landmark and story type."""
     if videos_collection is None:
@@ -107,19 +352,64 @@ def get_cached_video(landmark_name, story_type="default"):
         print(f"Error retrieving cached video: {e}")
         return None
 
-def save_cached_video(landmark_name, story_type, video_path, metadata=None):
-    """Save a generated video to cache."""
+def get_cached_videos_for_landmark(landmark_name):
+    """Return all cached videos (any story type) for a landmark."""
+    if videos_collection is None:
+        return []
+
+    try:
+        return list(videos_collection.find(
+            {"landmark_name": landmark_name.lower()},
+            {"_id": 0, "story_type": 1, "video_path": 1, "metadata": 1}
+        ))
+    except Exception as e:
+        print(f"Error retrieving cached videos: {e}")
+        return []
+
+def video_touch_filter(landmark_name, story_type, now, touch_after_seconds):
+    """Matches the entry only if its last access is older than touch_after_seconds."""
+    return {
+        "landmark_name": landmark_name.lower(),
+        "story_type": story_type,
+        "$or": [
+            {"last_accessed": {"$lt": now - datetime.timedelta(seconds=touch_after_seconds)}},
+            {"last_accessed": {"$exists": False}},
+        ],
+    }
+
+def touch_cached_video(landmark_name, story_type, touch_after_seconds, ttl_seconds=None):
+    """Record an access: bump last_accessed (and push back expires_at) if older than touch_after_seconds.
+
+    Unacknowledged (w=0) and skipped server-side when recently touched, so a cache hit
+    costs no extra round trip.
+    """
+    if videos_collection is None:
+        return
+
+    now = datetime.datetime.utcnow()
+    try:
+        videos_collection.with_options(write_concern=WriteConcern(w=0)).update_one(
+            video_touch_filter(landmark_name, story_type, now, touch_after_seconds),
+            {"$set": expiry_fields(now, ttl_seconds)}
+        )
+    except Exception as e:
+        print(f"Error touching cached video: {e}")
+
+def save_cached_video(landmark_name, story_type, video_path, metadata=None, ttl_seconds=None):
+    """Save a generated video to cache; it expires ttl_seconds after its last access if given."""
     if videos_collection is None:
         print("Videos collection not available")
         return False
 
     try:
+        now = datetime.datetime.utcnow()
         video_doc = {
             "landmark_name": landmark_name.lower(),
             "story_type": story_type,
             "video_path": video_path,
             "metadata": metadata or {},
-            "created_at": __import__('datetime').datetime.utcnow()
+            "created_at": now,
+            **expiry_fields(now, ttl_seconds)
         }
 
         result = videos_collection.insert_one(video_doc)
@@ -129,12 +419,13 @@ def save_cached_video(landmark_name, story_type, video_path, metadata=None):
         print(f"Error saving cached video: {e}")
         return False
 
-def update_cached_video(landmark_name, story_type, video_path, metadata=None):
+def update_cached_video(landmark_name, story_type, video_path, metadata=None, ttl_seconds=None):
     """Update an existing cached video."""
     if videos_collection is None:
         return False
 
     try:
+        now = datetime.datetime.utcnow()
         result = videos_collection.update_one(
             {
                 "landmark_name": landmark_name.lower(),
@@ -144,7 +435,8 @@ def update_cached_video(landmark_name, story_type, video_path, metadata=None):
                 "$set": {
                     "video_path": video_path,
                     "metadata": metadata or {},
-                    "updated_at": __import__('datetime').datetime.utcnow()
+                    "updated_at": now,
+                    **expiry_fields(now, ttl_seconds)
                 }
             }
         )
@@ -153,6 +445,21 @@ def update_cached_video(landmark_name, story_type, video_path, metadata=None):
         print(f"Error updating cached video: {e}")
         return False
 
+def set_cached_video_renditions(landmark_name, story_type, renditions):
+    """Record the transcoded renditions (name -> path) of a cached video."""
+    if videos_collection is None:
+        return False
+
+    try:
+        result = videos_collection.update_one(
+            {"landmark_name": landmark_name.lower(), "story_type": story_type},
+            {"$set": {"metadata.renditions": renditions}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error recording renditions: {e}")
+        return False
+
 def delete_cached_video(landmark_name, story_type):
     """Delete a cached video."""
     if videos_collection is None:
@@ -168,21 +475,662 @@ def delete_cached_video(landmark_name, story_type):
         print(f"Error deleting cached video: {e}")
         return False
 
+def count_cached_videos():
+    """Approximate number of cached videos from collection metadata; None if unavailable."""
+    if videos_collection is None:
+        return None
+
+    try:
+        return videos_collection.estimated_document_count()
+    except Exception as e:
+        print(f"Error counting cached videos: {e}")
+        return None
+
+def get_cached_video_keys():
+    """Return (landmark_name, story_type) of every cached video; None if they can't be read."""
+    if videos_collection is None:
+        return None
+
+    try:
+        return [
+            (doc["landmark_name"], doc["story_type"])
+            for doc in videos_collection.find({}, {"_id": 0, "landmark_name": 1, "story_type": 1})
+        ]
+    except Exception as e:
+        print(f"Error listing cached videos: {e}")
+        return None
+
+# Sorting on the index prefix lets MongoDB answer from index keys instead of documents
+VIDEO_CACHE_STATS_PIPELINE = [
+    {"$sort": {"landmark_name": 1}},
+    {"$group": {"_id": "$landmark_name", "videos": {"$sum": 1}}},
+    {"$group": {"_id": None, "total_videos": {"$sum": "$videos"}, "unique_landmarks": {"$sum": 1}}},
+]
+
+def video_cache_stats(result):
+    """Stats dict from the VIDEO_CACHE_STATS_PIPELINE result."""
+    stats = result[0] if result else {}
+    return {
+        "total_videos": stats.get("total_videos", 0),
+        "unique_landmarks": stats.get("unique_landmarks", 0)
+    }
+
 def get_video_cache_stats():
-    """Get statistics about the video cache."""
+    """Get statistics about the video cache (one aggregation over the landmark_story index)."""
     landmarks_collection, videos_collection, db = get_collections()
     if videos_collection is None:
         return None
 
     try:
-        total_videos = videos_collection.count_documents({})
-        unique_landmarks = len(videos_collection.distinct("landmark_name"))
-
-        return {
-            "total_videos": total_videos,
-            "unique_landmarks": unique_landmarks
-        }
+        return video_cache_stats(list(videos_collection.aggregate(VIDEO_CACHE_STATS_PIPELINE)))
     except Exception as e:
         print(f"Error getting cache stats: {e}")
         return None
 
+# --- Video Generation Leases ---
+
+def video_lease_fields(owner, now, ttl_seconds):
+    """Fields of a freshly acquired (in-progress) lease."""
+    return {
+        "owner": owner,
+        "status": "in_progress",
+        "created_at": now,
+        "expires_at": now + datetime.timedelta(seconds=ttl_seconds)
+    }
+
+def video_lease_takeover(cache_key, lease, now):
+    """Filter and update taking over an expired lease; a result it had published is dropped."""
+    return (
+        {"_id": cache_key, "expires_at": {"$lt": now}},
+        {"$set": lease, "$unset": {"video_path": "", "sha256": ""}}
+    )
+
+def video_lease_publish(cache_key, owner, video_path, sha256, now, ttl_seconds):
+    """Filter and update marking our lease done with its result, kept for ttl_seconds."""
+    return (
+        {"_id": cache_key, "owner": owner},
+        {"$set": {
+            "status": "done",
+            "video_path": video_path,
+            "sha256": sha256,
+            "expires_at": now + datetime.timedelta(seconds=ttl_seconds)
+        }}
+    )
+
+def video_lease_release_filter(cache_key, owner):
+    """Matches our lease only while it is in progress, so a published one outlives the release."""
+    return {"_id": cache_key, "owner": owner, "status": "in_progress"}
+
+def acquire_video_lease(cache_key, owner, ttl_seconds):
+    """Try to become the single generator for a cache key. Returns True if the lease is ours.
+
+    An expired lease (crashed owner, or a published result past its TTL) is taken over.
+    """
+    if video_jobs_collection is None:
+        # Without Mongo there is nobody to coordinate with - let the caller generate.
+        return True
+
+    now = datetime.datetime.utcnow()
+    lease = video_lease_fields(owner, now, ttl_seconds)
+
+    try:
+        video_jobs_collection.insert_one({"_id": cache_key, **lease})
+        return True
+    except DuplicateKeyError:
+        pass
+    except Exception as e:
+        print(f"Error acquiring video lease: {e}")
+        return True
+
+    # Someone holds the lease - take it over only if it has expired
+    try:
+        result = video_jobs_collection.update_one(*video_lease_takeover(cache_key, lease, now))
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error taking over video lease: {e}")
+        return False
+
+def get_video_lease(cache_key):
+    """Return the lease document for a cache key (in progress or published), if any."""
+    if video_jobs_collection is None:
+        return None
+
+    try:
+        return video_jobs_collection.find_one({"_id": cache_key})
+    except Exception as e:
+        print(f"Error reading video lease: {e}")
+        return None
+
+def publish_video_lease(cache_key, owner, video_path, sha256, ttl_seconds):
+    """Hand a result that was not cached to the waiters: the lease stays, marked done, for ttl_seconds."""
+    if video_jobs_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        result = video_jobs_collection.update_one(
+            *video_lease_publish(cache_key, owner, video_path, sha256, now, ttl_seconds)
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        print(f"Error publishing video lease: {e}")
+        return False
+
+def release_video_lease(cache_key, owner):
+    """Release a lease we hold so waiters can read the cache (or retry after a failure).
+
+    A published lease is kept until it expires.
+    """
+    if video_jobs_collection is None:
+        return False
+
+    try:
+        result = video_jobs_collection.delete_one(video_lease_release_filter(cache_key, owner))
+        return result.deleted_count > 0
+    except Exception as e:
+        print(f"Error releasing video lease: {e}")
+        return False
+
+# --- Artifact Reference Counting ---
+
+def add_artifact_ref(sha256, path, size, ref):
+    """Record an artifact (once) and add a reference to it. Returns False if Mongo is unavailable."""
+    if artifacts_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        artifacts_collection.update_one(
+            {"_id": sha256},
+            {"$setOnInsert": {"path": path, "size": size, "refs": [], "refcount": 0, "created_at": now}},
+            upsert=True
+        )
+        # Only count each referrer once
+        artifacts_collection.update_one(
+            {"_id": sha256, "refs": {"$ne": ref}},
+            {"$push": {"refs": ref}, "$inc": {"refcount": 1}, "$set": {"last_referenced_at": now}}
+        )
+        return True
+    except Exception as e:
+        print(f"Error adding artifact reference: {e}")
+        return False
+
+def release_artifact_refs(ref, sha256=None):
+    """Drop a referrer from one artifact, or from every artifact it references."""
+    if artifacts_collection is None:
+        return 0
+
+    query = {"refs": ref}
+    if sha256:
+        query["_id"] = sha256
+
+    try:
+        result = artifacts_collection.update_many(
+            query,
+            {"$pull": {"refs": ref}, "$inc": {"refcount": -1}, "$set": {"released_at": datetime.datetime.utcnow()}}
+        )
+        return result.modified_count
+    except Exception as e:
+        print(f"Error releasing artifact references: {e}")
+        return 0
+
+def find_unreferenced_artifacts(released_before):
+    """Artifacts with no referrers left since before the given time."""
+    if artifacts_collection is None:
+        return []
+
+    try:
+        return list(artifacts_collection.find(
+            {"refcount": {"$lte": 0}, "released_at": {"$lt": released_before}},
+            {"path": 1, "size": 1}
+        ))
+    except Exception as e:
+        print(f"Error finding unreferenced artifacts: {e}")
+        return []
+
+def get_artifact_refs(prefix, referenced_before=None):
+    """(ref, sha256) pairs for referrers starting with prefix; None on error.
+
+    With referenced_before, only artifacts whose last reference was added before then
+    are included, so references that were just added are never listed.
+    """
+    if artifacts_collection is None:
+        return None
+
+    query = {"refs": {"$regex": f"^{re.escape(prefix)}"}}
+    if referenced_before is not None:
+        query["last_referenced_at"] = {"$lt": referenced_before}
+    try:
+        return [
+            (ref, doc["_id"])
+            for doc in artifacts_collection.find(query, {"refs": 1})
+            for ref in doc.get("refs", [])
+            if ref.startswith(prefix)
+        ]
+    except Exception as e:
+        print(f"Error listing artifact references: {e}")
+        return None
+
+def delete_artifact_record(sha256):
+    """Remove an artifact document, but only if nothing re-referenced it meanwhile."""
+    if artifacts_collection is None:
+        return False
+
+    try:
+        result = artifacts_collection.delete_one({"_id": sha256, "refcount": {"$lte": 0}})
+        return result.deleted_count > 0
+    except Exception as e:
+        print(f"Error deleting artifact record: {e}")
+        return False
+
+# --- Precomputed Catalog Artifacts ---
+
+def get_catalog_entry(landmark_id, template_version):
+    """Return the completed precompute for a catalog landmark matching the template version (any when None)."""
+    if catalog_artifacts_collection is None:
+        return None
+
+    try:
+        query = {"_id": landmark_id, "status": "complete"}
+        if template_version is not None:
+            query["template_version"] = template_version
+        return catalog_artifacts_collection.find_one(query)
+    except Exception as e:
+        print(f"Error retrieving catalog entry: {e}")
+        return None
+
+def save_catalog_entry(landmark_id, landmark_name, template_version, fields):
+    """Publish a precompute for a catalog landmark, replacing the served one and clearing its staging state."""
+    if catalog_artifacts_collection is None:
+        return False
+
+    try:
+        catalog_artifacts_collection.update_one(
+            {"_id": landmark_id},
+            {"$set": {
+                "landmark_name": landmark_name,
+                "template_version": template_version,
+                "updated_at": datetime.datetime.utcnow(),
+                **fields
+            }, "$unset": {"staging": ""}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error saving catalog entry: {e}")
+        return False
+
+def stage_catalog_entry(landmark_id, template_version, status, error=None):
+    """Record a precompute in progress or failed without touching the published entry."""
+    if catalog_artifacts_collection is None:
+        return False
+
+    try:
+        catalog_artifacts_collection.update_one(
+            {"_id": landmark_id},
+            {"$set": {"staging": {
+                "template_version": template_version,
+                "status": status,
+                "error": error,
+                "updated_at": datetime.datetime.utcnow(),
+            }}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error staging catalog entry: {e}")
+        return False
+
+# --- Request Popularity ---
+
+def record_popularity(key, landmark_name, story_type, prompt, half_life_seconds):
+    """Bump a key's exponentially decayed request counter (decay applied server-side)."""
+    if popularity_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    decay_per_ms = -math.log(2) / (half_life_seconds * 1000)
+    try:
+        popularity_collection.update_one(
+            {"_id": key},
+            [{"$set": {
+                "landmark_name": landmark_name.lower(),
+                "story_type": story_type,
+                "last_prompt": prompt,
+                "score": {"$add": [
+                    {"$multiply": [
+                        {"$ifNull": ["$score", 0]},
+                        {"$exp": {"$multiply": [decay_per_ms, {"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}]}}
+                    ]},
+                    1
+                ]},
+                "total_requests": {"$add": [{"$ifNull": ["$total_requests", 0]}, 1]},
+                "updated_at": now
+            }}],
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error recording popularity: {e}")
+        return False
+
+def get_popularity_docs(keys=None):
+    """Return popularity documents, optionally limited to the given keys."""
+    if popularity_collection is None:
+        return []
+
+    try:
+        query = {"_id": {"$in": list(keys)}} if keys is not None else {}
+        return list(popularity_collection.find(query))
+    except Exception as e:
+        print(f"Error reading popularity: {e}")
+        return []
+
+# --- Narration (TTS) Cache ---
+
+def get_tts_entry(key):
+    """Return a cached narration entry and mark it as just used."""
+    if tts_cache_collection is None:
+        return None
+
+    try:
+        return tts_cache_collection.find_one_and_update(
+            {"_id": key},
+            {"$set": {"last_used_at": datetime.datetime.utcnow()}, "$inc": {"hits": 1}}
+        )
+    except Exception as e:
+        print(f"Error reading TTS cache: {e}")
+        return None
+
+def save_tts_entry(key, sha256, path, size, voice):
+    """Index a synthesized narration under its cache key and add its size to the running total."""
+    if tts_cache_collection is None:
+        return False
+
+    now = datetime.datetime.utcnow()
+    try:
+        previous = tts_cache_collection.find_one_and_update(
+            {"_id": key},
+            {"$set": {"sha256": sha256, "path": path, "size": size, "voice": voice, "last_used_at": now},
+             "$setOnInsert": {"created_at": now, "hits": 0}},
+            projection={"size": 1},
+            upsert=True
+        )
+        _adjust_tts_cache_size(size - (previous or {}).get("size", 0))
+        return True
+    except Exception as e:
+        print(f"Error saving TTS cache entry: {e}")
+        return False
+
+def _adjust_tts_cache_size(delta):
+    if delta and catalog_meta_collection is not None:
+        catalog_meta_collection.update_one({"_id": TTS_CACHE_SIZE_ID}, {"$inc": {"bytes": delta}}, upsert=True)
+
+def get_tts_cache_size():
+    """Total bytes of narration held by the cache, from a running counter document.
+
+    The counter is (re)computed from the entries when missing or older than
+    TTS_CACHE_SIZE_RECONCILE_SECONDS, which also corrects any drift from interrupted writes.
+    """
+    if tts_cache_collection is None or catalog_meta_collection is None:
+        return 0
+
+    try:
+        counter = catalog_meta_collection.find_one({"_id": TTS_CACHE_SIZE_ID})
+        now = datetime.datetime.utcnow()
+        reconciled_at = (counter or {}).get("reconciled_at")
+        if reconciled_at and (now - reconciled_at).total_seconds() < TTS_CACHE_SIZE_RECONCILE_SECONDS:
+            return counter.get("bytes", 0)
+
+        result = list(tts_cache_collection.aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}]))
+        total = result[0]["bytes"] if result else 0
+        catalog_meta_collection.update_one(
+            {"_id": TTS_CACHE_SIZE_ID}, {"$set": {"bytes": total, "reconciled_at": now}}, upsert=True
+        )
+        return total
+    except Exception as e:
+        print(f"Error sizing TTS cache: {e}")
+        return 0
+
+def get_least_recent_tts_entries(limit):
+    """Least recently used narration entries, oldest first."""
+    if tts_cache_collection is None:
+        return []
+
+    try:
+        return list(tts_cache_collection.find({}, {"size": 1, "sha256": 1}).sort("last_used_at", 1).limit(limit))
+    except Exception as e:
+        print(f"Error listing TTS cache entries: {e}")
+        return []
+
+def delete_tts_entry(key):
+    if tts_cache_collection is None:
+        return False
+
+    try:
+        deleted = tts_cache_collection.find_one_and_delete({"_id": key}, projection={"size": 1})
+        if deleted is None:
+            return False
+        _adjust_tts_cache_size(-deleted.get("size", 0))
+        return True
+    except Exception as e:
+        print(f"Error deleting TTS cache entry: {e}")
+        return False
+
+# --- Landmark Catalog Version ---
+
+def get_catalog_version():
+    """Current version counter of the landmarks catalog (0 if never bumped, None if unavailable)."""
+    if catalog_meta_collection is None:
+        return None
+
+    try:
+        doc = catalog_meta_collection.find_one({"_id": "landmarks"})
+        return doc.get("version", 0) if doc else 0
+    except Exception as e:
+        print(f"Error reading catalog version: {e}")
+        return None
+
+def bump_catalog_version():
+    """Mark the landmarks catalog as changed so process-local snapshots reload."""
+    if catalog_meta_collection is None:
+        return False
+
+    try:
+        catalog_meta_collection.update_one(
+            {"_id": "landmarks"},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error bumping catalog version: {e}")
+        return False
+
+def watch_landmarks():
+    """Change stream on the landmarks collection (needs a replica set); None if unsupported."""
+    if landmarks_collection is None:
+        return None
+
+    try:
+        return landmarks_collection.watch(max_await_time_ms=1000)
+    except Exception as e:
+        print(f"Landmark change stream unavailable: {e}")
+        return None
+
+# --- Landmark Ingestion ---
+
+def _drop_stale_landmark_shadows(now):
+    pattern = re.compile(rf"^{LANDMARKS_SHADOW_COLLECTION_PREFIX}_(\d+)_[0-9a-f]+$")
+    try:
+        for name in db.list_collection_names(filter={"name": {"$regex": f"^{LANDMARKS_SHADOW_COLLECTION_PREFIX}_"}}):
+            match = pattern.match(name)
+            if match and now - int(match.group(1)) > LANDMARKS_SHADOW_MAX_AGE_SECONDS:
+                db[name].drop()
+    except Exception as e:
+        print(f"Error dropping stale landmark shadow collections: {e}")
+
+def get_landmarks_shadow_collection():
+    """New, uniquely named scratch collection a full catalog load is written to before it replaces the live one.
+
+    Overlapping loads each get their own, so one can never drop or swap in another's.
+    """
+    if landmarks_collection is None:
+        return None
+
+    now = int(time.time())
+    _drop_stale_landmark_shadows(now)
+    return db[f"{LANDMARKS_SHADOW_COLLECTION_PREFIX}_{now}_{uuid.uuid4().hex[:8]}"]
+
+def upsert_landmarks(docs, collection=None):
+    """Insert or replace landmark documents by _id in one round trip.
+
+    Returns (inserted, updated, written); written counts every document now stored as
+    given, changed or not, so len(docs) - written rows failed.
+    """
+    collection = landmarks_collection if collection is None else collection
+    if collection is None or not docs:
+        return 0, 0, 0
+
+    try:
+        result = collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+        return result.upserted_count, result.modified_count, result.upserted_count + result.matched_count
+    except BulkWriteError as e:
+        details = e.details
+        print(f"Error upserting landmarks: {len(details.get('writeErrors', []))} of {len(docs)} rows failed")
+        return details.get("nUpserted", 0), details.get("nModified", 0), details.get("nUpserted", 0) + details.get("nMatched", 0)
+    except Exception as e:
+        print(f"Error upserting landmarks: {e}")
+        return 0, 0, 0
+
+def swap_landmarks_collection(shadow):
+    """Atomically replace the live landmarks collection with a loaded shadow collection.
+
+    Readers see either the old catalog or the new one, never a partial load. Renames
+    don't work on sharded collections.
+    """
+    try:
+        shadow.rename(LANDMARKS_COLLECTION_NAME, dropTarget=True)
+        return True
+    except Exception as e:
+        print(f"Error swapping in the new landmarks collection: {e}")
+        return False
+
+# --- Landmark Geo Queries ---
+
+def landmark_location(latitude, longitude):
+    """GeoJSON point for a landmark (GeoJSON order is longitude, latitude)."""
+    return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+
+def ensure_landmark_geo_index(collection=None):
+    """Backfill location points from latitude/longitude and create the 2dsphere index."""
+    collection = landmarks_collection if collection is None else collection
+    if collection is None:
+        return False
+
+    try:
+        collection.update_many(
+            {"location": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}},
+            [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+        )
+        collection.create_index(LANDMARK_GEO_INDEX, name="location_category", collation=CATEGORY_COLLATION)
+        return True
+    except Exception as e:
+        print(f"Error creating landmark geo index: {e}")
+        return False
+
+# --- Precomputed Neighbour Table ---
+
+def get_neighbor_entry(name_lower):
+    """Neighbour entry of the first catalog landmark with this (lowercase) name."""
+    if neighbors_collection is None:
+        return None
+
+    try:
+        return neighbors_collection.find_one({"name_lower": name_lower}, sort=[("position", 1)])
+    except Exception as e:
+        print(f"Error reading neighbour entry: {e}")
+        return None
+
+def get_neighbor_entries():
+    """Every neighbour entry, for incremental rebuilds."""
+    if neighbors_collection is None:
+        return []
+
+    try:
+        return list(neighbors_collection.find({}))
+    except Exception as e:
+        print(f"Error listing neighbour entries: {e}")
+        return []
+
+def save_neighbor_entries(entries, batch_size=1000):
+    """Upsert neighbour entries (keyed by landmark _id)."""
+    if neighbors_collection is None:
+        return False
+
+    try:
+        neighbors_collection.create_index([("name_lower", ASCENDING), ("position", ASCENDING)])
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            neighbors_collection.bulk_write([ReplaceOne({"_id": e["_id"]}, e, upsert=True) for e in batch], ordered=False)
+        return True
+    except Exception as e:
+        print(f"Error saving neighbour entries: {e}")
+        return False
+
+def update_neighbor_positions(positions, batch_size=1000):
+    """Set the catalog position of entries that weren't recomputed (landmark _id -> position)."""
+    if neighbors_collection is None or not positions:
+        return False
+
+    try:
+        items = list(positions.items())
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            neighbors_collection.bulk_write(
+                [UpdateOne({"_id": landmark_id}, {"$set": {"position": position}}) for landmark_id, position in batch],
+                ordered=False
+            )
+        return True
+    except Exception as e:
+        print(f"Error updating neighbour entry positions: {e}")
+        return False
+
+def delete_neighbor_entries(landmark_ids=None):
+    """Delete the entries of removed landmarks (all entries if landmark_ids is None)."""
+    if neighbors_collection is None:
+        return 0
+
+    try:
+        query = {} if landmark_ids is None else {"_id": {"$in": list(landmark_ids)}}
+        return neighbors_collection.delete_many(query).deleted_count
+    except Exception as e:
+        print(f"Error deleting neighbour entries: {e}")
+        return 0
+
+def get_neighbor_table_meta():
+    """Catalog version, K and categories the stored neighbour table was built for."""
+    if catalog_meta_collection is None:
+        return None
+
+    try:
+        return catalog_meta_collection.find_one({"_id": "neighbors"})
+    except Exception as e:
+        print(f"Error reading neighbour table metadata: {e}")
+        return None
+
+def set_neighbor_table_meta(catalog_version, k, categories):
+    if catalog_meta_collection is None:
+        return False
+
+    try:
+        catalog_meta_collection.update_one(
+            {"_id": "neighbors"},
+            {"$set": {"catalog_version": catalog_version, "k": k, "categories": list(categories),
+                      "built_at": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error saving neighbour table metadata: {e}")
+        return False
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Mean Earth radius, the same value the haversine package uses
+EARTH_RADIUS_KM = 6371.0088
+
+# Origins per block in batch queries, so an (origins x landmarks) matrix stays ~100 MB at 1e6 landmarks
+_BATCH_BLOCK = 16
+
+
+def coordinate_arrays(latitudes, longitudes):
+    """Contiguous float64 radian arrays (lat, lon, cos lat) for the distance kernels."""
+    lat = np.radians(np.ascontiguousarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.ascontiguousarray(longitudes, dtype=np.float64))
+    return lat, lon, np.cos(lat)
+
+
+def haversine_km(origin_lat: float, origin_lon: float, lat, lon, cos_lat=None):
+    """Great-circle distance in km from one origin (degrees) to arrays of radian coordinates."""
+    cos_lat = np.cos(lat) if cos_lat is None else cos_lat
+    olat, olon = np.radians(origin_lat), np.radians(origin_lon)
+    a = np.sin((lat - olat) * 0.5) ** 2 + np.cos(olat) * cos_lat * np.sin((lon - olon) * 0.5) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix_km(origin_lats, origin_lons, lat, lon, cos_lat=None):
+    """Distances in km from every origin (degrees) to every point: shape (origins, points)."""
+    cos_lat = np.cos(lat) if cos_lat is None else cos_lat
+    olat = np.radians(np.asarray(origin_lats, dtype=np.float64))[:, None]
+    olon = np.radians(np.asarray(origin_lons, dtype=np.float64))[:, None]
+    a = np.sin((lat - olat) * 0.5) ** 2 + np.cos(olat) * cos_lat * np.sin((lon - olon) * 0.5) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def top_k_smallest(values, k: int):
+    """Indices of the k smallest values, sorted ascending (argpartition, then sort only those k)."""
+    k = min(k, values.shape[-1])
+    if k <= 0:
+        return np.empty(values.shape[:-1] + (0,), dtype=np.intp)
+    if k < values.shape[-1]:
+        candidates = np.argpartition(values, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(values.shape[-1]), values.shape).copy()
+    order = np.argsort(np.take_along_axis(values, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def nearest_k(origin_lat: float, origin_lon: float, lat, lon, k: int, cos_lat=None, mask=None):
+    """Indices and distances (km) of the k nearest points to one origin; mask excludes points."""
+    distances = haversine_km(origin_lat, origin_lon, lat, lon, cos_lat)
+    if mask is not None:
+        distances = np.where(mask, distances, np.inf)
+    idx = top_k_smallest(distances, k)
+    idx = idx[np.isfinite(distances[idx])]
+    return idx, distances[idx]
+
+
+def nearest_k_batch(origin_lats, origin_lons, lat, lon, k: int, cos_lat=None):
+    """k nearest points for many origins at once: (indices, distances), each shaped (origins, k)."""
+    cos_lat = np.cos(lat) if cos_lat is None else cos_lat
+    origin_lats = np.asarray(origin_lats, dtype=np.float64)
+    origin_lons = np.asarray(origin_lons, dtype=np.float64)
+    k = min(k, lat.shape[0])
+
+    indices = np.empty((origin_lats.shape[0], k), dtype=np.intp)
+    distances = np.empty((origin_lats.shape[0], k), dtype=np.float64)
+    for start in range(0, origin_lats.shape[0], _BATCH_BLOCK):
+        block = slice(start, start + _BATCH_BLOCK)
+        matrix = haversine_matrix_km(origin_lats[block], origin_lons[block], lat, lon, cos_lat)
+        idx = top_k_smallest(matrix, k)
+        indices[block] = idx
+        distances[block] = np.take_along_axis(matrix, idx, axis=-1)
+    return indices, distances
@@ -0,0 +1,115 @@
+import math
+from collections import Counter, deque
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over a fixed keyword list.
+
+    One pass over a text finds every keyword occurrence, however many keywords there are.
+    Matches must start at a word boundary ("mut" matches "mut" and "mutual", not "commute");
+    the end is left open so "pyramid" also counts in "pyramids".
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword})
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(keyword)
+
+        # Breadth-first failure links; outputs inherit the keywords of their failure state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def scan(self, text: str) -> Counter:
+        """Occurrences of each keyword in text (case-insensitive)."""
+        text = text.lower()
+        counts = Counter()
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword in self._output[state]:
+                start = end - len(keyword) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    counts[keyword] += 1
+        return counts
+
+
+class KeywordLandmarkIndex:
+    """Keyword -> landmark postings for a catalog, with IDF weights.
+
+    Each landmark's name and category are scanned once at build time. Queries score
+    landmarks by the cosine between the text's TF-IDF keyword vector and the landmark's
+    IDF-weighted keyword set, so rare, specific keywords ("karnak") count for far more than
+    generic ones ("temple") that half the catalog shares. keyword_weights scales the
+    text-side weight of individual keywords (default 1).
+    """
+
+    def __init__(self, matcher: KeywordMatcher, names, categories=None, keyword_weights=None):
+        self.matcher = matcher
+        self.keyword_weights = {k.lower(): w for k, w in (keyword_weights or {}).items()}
+        self.names = list(names)
+        categories = list(categories) if categories is not None else [""] * len(self.names)
+
+        self.postings = {}
+        landmark_keywords = []
+        for position, (name, category) in enumerate(zip(self.names, categories)):
+            found = set(matcher.scan(f"{name or ''} {category or ''}"))
+            landmark_keywords.append(found)
+            for keyword in found:
+                self.postings.setdefault(keyword, []).append(position)
+
+        count = max(len(self.names), 1)
+        self.idf = {keyword: math.log(count / len(posting)) + 1.0 for keyword, posting in self.postings.items()}
+        self._norms = [math.sqrt(sum(self.idf[k] ** 2 for k in found)) or 1.0 for found in landmark_keywords]
+
+    def rank(self, text: str, limit: int = 5):
+        """(position, name, score) of the landmarks best matching the text's keywords."""
+        term_counts = self.matcher.scan(text)
+        scores = Counter()
+        for keyword, count in term_counts.items():
+            posting = self.postings.get(keyword)
+            if not posting:
+                continue
+            weight = self.keyword_weights.get(keyword, 1.0) * (1.0 + math.log(count)) * self.idf[keyword] ** 2
+            for position in posting:
+                scores[position] += weight
+
+        ranked = sorted(((score / self._norms[p], p) for p, score in scores.items()), key=lambda item: (-item[0], item[1]))[:limit]
+        return [(position, self.names[position], score) for score, position in ranked]
+
+
+_index_cache = {"df": None, "keywords": None, "index": None}
+
+
+def get_keyword_index(landmarks_df, keywords, keyword_weights=None) -> KeywordLandmarkIndex:
+    """Keyword index for a catalog DataFrame, built once per DataFrame object and keyword list."""
+    keywords = (tuple(keywords), tuple(sorted((keyword_weights or {}).items())))
+    if _index_cache["df"] is not landmarks_df or _index_cache["keywords"] != keywords:
+        categories = landmarks_df["category"].fillna("").tolist() if "category" in landmarks_df else None
+        _index_cache["index"] = KeywordLandmarkIndex(
+            KeywordMatcher(keywords[0]), landmarks_df["name"].fillna("").tolist(), categories, keyword_weights
+        )
+        _index_cache["df"] = landmarks_df
+        _index_cache["keywords"] = keywords
+    return _index_cache["index"]
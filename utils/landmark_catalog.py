@@ -0,0 +1,134 @@
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import CATALOG_VERSION_CHECK_SECONDS, CATALOG_CHANGE_STREAM
+from .database import get_collections, get_catalog_version, watch_landmarks
+from .name_index import normalize_name
+
+
+class CatalogSnapshot:
+    """One immutable load of the landmarks collection.
+
+    frame has the stored fields plus name_lower, name_normalized and landmark_id (the
+    stored _id); latitudes and longitudes are read-only float64 arrays aligned with the
+    frame's rows.
+    """
+
+    def __init__(self, frame: pd.DataFrame, version, load_seconds: float):
+        if not frame.empty:
+            frame.rename(columns={"_id": "landmark_id"}, inplace=True)
+            frame["name_lower"] = frame["name"].str.lower()
+            frame["name_normalized"] = frame["name"].map(normalize_name)
+        self.frame = frame
+        self.version = version
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+        if frame.empty:
+            self.latitudes = np.empty(0)
+            self.longitudes = np.empty(0)
+        else:
+            self.latitudes = frame["latitude"].to_numpy(dtype=np.float64, copy=True)
+            self.longitudes = frame["longitude"].to_numpy(dtype=np.float64, copy=True)
+        self.latitudes.flags.writeable = False
+        self.longitudes.flags.writeable = False
+
+    @property
+    def memory_bytes(self) -> int:
+        return int(self.frame.memory_usage(deep=True).sum()) + self.latitudes.nbytes + self.longitudes.nbytes
+
+
+_snapshot = None
+_stale = threading.Event()
+_lock = threading.Lock()
+_last_version_check = 0.0
+_watcher = None
+
+
+def _fetch(version) -> CatalogSnapshot:
+    started = time.perf_counter()
+    landmarks_collection, videos_collection, db = get_collections()
+    if landmarks_collection is None:
+        raise RuntimeError("Failed to get landmarks collection")
+
+    # The GeoJSON location duplicates latitude/longitude; only $geoNear queries use it
+    frame = pd.DataFrame(list(landmarks_collection.find({}, {"location": 0})))
+    snapshot = CatalogSnapshot(frame, version, time.perf_counter() - started)
+    print(
+        f"Loaded catalog snapshot v{version}: {len(frame)} landmarks in {snapshot.load_seconds * 1000:.0f} ms, "
+        f"{snapshot.memory_bytes / (1024 * 1024):.1f} MB"
+    )
+    return snapshot
+
+
+def _watch_changes():
+    """Mark the snapshot stale on any landmarks change; exits quietly without a replica set.
+
+    A catalog swap (rename over the collection) ends the stream; the next reload starts
+    a new watcher.
+    """
+    global _watcher
+    stream = watch_landmarks()
+    if stream is None:
+        return
+    try:
+        with stream:
+            for _ in stream:
+                _stale.set()
+    except Exception as e:
+        print(f"Landmark change stream stopped: {e}")
+    _stale.set()
+    _watcher = None
+
+
+def _start_watcher():
+    global _watcher
+    if CATALOG_CHANGE_STREAM and _watcher is None:
+        _watcher = threading.Thread(target=_watch_changes, name="catalog-watch", daemon=True)
+        _watcher.start()
+
+
+def get_catalog_snapshot(force_reload: bool = False):
+    """The process-wide catalog snapshot, reloaded only when the catalog changed.
+
+    Changes are noticed through a change stream when available, otherwise by polling the
+    catalog version document at most every CATALOG_VERSION_CHECK_SECONDS.
+    Returns None if the catalog can't be loaded.
+    """
+    global _snapshot, _last_version_check
+
+    with _lock:
+        now = time.time()
+        version = _snapshot.version if _snapshot else None
+        if _snapshot is None or force_reload or _stale.is_set() or now - _last_version_check >= CATALOG_VERSION_CHECK_SECONDS:
+            version = get_catalog_version()
+            _last_version_check = now
+
+        if _snapshot is not None and not force_reload and not _stale.is_set() and version == _snapshot.version:
+            return _snapshot
+
+        _stale.clear()
+        try:
+            _snapshot = _fetch(version)
+        except Exception as e:
+            print(f"Error loading landmarks: {e}")
+            return _snapshot
+        _start_watcher()
+        return _snapshot
+
+
+def get_catalog_stats() -> dict:
+    """Size, version, load time and memory of the current snapshot."""
+    snapshot = _snapshot
+    if snapshot is None:
+        return {}
+    return {
+        "landmarks": len(snapshot.frame),
+        "version": snapshot.version,
+        "load_seconds": snapshot.load_seconds,
+        "memory_bytes": snapshot.memory_bytes,
+        "age_seconds": time.time() - snapshot.loaded_at,
+    }
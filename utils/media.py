@@ -0,0 +1,536 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+from config import FFMPEG_BINARY, FFPROBE_BINARY
+
+FFMPEG_PATH = shutil.which(FFMPEG_BINARY)
+FFPROBE_PATH = shutil.which(FFPROBE_BINARY)
+FFMPEG_AVAILABLE = bool(FFMPEG_PATH and FFPROBE_PATH)
+
+# keep features disabled if incompatible (Python 3.13)
+MOVIEPY_AVAILABLE = True
+try:
+    from moviepy.editor import concatenate_videoclips, VideoFileClip, AudioFileClip
+except Exception:
+    MOVIEPY_AVAILABLE = False
+
+# Length of a crossfade / dip-to-black between two shots, in seconds
+TRANSITION_SECONDS = 0.5
+# Narration this close to the clip length is stream-copied instead of padded/trimmed
+MUX_COPY_TOLERANCE_SECONDS = 0.05
+
+# Set per task by utils.media_worker inside worker processes
+_progress_reporter = None
+_task_deadline = None
+
+
+def derived_path(media_path: str, suffix: str) -> str:
+    """Path for a file derived from a clip (poster, rendition), stored next to the real file."""
+    return os.path.splitext(os.path.realpath(media_path))[0] + suffix
+
+
+def set_task_context(progress_reporter=None, deadline=None):
+    """Install the progress callback and monotonic deadline for the task about to run."""
+    global _progress_reporter, _task_deadline
+    _progress_reporter = progress_reporter
+    _task_deadline = deadline
+
+
+def _report_progress(fraction: float, message: str = ""):
+    if _progress_reporter is not None:
+        _progress_reporter(min(max(fraction, 0.0), 1.0), message)
+
+
+def _remaining_time():
+    if _task_deadline is None:
+        return None
+    remaining = _task_deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Media task exceeded its time limit.")
+    return remaining
+
+
+def _run(args, duration=None, progress_range=(0.0, 1.0)):
+    """Run an ffmpeg/ffprobe command, raising with its stderr on failure.
+
+    When the expected output duration is known and a progress reporter is installed,
+    ffmpeg's -progress output is mapped onto progress_range.
+    """
+    timeout = _remaining_time()
+    name = os.path.basename(args[0])
+
+    if duration is None or _progress_reporter is None or args[0] != FFMPEG_PATH:
+        try:
+            result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"{name} exceeded the media task time limit.")
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} failed: {result.stderr.strip()[-500:]}")
+        return result.stdout
+
+    low, high = progress_range
+    with tempfile.TemporaryFile(mode="w+") as stderr:
+        process = subprocess.Popen(
+            [args[0], "-progress", "pipe:1", "-nostats"] + args[1:],
+            stdout=subprocess.PIPE, stderr=stderr, text=True
+        )
+        killer = threading.Timer(timeout, process.kill) if timeout else None
+        if killer:
+            killer.start()
+        try:
+            for line in process.stdout:
+                if line.startswith("out_time_us="):
+                    value = line.split("=", 1)[1].strip()
+                    if value.isdigit():
+                        done = int(value) / 1_000_000 / duration if duration else 0
+                        _report_progress(low + (high - low) * min(done, 1.0))
+            returncode = process.wait()
+        finally:
+            if killer:
+                killer.cancel()
+
+        if returncode < 0 and _task_deadline is not None and time.monotonic() >= _task_deadline:
+            raise TimeoutError(f"{name} exceeded the media task time limit.")
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{name} failed: {stderr.read().strip()[-500:]}")
+    _report_progress(high)
+    return ""
+
+
+def probe_media(path: str) -> dict:
+    """Return the codec parameters of the first video and audio stream of a file."""
+    output = _run([
+        FFPROBE_PATH, "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,time_base,sample_rate,channels:format=duration",
+        "-of", "json", path
+    ])
+    data = json.loads(output)
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), None)
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), None)
+
+    return {
+        "path": path,
+        "duration": float(data.get("format", {}).get("duration", 0) or 0),
+        "video": video,
+        "audio": audio,
+    }
+
+
+def frame_rate(info: dict, default: float = 24.0) -> float:
+    """Frames per second of a probed file's video stream (r_frame_rate is a fraction like 30000/1001)."""
+    rate = (info.get("video") or {}).get("r_frame_rate") or ""
+    numerator, _, denominator = rate.partition("/")
+    try:
+        fps = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return default
+    return fps if fps > 0 else default
+
+
+def _signature(info: dict) -> tuple:
+    """Parameters that must match for the concat demuxer to copy streams."""
+    video = info["video"] or {}
+    audio = info["audio"] or {}
+    return (
+        video.get("codec_name"), video.get("profile"), video.get("width"), video.get("height"),
+        video.get("pix_fmt"), video.get("r_frame_rate"), video.get("time_base"),
+        audio.get("codec_name"), audio.get("sample_rate"), audio.get("channels"),
+    )
+
+
+def _encode_args(reference: dict) -> list:
+    """ffmpeg output options that reproduce the reference stream parameters."""
+    video = reference["video"]
+    audio = reference["audio"]
+    timescale = video["time_base"].split("/")[1]
+    args = [
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+        "-pix_fmt", video["pix_fmt"], "-r", video["r_frame_rate"],
+        "-video_track_timescale", timescale,
+    ]
+    if video.get("profile") in ("Baseline", "Main", "High"):
+        args += ["-profile:v", video["profile"].lower()]
+    if audio:
+        args += ["-c:a", "aac", "-ar", str(audio["sample_rate"]), "-ac", str(audio["channels"])]
+    return args
+
+
+def _video_filter(reference: dict) -> str:
+    video = reference["video"]
+    width, height = video["width"], video["height"]
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={video['r_frame_rate']},format={video['pix_fmt']},settb=AVTB"
+    )
+
+
+def _audio_filter(reference: dict) -> str:
+    audio = reference["audio"]
+    layout = "mono" if int(audio["channels"]) == 1 else "stereo"
+    return f"aresample={audio['sample_rate']},aformat=channel_layouts={layout},asettb=AVTB"
+
+
+def _normalize_segment(info: dict, reference: dict, output_path: str, progress_range=(0.0, 1.0)):
+    """Re-encode one clip to the reference parameters (adding silence if it has no audio)."""
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-i", info["path"]]
+    if reference["audio"] and not info["audio"]:
+        layout = "mono" if int(reference["audio"]["channels"]) == 1 else "stereo"
+        args += ["-f", "lavfi", "-t", str(info["duration"]),
+                 "-i", f"anullsrc=r={reference['audio']['sample_rate']}:cl={layout}"]
+        args += ["-map", "0:v:0", "-map", "1:a:0"]
+    else:
+        args += ["-map", "0:v:0"] + (["-map", "0:a:0"] if reference["audio"] else [])
+
+    args += ["-vf", _video_filter(reference)] + _encode_args(reference) + [output_path]
+    _run(args, duration=info["duration"], progress_range=progress_range)
+    return output_path
+
+
+def xfade_transition(transition: str):
+    """Map a shot's free-text transition ("Dissolve", "Fade to black", ...) to an ffmpeg xfade name.
+
+    Returns None for hard cuts and anything we don't recognise, so those boundaries stay
+    stream-copied.
+    """
+    text = (transition or "").lower()
+    if not text or "cut" in text:
+        return None
+    if "black" in text or "fade out" in text or "fade in" in text:
+        return "fadeblack"
+    if "white" in text or "flash" in text:
+        return "fadewhite"
+    if "dissolve" in text or "cross" in text or "fade" in text or "blend" in text:
+        return "fade"
+    if "wipe" in text:
+        return "wipeleft"
+    if "slide" in text:
+        return "slideleft"
+    return None
+
+
+def _render_transition_group(infos, transitions, reference, output_path, progress_range=(0.0, 1.0)):
+    """Encode clips joined by transitions into one segment with the reference parameters.
+
+    transitions[i] is the transition into infos[i]; transitions[0] may be a fade in from black.
+    """
+    has_audio = bool(reference["audio"])
+    args = [FFMPEG_PATH, "-y", "-v", "error"]
+    for info in infos:
+        args += ["-i", info["path"]]
+
+    filters = []
+    for i, info in enumerate(infos):
+        vf = _video_filter(reference)
+        if i == 0 and transitions[0]:
+            vf += f",fade=t=in:st=0:d={TRANSITION_SECONDS}"
+        filters.append(f"[{i}:v]{vf}[v{i}]")
+        if has_audio:
+            af = _audio_filter(reference)
+            if i == 0 and transitions[0]:
+                af += f",afade=t=in:st=0:d={TRANSITION_SECONDS}"
+            if info["audio"]:
+                filters.append(f"[{i}:a]{af}[a{i}]")
+            else:
+                silence = f"anullsrc=r={reference['audio']['sample_rate']},atrim=duration={info['duration']}"
+                filters.append(f"{silence},{af}[a{i}]")
+
+    video_label, audio_label = "v0", "a0"
+    offset = infos[0]["duration"]
+    for i in range(1, len(infos)):
+        offset -= TRANSITION_SECONDS
+        filters.append(
+            f"[{video_label}][v{i}]xfade=transition={transitions[i]}:duration={TRANSITION_SECONDS}:offset={offset:.3f}[vx{i}]"
+        )
+        video_label = f"vx{i}"
+        if has_audio:
+            filters.append(f"[{audio_label}][a{i}]acrossfade=d={TRANSITION_SECONDS}[ax{i}]")
+            audio_label = f"ax{i}"
+        offset += infos[i]["duration"]
+
+    args += ["-filter_complex", ";".join(filters), "-map", f"[{video_label}]"]
+    if has_audio:
+        args += ["-map", f"[{audio_label}]"]
+    args += _encode_args(reference) + [output_path]
+    _run(args, duration=offset, progress_range=progress_range)
+    return output_path
+
+
+def concat_videos(video_paths, output_path, transitions=None):
+    """Join clips with ffmpeg's concat demuxer, copying streams wherever possible.
+
+    Clips whose codec parameters differ from the majority are re-encoded to match, and
+    only the clips joined by a requested transition (see xfade_transition) are rendered
+    through a filter graph. Everything else is stream-copied.
+    """
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+    if not video_paths:
+        raise ValueError("No video clips to combine.")
+
+    start = time.time()
+    transitions = list(transitions or [])
+    transitions = [xfade_transition(t) for t in transitions + [None] * (len(video_paths) - len(transitions))]
+    infos = [probe_media(path) for path in video_paths]
+
+    # Majority parameters become the target; mixed audio/no-audio is resolved towards audio
+    reference_signature = Counter(_signature(info) for info in infos).most_common(1)[0][0]
+    reference = next(dict(info) for info in infos if _signature(info) == reference_signature)
+    if not reference["audio"]:
+        reference["audio"] = next((info["audio"] for info in infos if info["audio"]), None)
+        reference_signature = _signature(reference)
+
+    work_dir = tempfile.mkdtemp(prefix="concat_")
+    try:
+        # Group clips: a new group starts at every hard cut
+        groups = []
+        for info, transition in zip(infos, transitions):
+            if groups and transition:
+                groups[-1][0].append(info)
+                groups[-1][1].append(transition)
+            else:
+                groups.append(([info], [transition]))
+
+        segments, reencoded = [], 0
+        for n, (group_infos, group_transitions) in enumerate(groups):
+            # Segment preparation takes the first 90% of the progress bar, the final copy the rest
+            progress_range = (0.9 * n / len(groups), 0.9 * (n + 1) / len(groups))
+            if len(group_infos) > 1 or group_transitions[0]:
+                segment = os.path.join(work_dir, f"segment_{n}.mp4")
+                segments.append(_render_transition_group(group_infos, group_transitions, reference, segment, progress_range))
+                reencoded += len(group_infos)
+            elif _signature(group_infos[0]) != reference_signature:
+                segment = os.path.join(work_dir, f"segment_{n}.mp4")
+                segments.append(_normalize_segment(group_infos[0], reference, segment, progress_range))
+                reencoded += 1
+            else:
+                segments.append(os.path.abspath(group_infos[0]["path"]))
+            _report_progress(progress_range[1], f"Prepared segment {n + 1}/{len(groups)}")
+
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, "w") as f:
+            for segment in segments:
+                escaped = segment.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        _run([
+            FFMPEG_PATH, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", output_path
+        ])
+        _report_progress(1.0, "Assembly complete")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"🎞️ Assembled {len(infos)} clips ({reencoded} re-encoded) in {time.time() - start:.1f}s -> {output_path}")
+    return output_path
+
+
+def mux_audio(video_path: str, audio_path: str, output_path: str, hold_until: float = None) -> str:
+    """Attach narration to a clip without re-encoding the video stream.
+
+    The audio is stream-copied when it is already AAC and as long as the clip (within
+    50 ms); otherwise it is encoded to AAC, padded with silence or trimmed to the clip
+    length, so every clip's audio track ends with its video and stream-copy concat stays in sync.
+
+    hold_until is the narration span the clip has to cover (single-pass timing map). When
+    it is longer than the video, the last frame is held until then instead of cutting the
+    narration off; only then is the video re-encoded, with concat-compatible parameters.
+    """
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    video_info = probe_media(video_path)
+    audio_info = probe_media(audio_path)
+    if not video_info["video"] or not audio_info["audio"]:
+        raise ValueError(f"Cannot mux {audio_path} into {video_path}: missing video or audio stream.")
+
+    video_duration = video_info["duration"]
+    audio_duration = audio_info["duration"]
+    hold = hold_until is not None and hold_until > video_duration + MUX_COPY_TOLERANCE_SECONDS
+    clip_duration = hold_until if hold else video_duration
+    copy_audio = (
+        audio_info["audio"].get("codec_name") == "aac"
+        and abs(audio_duration - clip_duration) < MUX_COPY_TOLERANCE_SECONDS
+    )
+
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-i", video_path, "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    if hold:
+        args += ["-vf", f"tpad=stop_mode=clone:stop_duration={clip_duration - video_duration:.3f}"]
+        args += _encode_args({"video": video_info["video"], "audio": None})
+    else:
+        args += ["-c:v", "copy"]
+    if copy_audio:
+        args += ["-c:a", "copy"]
+    else:
+        # apad + -t: short narration is padded with silence, long narration is cut at the last frame
+        args += ["-c:a", "aac", "-b:a", "128k", "-af", "apad"]
+    args += ["-t", f"{clip_duration:.3f}", "-movflags", "+faststart", output_path]
+
+    _run(args, duration=clip_duration)
+    return output_path
+
+
+def split_audio(input_path: str, segments) -> list:
+    """Cut (start, end, output_path) segments out of one audio file by stream copy, in one ffmpeg call.
+
+    end may be None for "until the end". Cuts land on the nearest codec frame.
+    """
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-i", input_path]
+    for start, end, output_path in segments:
+        args += ["-map", "0:a:0", "-ss", f"{start:.3f}"]
+        if end is not None:
+            args += ["-to", f"{end:.3f}"]
+        args += ["-c", "copy", output_path]
+
+    _run(args)
+    return [output_path for _, _, output_path in segments]
+
+
+def transcode_video(input_path: str, output_path: str, height: int = None, video_bitrate: str = None,
+                    audio_bitrate: str = "128k", crf: int = 23) -> str:
+    """Re-encode a clip to H.264/AAC, optionally scaled to a height and capped at a bitrate."""
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    info = probe_media(input_path)
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-i", input_path, "-map", "0:v:0"]
+    if info["audio"]:
+        args += ["-map", "0:a:0", "-c:a", "aac", "-b:a", audio_bitrate]
+    if height:
+        args += ["-vf", f"scale=-2:{height}"]
+    args += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-crf", str(crf)]
+    if video_bitrate:
+        args += ["-maxrate", video_bitrate, "-bufsize", video_bitrate]
+    # Encode under a temporary name so a half-written file is never picked up by readers
+    base, ext = os.path.splitext(output_path)
+    partial_path = f"{base}.{os.getpid()}.part{ext}"
+    args += ["-movflags", "+faststart", partial_path]
+
+    try:
+        _run(args, duration=info["duration"])
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return output_path
+
+
+def extract_thumbnail(video_path: str, output_path: str, at_seconds: float = 1.0, width: int = 480) -> str:
+    """Grab a single JPEG frame from a clip."""
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    _run([
+        FFMPEG_PATH, "-y", "-v", "error", "-ss", str(at_seconds), "-i", video_path,
+        "-frames:v", "1", "-vf", f"scale={width}:-2", "-q:v", "3", output_path
+    ])
+    _report_progress(1.0)
+    return output_path
+
+
+def build_preview_clip(image_path: str, audio_path: str, output_path: str, default_seconds: float = 6.0,
+                       width: int = 832, height: int = 480, fps: int = 25) -> str:
+    """Ken Burns-style stand-in clip from a still image and optional narration (CPU only, no network).
+
+    The clip lasts as long as the narration (default_seconds without audio) and slowly
+    zooms into the centre of the image.
+    """
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    has_audio = bool(audio_path and os.path.exists(audio_path))
+    duration = probe_media(audio_path)["duration"] if has_audio else default_seconds
+    frames = max(1, int(duration * fps))
+
+    # Upscale first so the zoom doesn't jitter on integer crop offsets
+    video_filter = (
+        f"scale={width * 2}:{height * 2}:force_original_aspect_ratio=increase,crop={width * 2}:{height * 2},"
+        f"zoompan=z='min(zoom+{0.25 / frames:.6f},1.25)':d={frames}:"
+        f"x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={width}x{height}:fps={fps},format=yuv420p"
+    )
+
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-loop", "1", "-framerate", str(fps), "-i", image_path]
+    if has_audio:
+        args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:a", "aac", "-b:a", "96k"]
+    args += [
+        "-vf", video_filter, "-t", f"{duration:.3f}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage", "-crf", "28",
+        "-movflags", "+faststart", output_path
+    ]
+
+    _run(args, duration=duration)
+    return output_path
+
+
+def package_hls(input_path: str, output_dir: str, ladder, segment_seconds: int = 4) -> str:
+    """Encode an adaptive HLS ladder (one variant per ladder rung) and return the master playlist path.
+
+    ladder is a list of {"name", "height", "video_bitrate"} dicts.
+    """
+    if not FFMPEG_AVAILABLE:
+        raise RuntimeError("ffmpeg/ffprobe not found on PATH.")
+
+    info = probe_media(input_path)
+    has_audio = bool(info["audio"])
+    os.makedirs(output_dir, exist_ok=True)
+
+    count = len(ladder)
+    split = f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))
+    scales = [f"[s{i}]scale=-2:{rung['height']}[v{i}]" for i, rung in enumerate(ladder)]
+
+    args = [FFMPEG_PATH, "-y", "-v", "error", "-i", input_path, "-filter_complex", ";".join([split] + scales)]
+    stream_map = []
+    for i, rung in enumerate(ladder):
+        args += [
+            "-map", f"[v{i}]", f"-c:v:{i}", "libx264", f"-b:v:{i}", rung["video_bitrate"],
+            f"-maxrate:v:{i}", rung["video_bitrate"], f"-bufsize:v:{i}", rung["video_bitrate"],
+        ]
+        stream_map.append(f"v:{i},a:{i},name:{rung['name']}" if has_audio else f"v:{i},name:{rung['name']}")
+    if has_audio:
+        for i in range(count):
+            args += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", "128k"]
+
+    # One keyframe per segment at the source frame rate, so every segment starts on a GOP
+    gop = max(1, round(segment_seconds * frame_rate(info)))
+    args += [
+        "-preset", "veryfast", "-pix_fmt", "yuv420p", "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(output_dir, "%v", "segment_%03d.ts"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(output_dir, "%v", "index.m3u8"),
+    ]
+
+    _run(args, duration=info["duration"])
+    return os.path.join(output_dir, "master.m3u8")
+
+
+# --- MoviePy fallbacks (full decode + re-encode) for machines without ffmpeg/ffprobe ---
+
+def mux_audio_moviepy(video_path: str, audio_path: str, output_path: str) -> str:
+    v = VideoFileClip(video_path)
+    a = AudioFileClip(audio_path)
+    v = v.set_audio(a)
+    v.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
+    v.close()
+    a.close()
+    return output_path
+
+
+def concat_videos_moviepy(video_paths, output_path: str) -> str:
+    clips = [VideoFileClip(path) for path in video_paths]
+    final_clip = concatenate_videoclips(clips, method="compose")
+    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", logger=None)
+    [c.close() for c in clips]
+    final_clip.close()
+    return output_path
@@ -0,0 +1,294 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config import MEDIA_WORKER_PROCESSES, MEDIA_TASK_TIMEOUT_SECONDS
+from . import media
+
+# Task name -> function in utils.media executed inside a worker process
+MEDIA_TASKS = {
+    "mux": media.mux_audio,
+    "concat": media.concat_videos,
+    "transcode": media.transcode_video,
+    "thumbnail": media.extract_thumbnail,
+    "preview": media.build_preview_clip,
+    "hls": media.package_hls,
+    "mux_moviepy": media.mux_audio_moviepy,
+    "concat_moviepy": media.concat_videos_moviepy,
+}
+
+_executor = None
+_progress_queue = None
+_executor_lock = threading.Lock()
+
+# moviepy encodes run in-process and cannot be interrupted; when one is still running this
+# long after its own deadline its worker process is killed. ffmpeg tasks are bounded by
+# killing ffmpeg itself (see media._run) and are only given up on, never killed.
+_UNINTERRUPTIBLE_TASKS = {"mux_moviepy", "concat_moviepy"}
+_DEADLINE_GRACE_SECONDS = 5
+# Killing a worker breaks the whole pool; the other jobs in flight are resubmitted this often
+_MAX_REQUEUES = 2
+# How often the progress thread checks running jobs against their deadlines
+_WATCHDOG_INTERVAL_SECONDS = 1.0
+
+# Jobs still running in this process, keyed by job id
+_jobs = {}
+
+
+class MediaJob:
+    """Handle for a task running in the media worker pool."""
+
+    def __init__(self, job_id, kind, args, kwargs, timeout, progress_callback=None):
+        self.id = job_id
+        self.kind = kind
+        self.args = args
+        self.kwargs = kwargs
+        # Resolved by this process; survives the job being resubmitted to a fresh pool
+        self.future = Future()
+        self.timeout = timeout
+        self.progress = 0.0
+        self.message = "queued"
+        self.progress_callback = progress_callback
+        self.submitted_at = time.monotonic()
+        # Set from the worker's first progress event
+        self.started_at = None
+        self.pid = None
+        self.timed_out = False
+        self.requeues = 0
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout=None) -> bool:
+        """Block until the task finishes or timeout seconds pass; True when it has finished."""
+        return bool(wait([self.future], timeout=timeout).done)
+
+    def result(self, timeout=None):
+        """Wait for the task and return its result (re-raises worker errors, incl. TimeoutError).
+
+        Every task is bounded by its own deadline, so this returns or raises TimeoutError at
+        most timeout + a short grace after the task starts.
+        """
+        return self.future.result(timeout=timeout)
+
+    def _overdue(self, now) -> bool:
+        return (
+            bool(self.timeout) and self.started_at is not None and not self.future.done()
+            and now > self.started_at + self.timeout + _DEADLINE_GRACE_SECONDS
+        )
+
+    def _settle(self, result=None, exception=None):
+        """Resolve the job's future once; later outcomes (e.g. after a timeout) are dropped."""
+        try:
+            if exception is not None:
+                self.future.set_exception(exception)
+            else:
+                self.future.set_result(result)
+        except InvalidStateError:
+            pass
+        _jobs.pop(self.id, None)
+
+    def _update(self, fraction, message):
+        self.progress = fraction
+        if message:
+            self.message = message
+        if self.progress_callback:
+            try:
+                self.progress_callback(fraction, self.message)
+            except Exception as e:
+                print(f"[WARN] Media progress callback failed: {e}")
+
+
+def _init_worker(progress_queue):
+    """Runs once in every worker process."""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_task(job_id, kind, args, kwargs, timeout):
+    """Entry point inside the worker: run one media task with its deadline and progress hook."""
+    pid = os.getpid()
+
+    def report(fraction, message=""):
+        _progress_queue.put((job_id, fraction, message, pid))
+
+    deadline = time.monotonic() + timeout if timeout else None
+    media.set_task_context(progress_reporter=report, deadline=deadline)
+    report(0.0, "running")
+    try:
+        return MEDIA_TASKS[kind](*args, **kwargs)
+    finally:
+        media.set_task_context()
+
+
+def _enforce_deadlines():
+    """Fail every job past its deadline; only an uninterruptible one has its worker killed."""
+    now = time.monotonic()
+    for job in list(_jobs.values()):
+        if job.timed_out or not job._overdue(now):
+            continue
+        job.timed_out = True
+        job.message = "timed out"
+        if job.kind in _UNINTERRUPTIBLE_TASKS and job.pid is not None:
+            # The pool breaks; _attempt_done requeues the other jobs that were in flight
+            print(f"[WARN] Media task '{job.kind}' exceeded its {job.timeout}s limit; killing worker {job.pid}")
+            try:
+                os.kill(job.pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            except OSError:
+                pass
+        else:
+            print(f"[WARN] Media task '{job.kind}' exceeded its {job.timeout}s limit; giving up on it")
+            job._settle(exception=TimeoutError(f"Media task '{job.kind}' exceeded its {job.timeout}s time limit."))
+
+
+def _dispatch_progress():
+    """Forward progress events from worker processes to job callbacks and enforce deadlines."""
+    while True:
+        try:
+            event = _progress_queue.get(timeout=_WATCHDOG_INTERVAL_SECONDS)
+        except queue.Empty:
+            _enforce_deadlines()
+            continue
+        except (EOFError, OSError):
+            return
+        job_id, fraction, message, pid = event
+        if job_id is None:
+            return
+        job = _jobs.get(job_id)
+        if job is not None:
+            if job.started_at is None:
+                job.started_at = time.monotonic()
+                job.pid = pid
+            job._update(fraction, message)
+        _enforce_deadlines()
+
+
+def _get_executor():
+    global _executor, _progress_queue
+    with _executor_lock:
+        if _executor is not None and getattr(_executor, "_broken", False):
+            # A worker was killed (deadline overrun or crash): start a fresh pool
+            _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(
+                max_workers=MEDIA_WORKER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(_progress_queue,),
+            )
+            print("🛠️ Media worker pool restarted")
+        if _executor is None:
+            # spawn: the Streamlit process is multi-threaded, forking it is not safe
+            context = multiprocessing.get_context("spawn")
+            _progress_queue = context.Queue()
+            _executor = ProcessPoolExecutor(
+                max_workers=MEDIA_WORKER_PROCESSES,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(_progress_queue,),
+            )
+            threading.Thread(target=_dispatch_progress, name="media-progress", daemon=True).start()
+            print(f"🛠️ Media worker pool started with {MEDIA_WORKER_PROCESSES} processes")
+        return _executor
+
+
+def _submit_attempt(job):
+    """Send a job to the pool (a fresh one if the current pool broke)."""
+    job.started_at = None
+    job.pid = None
+    for attempt in range(2):
+        try:
+            future = _get_executor().submit(_run_task, job.id, job.kind, job.args, job.kwargs, job.timeout)
+            break
+        except BrokenProcessPool:
+            # Broke between _get_executor and submit; the next call replaces it
+            if attempt:
+                raise
+    future.add_done_callback(lambda f: _attempt_done(job, f))
+
+
+def _requeue(job):
+    try:
+        _submit_attempt(job)
+    except Exception as e:
+        job.message = "failed"
+        job._settle(exception=e)
+
+
+def _attempt_done(job, f):
+    if job.future.done():
+        # Already given up on after its deadline
+        return
+    if f.cancelled():
+        job.message = "failed"
+        job.future.cancel()
+        _jobs.pop(job.id, None)
+        return
+
+    error = f.exception()
+    if error is None:
+        job._update(1.0, "done")
+        job._settle(f.result())
+    elif job.timed_out:
+        job._settle(exception=TimeoutError(f"Media task '{job.kind}' exceeded its {job.timeout}s time limit."))
+    elif isinstance(error, BrokenProcessPool) and job.requeues < _MAX_REQUEUES:
+        # Another job's worker was killed (or crashed); run this one again on a fresh pool.
+        # Not from this callback: it may run on the broken pool's management thread.
+        job.requeues += 1
+        job.message = "requeued"
+        threading.Thread(target=_requeue, args=(job,), name="media-requeue", daemon=True).start()
+    else:
+        job.message = "failed"
+        job._settle(exception=error)
+
+
+def submit_media_task(kind, *args, timeout=None, progress_callback=None, **kwargs) -> MediaJob:
+    """Queue a mux / concat / transcode / thumbnail / preview task and return its MediaJob.
+
+    timeout is the task's own time limit in seconds (default MEDIA_TASK_TIMEOUT_SECONDS);
+    the worker kills ffmpeg when it runs out. A task that still has not finished shortly
+    after fails with TimeoutError; if it is an in-process moviepy encode its worker is
+    killed too, and the other tasks that were in the pool at that moment are resubmitted.
+    progress_callback(fraction, message) is called from a background thread in this process.
+    """
+    if kind not in MEDIA_TASKS:
+        raise ValueError(f"Unknown media task '{kind}'. Expected one of: {', '.join(MEDIA_TASKS)}")
+
+    timeout = MEDIA_TASK_TIMEOUT_SECONDS if timeout is None else timeout
+
+    # Register before submitting so early progress events find the job
+    job = MediaJob(uuid.uuid4().hex, kind, args, kwargs, timeout, progress_callback)
+    _jobs[job.id] = job
+    try:
+        _submit_attempt(job)
+    except Exception:
+        _jobs.pop(job.id, None)
+        raise
+    return job
+
+
+def run_media_task(kind, *args, timeout=None, progress_callback=None, **kwargs):
+    """Submit a task and block until it finishes."""
+    return submit_media_task(kind, *args, timeout=timeout, progress_callback=progress_callback, **kwargs).result()
+
+
+def shutdown_media_workers():
+    """Stop the worker pool (running tasks are allowed to finish)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+            try:
+                _progress_queue.put((None, 0.0, "", None))
+            except Exception:
+                pass
+
+
+atexit.register(shutdown_media_workers)
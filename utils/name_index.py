@@ -0,0 +1,230 @@
+import re
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Words in more than this share of names (e.g. "the", "temple", "of") don't identify a landmark
+STOPWORD_DOCUMENT_FREQUENCY = 0.05
+# Function words and epithets ("the great ...") dropped whatever the catalog; with fewer
+# than _MIN_NAMES_FOR_DF names, frequencies say little and only these are dropped
+_BASE_STOPWORDS = frozenset({"the", "of", "and", "a", "an", "el", "al", "great"})
+_MIN_NAMES_FOR_DF = 50
+# A query found whole inside a longer name scores this much at best
+CONTAINMENT_WEIGHT = 0.9
+# Candidates re-scored by edit distance / compared on their full names per lookup
+_EDIT_CANDIDATES = 16
+_TIEBREAK_CANDIDATES = 16
+
+
+def normalize_name(name) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    if not isinstance(name, str):
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def fold_word(word: str) -> str:
+    """Crude singular form, so "pyramids" and "pyramid" index the same."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _trigrams(text: str):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - Levenshtein distance / length of the longer string."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+class NameIndex:
+    """Character-trigram inverted index over landmark names.
+
+    Names are normalized and stripped of stopwords (words common to many names) before
+    indexing. A lookup first scores the names sharing a whole word with the query; only if
+    none is good enough does it gather candidates from the query's rarest trigrams, counting
+    exact trigram overlap by binary search of the posting lists, and scores each candidate
+    by the best of trigram Jaccard, containment of the query in the name (weighted by
+    CONTAINMENT_WEIGHT) and, when nothing matches that way, edit similarity of the closest
+    few (catches typos).
+    Words are folded to a crude singular first. Query words found neither as a word nor
+    as any trigram of the index can't be matched and are ignored instead of lowering
+    every score.
+    Ties go to the name with the fewest words, function words aside, missing from the query
+    ("Luxor Museum" vs "Luxor Temple"), then to the earlier name in the catalog.
+    """
+
+    def __init__(self, names, stopwords=None):
+        self.names = []
+        self._cores = []
+        self._words = []
+        self._trigram_ids = {}
+        self._postings = defaultdict(list)
+        self._posting_arrays = {}
+        self._word_postings = defaultdict(list)
+        self._sizes = []
+        self._size_array = None
+        self.stopwords = frozenset(stopwords) if stopwords is not None else self._frequent_words(names)
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def _frequent_words(names):
+        if len(names) < _MIN_NAMES_FOR_DF:
+            return _BASE_STOPWORDS
+        document_frequency = Counter(
+            word for name in names for word in {fold_word(word) for word in normalize_name(name).split()}
+        )
+        cutoff = STOPWORD_DOCUMENT_FREQUENCY * len(names)
+        return _BASE_STOPWORDS | {word for word, count in document_frequency.items() if count > cutoff}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _split(self, normalized: str):
+        """(core, rest): folded words without stopwords (all of them if every word is one), and the others."""
+        words = [fold_word(word) for word in normalized.split()]
+        kept = [word for word in words if word not in self.stopwords]
+        if not kept:
+            return " ".join(words), ""
+        return " ".join(kept), " ".join(word for word in words if word in self.stopwords)
+
+    def _core(self, normalized: str) -> str:
+        return self._split(normalized)[0]
+
+    def core(self, name: str) -> str:
+        """Normalized, folded name without stopwords (all words if every word is a stopword)."""
+        return self._core(normalize_name(name))
+
+    def _known(self, word: str) -> bool:
+        """Whether a query word shares at least a trigram with the indexed names."""
+        return word in self._word_postings or any(gram in self._trigram_ids for gram in _trigrams(word))
+
+    def add(self, name: str) -> int:
+        """Index one more name; returns its id (position)."""
+        name_id = len(self.names)
+        core, rest = self._split(normalize_name(name))
+        self.names.append(name)
+        self._cores.append(core)
+        self._words.append(frozenset((core + " " + rest).split()) - _BASE_STOPWORDS)
+
+        grams = _trigrams(core)
+        for gram in grams:
+            gram_id = self._trigram_ids.setdefault(gram, len(self._trigram_ids))
+            self._postings[gram_id].append(name_id)
+            self._posting_arrays.pop(gram_id, None)
+        for word in set(core.split()):
+            self._word_postings[word].append(name_id)
+        self._sizes.append(len(grams))
+        self._size_array = None
+        return name_id
+
+    def _posting(self, gram_id):
+        array = self._posting_arrays.get(gram_id)
+        if array is None:
+            array = self._posting_arrays[gram_id] = np.array(self._postings[gram_id], dtype=np.int64)
+        return array
+
+    def _overlap_scores(self, candidates, gram_ids, query_size):
+        """Trigram scores and overlap counts of candidate ids against the query's trigrams."""
+        # Exact overlap by binary search of each posting list (sorted by construction)
+        overlap = np.zeros(len(candidates), dtype=np.int64)
+        for gram_id in gram_ids:
+            posting = self._posting(gram_id)
+            positions = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+            overlap += posting[positions] == candidates
+
+        if self._size_array is None:
+            self._size_array = np.asarray(self._sizes, dtype=np.int64)
+        sizes = self._size_array[candidates]
+        jaccard = overlap / (query_size + sizes - overlap)
+        containment = CONTAINMENT_WEIGHT * overlap / query_size
+        return np.maximum(jaccard, containment), overlap
+
+    def _score(self, gram_ids, query_size, bar):
+        """Candidates that can reach `bar`, with their trigram scores and overlap counts.
+
+        gram_ids must be sorted rarest first. A score >= bar needs `needed` shared trigrams,
+        so such names contain one of the len - needed + 1 rarest ones (prefix filtering).
+        """
+        needed = max(1, math.ceil(bar * query_size - 1e-9))
+        if needed > len(gram_ids):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, np.empty(0), empty
+        prefix = gram_ids[:len(gram_ids) - needed + 1]
+        candidates = np.unique(np.concatenate([self._posting(gram_id) for gram_id in prefix]))
+        return (candidates, *self._overlap_scores(candidates, gram_ids, query_size))
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.3):
+        """Ranked (name_id, name, score) candidates for a query, best first."""
+        core, rest = self._split(normalize_name(query))
+        words = core.split()
+        known = [word for word in words if self._known(word)]
+        if len(known) < len(words):
+            # A word no name shares anything with would only count against every candidate
+            core = " ".join(known)
+            rest = " ".join([rest] + [word for word in words if word not in known]).strip()
+        grams = _trigrams(core)
+        gram_ids = [self._trigram_ids[gram] for gram in grams if gram in self._trigram_ids]
+        if not gram_ids:
+            return []
+
+        # Names sharing a whole word with the query are few; when one of them is good enough
+        # the trigram posting lists never need to be merged
+        scores = np.empty(0)
+        word_postings = [self._word_postings[word] for word in set(core.split()) if word in self._word_postings]
+        if word_postings:
+            candidates = np.unique(np.concatenate([np.asarray(posting, dtype=np.int64) for posting in word_postings]))
+            scores, overlap = self._overlap_scores(candidates, gram_ids, len(grams))
+
+        gram_ids.sort(key=lambda gram_id: len(self._postings[gram_id]))
+        if not (scores >= min_score).any():
+            candidates, scores, overlap = self._score(gram_ids, len(grams), min_score)
+
+        # No trigram match: likely a typo, which breaks more trigrams than it costs in edit
+        # distance. Gather at half the bar and try edit similarity on the closest few.
+        if not (scores >= min_score).any():
+            candidates, scores, overlap = self._score(gram_ids, len(grams), 0.5 * min_score)
+            for i in np.argsort(-overlap, kind="stable")[:_EDIT_CANDIDATES]:
+                scores[i] = max(scores[i], edit_similarity(core, self._cores[candidates[i]]))
+
+        keep = np.flatnonzero(scores >= min_score)
+        if not len(keep):
+            return []
+        keep = keep[np.argsort(-scores[keep], kind="stable")[:_TIEBREAK_CANDIDATES + limit]]
+        query_words = set(core.split()) | set(rest.split())
+
+        def _extra_words(i):
+            return len(self._words[candidates[i]] - query_words)
+
+        ranked = sorted(keep, key=lambda i: (-scores[i], _extra_words(i), candidates[i]))[:limit]
+        return [(int(candidates[i]), self.names[candidates[i]], float(scores[i])) for i in ranked]
+
+
+_index_cache = {"df": None, "index": None}
+
+
+def get_name_index(landmarks_df) -> NameIndex:
+    """Name index for a catalog DataFrame (row positions as ids), built once per DataFrame object."""
+    if _index_cache["df"] is not landmarks_df:
+        _index_cache["index"] = NameIndex(landmarks_df["name"].fillna("").tolist())
+        _index_cache["df"] = landmarks_df
+    return _index_cache["index"]
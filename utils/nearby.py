@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from .spatial_index import get_landmark_index
+
+try:
+    from config import RECOMMENDATION_BACKEND
+    from .database import get_collections, CATEGORY_COLLATION
+    MONGODB_AVAILABLE = True
+except ImportError:
+    RECOMMENDATION_BACKEND = "memory"
+    MONGODB_AVAILABLE = False
+
+# Catalog snapshot helper columns stay internal
+_HELPER_COLUMNS = ["name_lower", "name_normalized", "landmark_id"]
+
+
+def _category_filter(category):
+    return bool(category) and category.lower() != "all"
+
+
+class NearbyBackend(ABC):
+    """Nearest-landmark queries over the catalog.
+
+    knn and within return catalog rows (without helper columns) plus distance_km,
+    nearest first. exclude_names are compared case-insensitively.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def knn(self, latitude: float, longitude: float, k: int, category: str = None, exclude_names=()) -> pd.DataFrame:
+        """The k nearest landmarks, optionally of one category."""
+
+    @abstractmethod
+    def within(self, latitude: float, longitude: float, radius_km: float, category: str = None, limit: int = None) -> pd.DataFrame:
+        """Landmarks within radius_km, optionally of one category and capped at limit."""
+
+
+class InProcessBackend(NearbyBackend):
+    """Grid index (utils.spatial_index) over a catalog DataFrame held in memory."""
+
+    name = "memory"
+
+    def __init__(self, landmarks_df: pd.DataFrame):
+        self.landmarks_df = landmarks_df
+        self.index = get_landmark_index(landmarks_df)
+
+    def _rows(self, indices, distances) -> pd.DataFrame:
+        rows = self.landmarks_df.iloc[indices].drop(columns=_HELPER_COLUMNS, errors="ignore")
+        rows["distance_km"] = distances
+        return rows
+
+    def knn(self, latitude, longitude, k, category=None, exclude_names=()):
+        exclude = ()
+        if exclude_names:
+            names = self.landmarks_df["name_lower"] if "name_lower" in self.landmarks_df else self.landmarks_df["name"].str.lower()
+            excluded = names.isin({name.lower() for name in exclude_names})
+            exclude = set(np.flatnonzero(excluded.to_numpy()).tolist())
+        indices, distances = self.index.knn(latitude, longitude, k, category=category, exclude=exclude)
+        return self._rows(indices, distances)
+
+    def within(self, latitude, longitude, radius_km, category=None, limit=None):
+        indices, distances = self.index.within(latitude, longitude, radius_km, category=category)
+        if limit is not None:
+            indices, distances = indices[:limit], distances[:limit]
+        return self._rows(indices, distances)
+
+
+def geo_near_pipeline(latitude, longitude, limit=None, max_distance_km=None, category=None, exclude_names=()):
+    """$geoNear aggregation over the landmarks' 2dsphere index; distances come back in km."""
+    query = {}
+    if _category_filter(category):
+        query["category"] = category
+    if exclude_names:
+        query["name"] = {"$nin": list(exclude_names)}
+
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [float(longitude), float(latitude)]},
+        "key": "location",
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,  # metres to km
+        "spherical": True,
+        "query": query,
+    }
+    if max_distance_km is not None:
+        geo_near["maxDistance"] = max_distance_km * 1000.0
+
+    pipeline = [{"$geoNear": geo_near}]
+    if limit is not None:
+        pipeline.append({"$limit": int(limit)})
+    pipeline.append({"$project": {"_id": 0, "location": 0}})
+    return pipeline
+
+
+class MongoBackend(NearbyBackend):
+    """$geoNear on the landmarks collection; filtering and sorting happen in MongoDB.
+
+    The name and category filters use the geo index's case-insensitive collation.
+    MongoDB measures distances on a 6378.1 km sphere, so they read ~0.1% longer than
+    the in-process backend's.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection=None):
+        self.collection = collection
+
+    def _collection(self):
+        if self.collection is not None:
+            return self.collection
+        landmarks_collection, videos_collection, db = get_collections()
+        return landmarks_collection
+
+    def _query(self, pipeline) -> pd.DataFrame:
+        collection = self._collection()
+        if collection is None:
+            raise RuntimeError("Failed to get landmarks collection")
+        docs = list(collection.aggregate(pipeline, collation=CATEGORY_COLLATION))
+        return pd.DataFrame(docs, columns=list(docs[0]) if docs else ["distance_km"])
+
+    def knn(self, latitude, longitude, k, category=None, exclude_names=()):
+        return self._query(geo_near_pipeline(latitude, longitude, limit=k, category=category, exclude_names=exclude_names))
+
+    def within(self, latitude, longitude, radius_km, category=None, limit=None):
+        return self._query(geo_near_pipeline(latitude, longitude, limit=limit, max_distance_km=radius_km, category=category))
+
+
+def get_nearby_backend(landmarks_df: pd.DataFrame, backend: str = None) -> NearbyBackend:
+    """The configured backend (RECOMMENDATION_BACKEND unless given); in process if MongoDB is unavailable."""
+    backend = (backend or RECOMMENDATION_BACKEND).lower()
+    if backend == MongoBackend.name and MONGODB_AVAILABLE:
+        return MongoBackend()
+    return InProcessBackend(landmarks_df)
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import NEIGHBOR_TABLE_K, NEIGHBOR_TABLE_DIR, CATALOG_VERSION_CHECK_SECONDS
+from .database import (
+    get_collections, get_catalog_version, get_neighbor_entry, get_neighbor_entries, save_neighbor_entries,
+    update_neighbor_positions, delete_neighbor_entries, get_neighbor_table_meta, set_neighbor_table_meta,
+)
+from .geo import coordinate_arrays, haversine_km
+from .spatial_index import LandmarkIndex
+
+# Above this share of changed landmarks an incremental rebuild costs as much as a full one
+_INCREMENTAL_MAX_CHANGED = 0.5
+_ALL = "all"
+
+
+def _category_key(category) -> str:
+    return category.lower() if isinstance(category, str) else ""
+
+
+def _landmark_record(doc: dict) -> dict:
+    return {key: value for key, value in doc.items() if key not in ("_id", "location")}
+
+
+# --- Build ---
+
+def _neighbor_lists(index, latitude, longitude, exclude, categories, k):
+    """(positions, distances) of the k nearest overall and per category."""
+    lists = {_ALL: index.knn(latitude, longitude, k, exclude=exclude)}
+    for category in categories:
+        lists[category] = index.knn(latitude, longitude, k, category=category, exclude=exclude)
+    return lists
+
+
+def _kth_distances(entries, ids, slot, k):
+    """k-th neighbour distance per landmark in one slot (inf if that list is short or missing)."""
+    kth = np.full(len(ids), np.inf)
+    for position, landmark_id in enumerate(ids):
+        entry = entries.get(landmark_id)
+        neighbors = entry["neighbors"].get(slot, []) if entry else []
+        if len(neighbors) >= k:
+            kth[position] = neighbors[k - 1]["distance_km"]
+    return kth
+
+
+def _dirty_positions(previous, ids, records, categories, k):
+    """Positions whose neighbour lists may differ from the stored ones, or None for a full rebuild.
+
+    A list changes when one of its members changed or was removed, or when a new or
+    moved landmark is now closer than the list's current k-th neighbour.
+    """
+    changed = [p for p, landmark_id in enumerate(ids)
+               if landmark_id not in previous or previous[landmark_id]["landmark"] != records[p]]
+    removed = set(previous) - set(ids)
+    if len(changed) + len(removed) > _INCREMENTAL_MAX_CHANGED * max(len(ids), 1):
+        return None
+
+    dirty = set(changed)
+    touched = {ids[p] for p in changed} | removed
+    position_of = {landmark_id: p for p, landmark_id in enumerate(ids)}
+    for landmark_id, entry in previous.items():
+        if landmark_id in position_of and any(
+            neighbor["landmark_id"] in touched for neighbors in entry["neighbors"].values() for neighbor in neighbors
+        ):
+            dirty.add(position_of[landmark_id])
+
+    if changed:
+        lat, lon, cos_lat = coordinate_arrays([r["latitude"] for r in records], [r["longitude"] for r in records])
+        kth = {_ALL: _kth_distances(previous, ids, _ALL, k)}
+        for p in changed:
+            category = _category_key(records[p].get("category"))
+            if category and category not in kth:
+                kth[category] = _kth_distances(previous, ids, category, k)
+            distances = haversine_km(records[p]["latitude"], records[p]["longitude"], lat, lon, cos_lat)
+            closer = distances <= kth[_ALL]
+            if category:
+                closer |= distances <= kth[category]
+            dirty.update(np.flatnonzero(closer).tolist())
+    return dirty
+
+
+def build_neighbor_table(full: bool = False, k: int = NEIGHBOR_TABLE_K, output_dir: str = NEIGHBOR_TABLE_DIR):
+    """Materialize every landmark's k nearest neighbours, overall and per category.
+
+    Entries go to MongoDB (one document per landmark) and to memory-mapped arrays in
+    output_dir. Unless full is set, only landmarks whose lists can have changed since the
+    stored table are recomputed. Returns build stats, or None if the catalog is unavailable.
+    """
+    started = time.perf_counter()
+    landmarks_collection, videos_collection, db = get_collections()
+    if landmarks_collection is None:
+        print("Database connection not established. Aborting neighbour table build.")
+        return None
+
+    version = get_catalog_version()
+    docs = list(landmarks_collection.find({}, {"location": 0}))
+    ids = [doc["_id"] for doc in docs]
+    records = [_landmark_record(doc) for doc in docs]
+    frame = pd.DataFrame(records)
+    categories = sorted({_category_key(r.get("category")) for r in records} - {""})
+
+    meta = get_neighbor_table_meta()
+    previous = {}
+    if not full and meta and meta.get("k") == k and meta.get("categories") == categories:
+        previous = {entry["_id"]: entry for entry in get_neighbor_entries()}
+    dirty = _dirty_positions(previous, ids, records, categories, k) if previous else None
+    if dirty is None:
+        dirty = range(len(ids))
+        previous = {}
+        delete_neighbor_entries()
+
+    index = LandmarkIndex.from_dataframe(frame) if records else None
+    same_name = {}
+    for position, record in enumerate(records):
+        same_name.setdefault(str(record.get("name", "")).lower(), []).append(position)
+
+    entries = []
+    for position in dirty:
+        record = records[position]
+        name_lower = str(record.get("name", "")).lower()
+        lists = _neighbor_lists(index, record["latitude"], record["longitude"], set(same_name[name_lower]), categories, k)
+        entries.append({
+            "_id": ids[position],
+            "position": position,
+            "name_lower": name_lower,
+            "landmark": record,
+            "neighbors": {
+                slot: [dict(records[j], landmark_id=ids[j], distance_km=float(d)) for j, d in zip(positions, distances)]
+                for slot, (positions, distances) in lists.items()
+            },
+        })
+
+    save_neighbor_entries(entries)
+    removed = set(previous) - set(ids)
+    if removed:
+        delete_neighbor_entries(removed)
+    # Removals shift catalog positions; get_neighbor_entry picks same-name landmarks by position
+    recomputed = {entry["_id"] for entry in entries}
+    moved = {
+        landmark_id: position for position, landmark_id in enumerate(ids)
+        if landmark_id in previous and landmark_id not in recomputed and previous[landmark_id]["position"] != position
+    }
+    for landmark_id, position in moved.items():
+        previous[landmark_id]["position"] = position
+    update_neighbor_positions(moved)
+    set_neighbor_table_meta(version, k, categories)
+
+    current = {landmark_id: entry for landmark_id, entry in previous.items() if landmark_id not in removed}
+    current.update((entry["_id"], entry) for entry in entries)
+    write_local_table(output_dir, version, k, categories, ids, records, current)
+
+    stats = {
+        "landmarks": len(ids),
+        "recomputed": len(entries),
+        "removed": len(removed),
+        "catalog_version": version,
+        "seconds": time.perf_counter() - started,
+    }
+    print(f"Neighbour table v{version}: recomputed {len(entries)}/{len(ids)} landmarks in {stats['seconds']:.1f} s")
+    return stats
+
+
+def write_local_table(output_dir, version, k, categories, ids, records, entries):
+    """Write the table as memory-mapped (landmarks x slots x k) arrays plus a JSON sidecar.
+
+    Slot 0 is the overall list, then one slot per category; missing neighbours are -1.
+    The arrays get fresh file names and the sidecar is replaced last, so readers never
+    see a half-written table.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    slots = [_ALL] + list(categories)
+    position_of = {landmark_id: p for p, landmark_id in enumerate(ids)}
+    build = uuid.uuid4().hex[:12]
+    neighbors_file, distances_file = f"neighbors-{build}.npy", f"distances-{build}.npy"
+
+    neighbors = np.lib.format.open_memmap(os.path.join(output_dir, neighbors_file), mode="w+",
+                                          dtype=np.int32, shape=(len(ids), len(slots), k))
+    distances = np.lib.format.open_memmap(os.path.join(output_dir, distances_file), mode="w+",
+                                          dtype=np.float32, shape=(len(ids), len(slots), k))
+    neighbors[:] = -1
+    distances[:] = np.inf
+    for landmark_id, entry in entries.items():
+        row = position_of[landmark_id]
+        for slot, name in enumerate(slots):
+            for rank, neighbor in enumerate(entry["neighbors"].get(name, [])[:k]):
+                neighbors[row, slot, rank] = position_of[neighbor["landmark_id"]]
+                distances[row, slot, rank] = neighbor["distance_km"]
+    neighbors.flush()
+    distances.flush()
+    del neighbors, distances
+
+    first_row = {}
+    for position, record in enumerate(records):
+        first_row.setdefault(str(record.get("name", "")).lower(), position)
+    sidecar = {
+        "catalog_version": version,
+        "k": k,
+        "slots": slots,
+        "neighbors_file": neighbors_file,
+        "distances_file": distances_file,
+        "first_row": first_row,
+        "rows": records,
+    }
+    sidecar_path = os.path.join(output_dir, "neighbors.json")
+    with open(sidecar_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, default=str)
+    os.replace(sidecar_path + ".part", sidecar_path)
+
+    for name in os.listdir(output_dir):
+        if name.endswith(".npy") and name not in (neighbors_file, distances_file):
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except OSError:
+                pass  # still mapped by another process on some platforms
+
+
+# --- Lookup ---
+
+class LocalNeighborTable:
+    """Read-only view of a table written by write_local_table."""
+
+    def __init__(self, output_dir: str):
+        with open(os.path.join(output_dir, "neighbors.json"), encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.catalog_version = sidecar["catalog_version"]
+        self.k = sidecar["k"]
+        self.slots = {name: slot for slot, name in enumerate(sidecar["slots"])}
+        self.first_row = sidecar["first_row"]
+        self.rows = sidecar["rows"]
+        self.neighbors = np.load(os.path.join(output_dir, sidecar["neighbors_file"]), mmap_mode="r")
+        self.distances = np.load(os.path.join(output_dir, sidecar["distances_file"]), mmap_mode="r")
+
+    def lookup(self, name_lower: str, slot: str, top_n: int):
+        """(records, distances) or None if the landmark isn't in the table."""
+        row = self.first_row.get(name_lower)
+        if row is None:
+            return None
+        if slot not in self.slots:
+            return [], []
+        positions = self.neighbors[row, self.slots[slot], :top_n]
+        distances = self.distances[row, self.slots[slot], :top_n]
+        keep = positions >= 0
+        return [self.rows[p] for p in positions[keep]], distances[keep].astype(np.float64).tolist()
+
+
+_local = {"mtime": None, "table": None}
+_mongo_meta = {"meta": None, "checked_at": 0.0}
+
+
+def _local_table(output_dir=NEIGHBOR_TABLE_DIR):
+    try:
+        mtime = os.stat(os.path.join(output_dir, "neighbors.json")).st_mtime_ns
+    except OSError:
+        return None
+    if _local["mtime"] != mtime:
+        try:
+            _local["table"] = LocalNeighborTable(output_dir)
+        except Exception as e:
+            print(f"Error loading local neighbour table: {e}")
+            _local["table"] = None
+        _local["mtime"] = mtime
+    return _local["table"]
+
+
+def _mongo_table_meta(catalog_version):
+    """Stored table metadata; while it lags the catalog, re-read at most every CATALOG_VERSION_CHECK_SECONDS."""
+    meta = _mongo_meta["meta"]
+    now = time.time()
+    if (not meta or meta.get("catalog_version") != catalog_version) and now - _mongo_meta["checked_at"] >= CATALOG_VERSION_CHECK_SECONDS:
+        _mongo_meta["meta"] = get_neighbor_table_meta()
+        _mongo_meta["checked_at"] = now
+    return _mongo_meta["meta"]
+
+
+def lookup_neighbors(landmark_name: str, catalog_version, top_n: int, category: str = None):
+    """Precomputed recommendations as a DataFrame with distance_km, or None if the table can't answer.
+
+    The table answers only for the catalog version it was built from and for top_n <= K.
+    The local memory-mapped copy is tried first, then one indexed read from MongoDB.
+    """
+    if catalog_version is None:
+        return None
+    name_lower = landmark_name.strip().lower()
+    slot = neighbor_slot(category)
+
+    result = None
+    table = _local_table()
+    if table is not None and table.catalog_version == catalog_version and top_n <= table.k:
+        result = table.lookup(name_lower, slot, top_n)
+
+    if result is None:
+        meta = _mongo_table_meta(catalog_version)
+        if not meta or meta.get("catalog_version") != catalog_version or top_n > meta.get("k", 0):
+            return None
+        entry = get_neighbor_entry(name_lower)
+        if entry is None:
+            return None
+        result = entry_neighbors(entry, slot, top_n)
+
+    return recommendations_frame(*result)
+
+
+def neighbor_slot(category) -> str:
+    """Table slot holding the lists for a category filter ("all" when unfiltered)."""
+    return _category_key(category) if category and category.lower() != _ALL else _ALL
+
+
+def entry_neighbors(entry: dict, slot: str, top_n: int):
+    """(records, distances) of the first top_n neighbours in one slot of a stored entry."""
+    neighbors = entry["neighbors"].get(slot, [])[:top_n]
+    return (
+        [{key: value for key, value in n.items() if key not in ("landmark_id", "distance_km")} for n in neighbors],
+        [n["distance_km"] for n in neighbors],
+    )
+
+
+def recommendations_frame(records, distances) -> pd.DataFrame:
+    if not records:
+        return pd.DataFrame()
+    recommendations = pd.DataFrame(records)
+    recommendations["distance_km"] = distances
+    return recommendations
@@ -0,0 +1,156 @@
+import math
+import time
+import threading
+import datetime
+
+from config import (
+    POPULARITY_HALF_LIFE_HOURS,
+    VIDEO_CACHE_MAX_ENTRIES,
+    CACHE_WARM_TOP_K,
+    CACHE_WARM_VEO_BUDGET,
+    CACHE_WARM_REFRESH_DAYS,
+    CACHE_WARM_OFFPEAK_HOURS,
+    CACHE_ADMISSION_REFRESH_SECONDS,
+)
+from .database import record_popularity, get_popularity_docs, get_cached_video_keys, count_cached_videos
+
+HALF_LIFE_SECONDS = POPULARITY_HALF_LIFE_HOURS * 3600
+
+# Cached keys ordered least popular first, rebuilt every CACHE_ADMISSION_REFRESH_SECONDS.
+# Decay scales every score alike, so the order only drifts as cached keys get new requests.
+_eviction_order = {"keys": None, "at": 0.0}
+# Held from victim selection to removal so concurrent admissions never pick the same victim
+_eviction_lock = threading.Lock()
+# Lowest-ranked cached keys re-scored with fresh counts on each admission
+_EVICTION_CANDIDATES = 8
+
+
+def popularity_key(landmark_name: str, story_type: str) -> str:
+    return f"{landmark_name.lower()}::{story_type}"
+
+
+def record_request(landmark_name: str, story_type: str, prompt: str = ""):
+    """Count one request for a landmark/shot (hit or miss)."""
+    record_popularity(popularity_key(landmark_name, story_type), landmark_name, story_type, prompt, HALF_LIFE_SECONDS)
+
+
+def _current_score(doc, now=None) -> float:
+    """Stored score decayed to now (scores only decay when written)."""
+    now = now or datetime.datetime.utcnow()
+    age = (now - doc.get("updated_at", now)).total_seconds()
+    return doc.get("score", 0.0) * math.exp(-math.log(2) * age / HALF_LIFE_SECONDS)
+
+
+def get_top_popular(k: int = CACHE_WARM_TOP_K):
+    """Most requested landmark/shot keys by decayed request count."""
+    now = datetime.datetime.utcnow()
+    docs = get_popularity_docs()
+    for doc in docs:
+        doc["current_score"] = _current_score(doc, now)
+    docs.sort(key=lambda d: d["current_score"], reverse=True)
+    return docs[:k]
+
+
+def should_admit(landmark_name: str, story_type: str):
+    """TinyLFU-style admission for a freshly generated video.
+
+    While the cache has room everything is admitted. When full, the candidate must be
+    requested more often (decayed count) than the least popular cached video, which is
+    returned as the victim to evict. Returns (admit, victim_key_tuple_or_None).
+    """
+    if VIDEO_CACHE_MAX_ENTRIES <= 0:
+        return True, None
+
+    cached_count = count_cached_videos()
+    if cached_count is None or cached_count < VIDEO_CACHE_MAX_ENTRIES:
+        return True, None
+
+    with _eviction_lock:
+        candidates = _eviction_candidates()
+        if not candidates:
+            return True, None
+
+        candidate_key = popularity_key(landmark_name, story_type)
+        keys = {popularity_key(name, story): (name, story) for name, story in candidates}
+        now = datetime.datetime.utcnow()
+        scores = {doc["_id"]: _current_score(doc, now) for doc in get_popularity_docs(list(keys) + [candidate_key])}
+
+        victim_key = min(keys, key=lambda key: scores.get(key, 0.0))
+        admit = scores.get(candidate_key, 0.0) > scores.get(victim_key, 0.0)
+        if not admit:
+            return False, None
+        victim = keys[victim_key]
+        # Tolerate a victim that is already gone from the ranking
+        if victim in _eviction_order["keys"]:
+            _eviction_order["keys"].remove(victim)
+        return True, victim
+
+
+def _eviction_candidates():
+    """The least popular cached keys, from a ranking rescanned at most every CACHE_ADMISSION_REFRESH_SECONDS.
+
+    Caller holds _eviction_lock.
+    """
+    if _eviction_order["keys"] is None or time.time() - _eviction_order["at"] >= CACHE_ADMISSION_REFRESH_SECONDS:
+        cached_keys = get_cached_video_keys()
+        if cached_keys is None:
+            return []
+        now = datetime.datetime.utcnow()
+        keys = {popularity_key(name, story): (name, story) for name, story in cached_keys}
+        scores = {doc["_id"]: _current_score(doc, now) for doc in get_popularity_docs(list(keys))}
+        _eviction_order["keys"] = [keys[key] for key in sorted(keys, key=lambda key: scores.get(key, 0.0))]
+        _eviction_order["at"] = time.time()
+    return _eviction_order["keys"][:_EVICTION_CANDIDATES]
+
+
+def _in_offpeak_window(now=None) -> bool:
+    start, end = (int(hour) for hour in CACHE_WARM_OFFPEAK_HOURS.split("-"))
+    hour = (now or datetime.datetime.utcnow()).hour
+    return start <= hour <= end if start <= end else hour >= start or hour <= end
+
+
+def warm_popular_videos(top_k: int = CACHE_WARM_TOP_K, veo_budget: int = CACHE_WARM_VEO_BUDGET,
+                        refresh_days: int = CACHE_WARM_REFRESH_DAYS, ignore_window: bool = False):
+    """Pre-generate (or refresh stale) videos for the most popular keys, spending at most veo_budget Veo jobs."""
+    from .database import get_cached_video
+    from .video_generator import generate_or_get_cached_video
+
+    if not ignore_window and not _in_offpeak_window():
+        print(f"⏸️ Outside the off-peak window ({CACHE_WARM_OFFPEAK_HOURS} UTC); skipping cache warm-up.")
+        return {"generated": 0, "refreshed": 0, "already_cached": 0, "reused": 0}
+
+    # reused: served by the semantic cache or another worker, no Veo job spent
+    stats = {"generated": 0, "refreshed": 0, "already_cached": 0, "reused": 0}
+    refresh_before = datetime.datetime.utcnow() - datetime.timedelta(days=refresh_days)
+
+    for doc in get_top_popular(top_k):
+        if stats["generated"] + stats["refreshed"] >= veo_budget:
+            print("💸 Veo budget for this warm-up exhausted.")
+            break
+        if not doc.get("last_prompt"):
+            continue
+
+        cached = get_cached_video(doc["landmark_name"], doc["story_type"])
+        stale = cached is not None and cached.get("updated_at", cached.get("created_at", refresh_before)) < refresh_before
+        if cached and not stale:
+            stats["already_cached"] += 1
+            continue
+
+        try:
+            print(f"🔥 Warming {doc['landmark_name']} ({doc['story_type']}), score {doc['current_score']:.2f}")
+            _, was_cached = generate_or_get_cached_video(
+                landmark_name=doc["landmark_name"],
+                prompt=doc["last_prompt"],
+                story_type=doc["story_type"],
+                force_regenerate=stale,
+                track_request=False,
+            )
+            if was_cached:
+                stats["reused"] += 1
+            else:
+                stats["refreshed" if stale else "generated"] += 1
+        except Exception as e:
+            print(f"❌ Warm-up failed for {doc['landmark_name']} ({doc['story_type']}): {e}")
+
+    print(f"Cache warm-up finished: {stats}")
+    return stats
@@ -1,142 +1,135 @@
+import asyncio
 import pandas as pd
-from haversine import haversine, Unit
 import json
 import os
-from difflib import SequenceMatcher
+
+from .name_index import get_name_index
+from .nearby import get_nearby_backend, InProcessBackend
 
 # Import MongoDB - required for the system to work
 try:
     from .database import get_collections
+    from .landmark_catalog import get_catalog_snapshot
+    from .neighbor_table import lookup_neighbors, neighbor_slot, entry_neighbors, recommendations_frame
+    from . import async_database
     MONGODB_AVAILABLE = True
 except ImportError:
     MONGODB_AVAILABLE = False
     get_collections = None
+    lookup_neighbors = None
+    async_database = None
 
 def load_landmarks():
-    """Load landmarks from MongoDB - no fallback system."""
-    print("Loading landmarks from database...")
+    """Landmarks from MongoDB as the shared catalog snapshot - no fallback system.
 
+    The DataFrame is shared by every caller in the process; treat it as read-only.
+    """
     if not MONGODB_AVAILABLE or get_collections is None:
         print("MongoDB not available - cannot load landmarks")
         return pd.DataFrame()
 
-    try:
-        # Get collections
-        landmarks_collection, videos_collection, db = get_collections()
-
-        if landmarks_collection is None:
-            print("Failed to get landmarks collection")
-            return pd.DataFrame()
-
-        print("Fetching data from MongoDB...")
-        landmarks = list(landmarks_collection.find({}, {"_id": 0}))
-        print(f"Successfully loaded {len(landmarks)} landmarks from MongoDB")
-        return pd.DataFrame(landmarks)
-    except Exception as e:
-        print(f"Error loading landmarks: {e}")
-        print(f"   Error type: {type(e).__name__}")
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
         return pd.DataFrame()
+    return snapshot.frame
 
 def fuzzy_match_landmark(landmark_name: str, landmarks_df: pd.DataFrame, threshold: float = 0.6) -> pd.DataFrame:
-    """Find landmarks using fuzzy string matching for better accuracy with Arabic/English names."""
-    matches = []
-
-    for _, landmark in landmarks_df.iterrows():
-        landmark_name_db = landmark.get('name', '')
-
-        # Calculate similarity ratio
-        similarity = SequenceMatcher(None, landmark_name.lower(), landmark_name_db.lower()).ratio()
+    """Find the best landmark by trigram similarity (see utils.name_index); empty if below threshold."""
+    if landmarks_df.empty or not landmark_name:
+        return pd.DataFrame()
 
-        # Also check for partial matches within words
-        name_words = landmark_name.lower().split()
-        db_words = landmark_name_db.lower().split()
+    matches = get_name_index(landmarks_df).search(landmark_name, limit=1, min_score=threshold)
+    if matches:
+        # Return the best match
+        return landmarks_df.iloc[[matches[0][0]]]
 
-        max_partial_similarity = 0
-        for word1 in name_words:
-            for word2 in db_words:
-                partial_sim = SequenceMatcher(None, word1, word2).ratio()
-                max_partial_similarity = max(max_partial_similarity, partial_sim)
+    return pd.DataFrame()
 
-        # Use the better of full similarity or partial similarity
-        best_similarity = max(similarity, max_partial_similarity)
 
-        if best_similarity >= threshold:
-            matches.append((landmark, best_similarity))
+def lowercase_names(landmarks_df: pd.DataFrame) -> pd.Series:
+    """Lowercase names, precomputed on catalog snapshots."""
+    if "name_lower" in landmarks_df:
+        return landmarks_df["name_lower"]
+    return landmarks_df["name"].str.lower()
 
-    # Sort by similarity score (highest first)
-    matches.sort(key=lambda x: x[1], reverse=True)
 
-    if matches:
-        # Return the best match
-        return pd.DataFrame([matches[0][0]])
-
-    return pd.DataFrame()
+def _catalog_version(landmarks_df: pd.DataFrame):
+    """Catalog version of landmarks_df if it is the current catalog snapshot, else None."""
+    if not MONGODB_AVAILABLE:
+        return None
+    snapshot = get_catalog_snapshot()
+    if snapshot is None or snapshot.frame is not landmarks_df:
+        return None
+    return snapshot.version
 
 
 def get_recommendations(landmark_name: str, landmarks_df: pd.DataFrame, top_n: int = 5, category: str = None):
     """Get the top N closest landmarks based on a landmark name, with an optional category filter."""
 
-    # Clean and normalize the landmark name
-    cleaned_name = landmark_name.strip().lower()
-
-    # Try different variations of the name for better matching
-    name_variations = [
-        cleaned_name,
-        cleaned_name.replace('the ', ''),  # Remove "the" if present
-        cleaned_name.replace('great ', ''),  # Remove "great" if present
-        cleaned_name.replace('great pyramids of giza', 'pyramids of giza'),  # Special case for Giza
-        cleaned_name.replace('the great ', ''),  # Remove "the great" if present
-        cleaned_name.replace(' pyramids', ''),  # Remove "pyramids" for better matching
-        cleaned_name.replace(' temple', ''),  # Remove "temple" for better matching
-        cleaned_name.replace(' mosque', ''),  # Remove "mosque" for better matching
-    ]
-
-    # Find the landmark by name in the database (case-insensitive)
-    target_landmark = None
-
-    for variation in name_variations:
-        # Exact match first
-        target_landmark = landmarks_df[landmarks_df["name"].str.lower() == variation]
-        if not target_landmark.empty:
-            break
-
-        # Partial match (contains) - more flexible
-        target_landmark = landmarks_df[landmarks_df["name"].str.lower().str.contains(variation, na=False)]
-        if not target_landmark.empty:
-            break
-
-    # If no match found, try fuzzy matching
-    if target_landmark is None or target_landmark.empty:
+    # Exact (case-insensitive) name first, then the trigram index, which ignores words
+    # common to many names such as "the", "great" or "temple"
+    target_landmark = landmarks_df[lowercase_names(landmarks_df) == landmark_name.strip().lower()]
+    if target_landmark.empty:
         target_landmark = fuzzy_match_landmark(landmark_name, landmarks_df, threshold=0.6)
 
     if target_landmark is None or target_landmark.empty:
         return pd.DataFrame() # Return empty DataFrame if landmark not found
 
     target_landmark = target_landmark.iloc[0]
-    target_coords = (target_landmark["latitude"], target_landmark["longitude"])
 
-    # Make a copy to avoid modifying the original DataFrame
-    filtered_landmarks = landmarks_df.copy()
+    # Catalog landmarks: one read of the precomputed neighbour table (build_neighbors.py)
+    catalog_version = _catalog_version(landmarks_df)
+    if lookup_neighbors is not None and catalog_version is not None:
+        try:
+            recommendations = lookup_neighbors(target_landmark["name"], catalog_version, top_n, category)
+        except Exception as e:
+            print(f"Neighbour table lookup failed: {e}")
+            recommendations = None
+        if recommendations is not None:
+            return recommendations
 
-    # Remove the target landmark itself from recommendations
-    filtered_landmarks = filtered_landmarks[filtered_landmarks["name"].str.lower() != target_landmark["name"].lower()]
+    target_coords = (target_landmark["latitude"], target_landmark["longitude"])
 
-    # Filter by category if provided
-    if category and category.lower() != 'all':
-        # Case-insensitive filtering
-        filtered_landmarks = filtered_landmarks[filtered_landmarks['category'].str.lower() == category.lower()]
+    # Exclude the target itself; the backend handles the category filter
+    same_name = lowercase_names(landmarks_df) == target_landmark["name"].lower()
+    exclude_names = set(landmarks_df.loc[same_name, "name"])
 
-    if filtered_landmarks.empty:
+    backend = get_nearby_backend(landmarks_df)
+    try:
+        recommendations = backend.knn(target_coords[0], target_coords[1], top_n, category=category, exclude_names=exclude_names)
+    except Exception as e:
+        if isinstance(backend, InProcessBackend):
+            raise
+        print(f"{backend.name} recommendations failed, using the in-process index: {e}")
+        recommendations = InProcessBackend(landmarks_df).knn(
+            target_coords[0], target_coords[1], top_n, category=category, exclude_names=exclude_names
+        )
+
+    if recommendations.empty:
         return pd.DataFrame() # Return empty DataFrame if no landmarks match the category
 
-    # Calculate distances
-    distances = [
-        haversine(target_coords, (row["latitude"], row["longitude"]), unit=Unit.KILOMETERS)
-        for index, row in filtered_landmarks.iterrows()
-    ]
+    return recommendations
 
-    # Add distances to the DataFrame and sort
-    filtered_landmarks['distance_km'] = distances
-    recommendations = filtered_landmarks.sort_values(by="distance_km").head(top_n)
 
-    return recommendations
+async def get_recommendations_async(landmark_name: str, top_n: int = 5, category: str = None):
+    """Async get_recommendations for event-loop callers; reads MongoDB only, never blocks the loop.
+
+    Only exact names (any case) resolve, since fuzzy matching needs the in-memory catalog.
+    Answers from the neighbour table when it matches the catalog version, else by $geoNear.
+    """
+    if async_database is None:
+        return pd.DataFrame()
+
+    version, meta = await asyncio.gather(async_database.get_catalog_version(), async_database.get_neighbor_table_meta())
+    if meta and version is not None and meta.get("catalog_version") == version and top_n <= meta.get("k", 0):
+        entry = await async_database.get_neighbor_entry(landmark_name.strip().lower())
+        if entry is not None:
+            return recommendations_frame(*entry_neighbors(entry, neighbor_slot(category), top_n))
+
+    target = await async_database.find_landmark(landmark_name)
+    if target is None:
+        return pd.DataFrame()
+    nearby = await async_database.geo_near_landmarks(
+        target["latitude"], target["longitude"], limit=top_n, category=category, exclude_names=[target["name"]]
+    )
+    return pd.DataFrame(nearby)
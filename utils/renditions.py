@@ -0,0 +1,132 @@
+import os
+import threading
+
+from config import RENDITIONS_ENABLED, RENDITION_LADDER
+from .media import derived_path, probe_media
+from .media_worker import submit_media_task
+from .database import set_cached_video_renditions
+
+# Delivery metrics per rendition name ("original" for the untouched file)
+_delivery_stats = {}
+_stats_lock = threading.Lock()
+
+
+def rendition_path(video_path: str, name: str) -> str:
+    return derived_path(video_path, f"_{name}.mp4")
+
+
+def available_renditions(video_path: str) -> dict:
+    """Rendition name -> path for the renditions that exist on disk, plus the original."""
+    renditions = {
+        rung["name"]: rendition_path(video_path, rung["name"])
+        for rung in RENDITION_LADDER
+        if os.path.exists(rendition_path(video_path, rung["name"]))
+    }
+    renditions["original"] = video_path
+    return renditions
+
+
+def schedule_renditions(landmark_name: str, story_type: str, video_path: str):
+    """Transcode the ladder for a freshly cached clip in the media worker and record it when done.
+
+    Runs in the background; rungs taller than the source are skipped.
+    """
+    if not RENDITIONS_ENABLED:
+        return []
+
+    try:
+        source_height = (probe_media(video_path)["video"] or {}).get("height") or 0
+    except Exception as e:
+        print(f"[WARN] Cannot probe {video_path} for renditions: {e}")
+        return []
+
+    rungs = [rung for rung in RENDITION_LADDER if rung["height"] < source_height]
+    jobs = [
+        submit_media_task(
+            "transcode", video_path, rendition_path(video_path, rung["name"]),
+            height=rung["height"], video_bitrate=rung["video_bitrate"]
+        )
+        for rung in rungs
+    ]
+
+    remaining = [len(jobs)]
+    lock = threading.Lock()
+
+    def _record(_future):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        renditions = {name: path for name, path in available_renditions(video_path).items() if name != "original"}
+        set_cached_video_renditions(landmark_name, story_type, renditions)
+        print(f"📐 Renditions ready for {landmark_name} ({story_type}): {', '.join(renditions) or 'none'}")
+
+    for job in jobs:
+        job.future.add_done_callback(_record)
+    return jobs
+
+
+def schedule_hls(video_path: str, output_dir: str):
+    """Package a finished film as adaptive HLS (master.m3u8 plus one variant per ladder rung) in the background."""
+    if not RENDITIONS_ENABLED:
+        return None
+    return submit_media_task("hls", video_path, output_dir, RENDITION_LADDER)
+
+
+def pick_rendition(video_path: str, client_hints: dict = None):
+    """Choose a rendition from client hint headers (Save-Data, ECT, Downlink, Viewport-Width).
+
+    Returns (rendition name, path). Falls back to the original when no smaller rendition exists.
+    """
+    renditions = available_renditions(video_path)
+    hints = {k.lower(): v for k, v in (client_hints or {}).items()}
+
+    target_height = None
+    if hints.get("save-data", "").lower() == "on" or hints.get("ect") in ("slow-2g", "2g", "3g"):
+        target_height = 480
+    else:
+        try:
+            downlink = float(hints.get("downlink", ""))
+            target_height = 480 if downlink < 1.5 else 720 if downlink < 5 else None
+        except ValueError:
+            pass
+        try:
+            if int(hints.get("viewport-width", "")) <= 800:
+                target_height = min(target_height or 720, 480)
+        except ValueError:
+            pass
+
+    if target_height is not None:
+        candidates = [rung for rung in RENDITION_LADDER if rung["height"] <= target_height and rung["name"] in renditions]
+        if candidates:
+            name = max(candidates, key=lambda rung: rung["height"])["name"]
+            return name, renditions[name]
+    return "original", video_path
+
+
+def record_delivery(rendition: str, path: str, serve_seconds: float = None):
+    """Count a play of a rendition: bytes handed to the player and the server-side time to serve it.
+
+    serve_seconds covers picking the rendition and queueing it for the browser; the
+    player's own start-up and buffering happen client-side and aren't measured.
+    """
+    with _stats_lock:
+        stats = _delivery_stats.setdefault(rendition, {"plays": 0, "bytes_served": 0, "serve_total": 0.0, "serve_count": 0})
+        stats["plays"] += 1
+        stats["bytes_served"] += os.path.getsize(path) if os.path.exists(path) else 0
+        if serve_seconds is not None:
+            stats["serve_total"] += serve_seconds
+            stats["serve_count"] += 1
+
+
+def get_delivery_stats() -> dict:
+    """Plays, bytes served and mean server-side serve time (seconds) per rendition."""
+    with _stats_lock:
+        return {
+            name: {
+                "plays": stats["plays"],
+                "bytes_served": stats["bytes_served"],
+                "mean_serve_time": stats["serve_total"] / stats["serve_count"] if stats["serve_count"] else None,
+            }
+            for name, stats in _delivery_stats.items()
+        }
@@ -0,0 +1,264 @@
+import math
+import re
+import random
+import threading
+import zlib
+from collections import Counter, defaultdict, deque
+
+from config import SEMANTIC_CACHE_THRESHOLD
+from .database import get_cached_videos_for_landmark
+
+# Character n-gram sizes used for the prompt embedding
+NGRAM_SIZES = (3, 4, 5)
+
+# MinHash LSH parameters: BANDS * ROWS permutations. With 32 bands of 4 rows a pair
+# with Jaccard 0.5 lands in a shared bucket ~87% of the time, 0.7 ~99.9%.
+LSH_BANDS = 32
+LSH_ROWS = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Template lines every shot prompt shares, plus the "Shot N" fallback title and placeholder
+# description. Prompts are compared on what is left, so two shots only match on their content.
+_BOILERPLATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r"cinematic reenactment of [^.\n]*\.?",
+        r"include the landmark prominently in the frame\.?",
+        r"dynamic camera motion, realistic atmosphere, natural lighting\.?",
+        r"no visual description provided\.?",
+        r"\b(scene title|description|mood)\s*:",
+        r"\bshot\s*\d+\b",
+    )
+]
+
+# Prompts with less content than this after stripping the boilerplate are never matched
+MIN_CONTENT_CHARS = 24
+
+# Below this many prompts per landmark an exact scan is cheaper than LSH and never misses
+BRUTE_FORCE_LIMIT = 64
+
+_rng = random.Random(1337)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(LSH_BANDS * LSH_ROWS)
+]
+
+# Per-landmark indexes, built lazily from cached_videos
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+# Best similarity seen per lookup (None when nothing was cached yet), for threshold reports
+_lookup_similarities = deque(maxlen=10000)
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = re.sub(r"[^a-z0-9\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_content(prompt: str) -> str:
+    """The normalized prompt without shot boilerplate and numbering."""
+    for pattern in _BOILERPLATE_PATTERNS:
+        prompt = pattern.sub(" ", prompt)
+    return normalize_prompt(prompt)
+
+
+def story_kind(story_type: str) -> str:
+    """Story type without its shot number: shots may reuse each other's clips, not full videos'."""
+    return re.sub(r"_\d+$", "", story_type or "")
+
+
+def _char_ngrams(text: str):
+    padded = f" {text} "
+    grams = []
+    for n in NGRAM_SIZES:
+        grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def _minhash_signature(shingles):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    if not hashes:
+        return [0] * len(_PERMUTATIONS)
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _band_keys(signature):
+    return [
+        (band, tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
+        for band in range(LSH_BANDS)
+    ]
+
+
+class _PromptIndex:
+    """TF-IDF over character n-grams plus MinHash LSH buckets for one landmark.
+
+    Holds at most one entry per story type; removed entries leave a None slot so entry
+    ids in the buckets stay valid. add, remove and nearest take the index's own lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []                 # (normalized TF-IDF vector, video_doc) or None
+        self.doc_freq = Counter()
+        self.buckets = defaultdict(list)  # band key -> entry ids
+        self.by_story_type = {}           # story_type -> entry id
+
+    def __len__(self):
+        with self.lock:
+            return len(self.by_story_type)
+
+    def add(self, prompt: str, video_doc: dict):
+        """Index a cached video, replacing the entry of the same story type."""
+        with self.lock:
+            self._add(prompt, video_doc)
+
+    def _add(self, prompt: str, video_doc: dict):
+        self._remove(video_doc.get("story_type"))
+        content = prompt_content(prompt)
+        if len(content) < MIN_CONTENT_CHARS:
+            return
+        counts = Counter(_char_ngrams(content))
+        entry_id = len(self.entries)
+        self.doc_freq.update(counts.keys())
+        # Weighted with the document frequencies at insertion time; close enough as the index grows
+        self.entries.append((self._vector(counts), video_doc))
+        self.by_story_type[video_doc.get("story_type")] = entry_id
+        for key in _band_keys(_minhash_signature(counts.keys())):
+            self.buckets[key].append(entry_id)
+
+    def remove(self, story_type: str):
+        with self.lock:
+            self._remove(story_type)
+
+    def _remove(self, story_type: str):
+        entry_id = self.by_story_type.pop(story_type, None)
+        if entry_id is not None:
+            self.entries[entry_id] = None
+
+    def _vector(self, counts):
+        total_docs = len(self.entries) + 1
+        vector = {
+            gram: (1 + math.log(tf)) * (math.log((1 + total_docs) / (1 + self.doc_freq.get(gram, 0))) + 1)
+            for gram, tf in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {gram: w / norm for gram, w in vector.items()}
+
+    def _candidates(self, counts):
+        if len(self.entries) <= BRUTE_FORCE_LIMIT:
+            return range(len(self.entries))
+        ids = set()
+        for key in _band_keys(_minhash_signature(counts.keys())):
+            ids.update(self.buckets.get(key, ()))
+        return ids
+
+    def nearest(self, prompt: str, story_type: str = None):
+        """Return (video_doc, cosine similarity) of the closest cached prompt.
+
+        With story_type only entries of the same kind (shot or full video) are considered.
+        """
+        content = prompt_content(prompt)
+        if len(content) < MIN_CONTENT_CHARS:
+            return None, 0.0
+        counts = Counter(_char_ngrams(content))
+        kind = story_kind(story_type) if story_type is not None else None
+
+        best_doc, best_score = None, 0.0
+        with self.lock:
+            query = self._vector(counts)
+            for entry_id in self._candidates(counts):
+                entry = self.entries[entry_id]
+                if entry is None:
+                    continue
+                vector, video_doc = entry
+                if kind is not None and story_kind(video_doc.get("story_type")) != kind:
+                    continue
+                score = sum(w * vector.get(gram, 0.0) for gram, w in query.items())
+                if score > best_score:
+                    best_doc, best_score = video_doc, score
+        return best_doc, best_score
+
+
+def _get_index(landmark_name: str) -> _PromptIndex:
+    key = landmark_name.lower()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+        # Published before it is filled, locked until it is: concurrent adds and lookups
+        # wait for the Mongo read instead of racing it or building a second index
+        index = _indexes[key] = _PromptIndex()
+        index.lock.acquire()
+
+    try:
+        for video_doc in get_cached_videos_for_landmark(landmark_name):
+            prompt = video_doc.get("metadata", {}).get("prompt")
+            if prompt:
+                index._add(prompt, video_doc)
+    finally:
+        index.lock.release()
+    return index
+
+
+def find_similar_cached_video(landmark_name: str, prompt: str, story_type: str = None, threshold: float = None):
+    """Return (video_doc, similarity) for a near-duplicate cached prompt, or (None, best similarity).
+
+    Prompts are compared without the shot template and numbering, so a shot can reuse the
+    clip of another shot (or an earlier run) only when their titles and descriptions match.
+    With story_type, shots are only matched against shots and full videos against full videos.
+    """
+    threshold = SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+
+    try:
+        index = _get_index(landmark_name)
+        if not len(index):
+            _lookup_similarities.append(None)
+            return None, 0.0
+
+        video_doc, similarity = index.nearest(prompt, story_type)
+        _lookup_similarities.append(similarity)
+
+        if video_doc is not None and similarity >= threshold:
+            return video_doc, similarity
+        return None, similarity
+    except Exception as e:
+        print(f"Error in semantic cache lookup: {e}")
+        return None, 0.0
+
+
+def index_cached_video(landmark_name: str, prompt: str, video_doc: dict):
+    """Add a freshly cached video to the landmark's index, replacing an older one for its story type."""
+    with _indexes_lock:
+        index = _indexes.get(landmark_name.lower())
+    # Indexes not built yet will pick the video up from Mongo on first use
+    if index is not None:
+        index.add(prompt, video_doc)
+
+
+def remove_cached_video(landmark_name: str, story_type: str):
+    """Drop one evicted or expired video from the landmark's index."""
+    with _indexes_lock:
+        index = _indexes.get(landmark_name.lower())
+    if index is not None:
+        index.remove(story_type)
+
+
+def invalidate_semantic_cache(landmark_name: str = None):
+    """Drop the in-memory index for one landmark, or for all of them."""
+    with _indexes_lock:
+        if landmark_name:
+            _indexes.pop(landmark_name.lower(), None)
+        else:
+            _indexes.clear()
+
+
+def get_semantic_cache_report(thresholds=(0.7, 0.75, 0.8, 0.85, 0.9, 0.95)):
+    """Hit rate the recorded lookups would have had at each similarity threshold."""
+    lookups = list(_lookup_similarities)
+    total = len(lookups)
+    report = {"lookups": total, "active_threshold": SEMANTIC_CACHE_THRESHOLD, "hit_rate": {}}
+    for threshold in thresholds:
+        hits = sum(1 for s in lookups if s is not None and s >= threshold)
+        report["hit_rate"][threshold] = hits / total if total else 0.0
+    return report
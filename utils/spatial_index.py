@@ -0,0 +1,284 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_KM, haversine_km
+
+# Grid cell edge in degrees (~11 km north-south) when nothing is known about the data
+DEFAULT_CELL_DEGREES = 0.1
+# Bulk builds size cells for about this many points each
+_POINTS_PER_CELL = 8
+
+_KM_PER_DEGREE = math.pi / 180 * EARTH_RADIUS_KM
+
+
+class _CellGrid:
+    """Fixed-size lat/lon cells holding point ids, with coordinates in growable arrays.
+
+    Longitudes are not wrapped at the antimeridian; fine for a catalog that doesn't straddle it.
+    """
+
+    def __init__(self, cell_degrees: float):
+        self.cell_degrees = cell_degrees
+        self._cells = defaultdict(list)
+        self._cell_arrays = {}
+        self._bounds = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._lat = np.empty(0, dtype=np.float64)
+        self._lon = np.empty(0, dtype=np.float64)
+        self._cos_lat = np.empty(0, dtype=np.float64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self._lat), 64)
+        for name in ("_ids", "_lat", "_lon", "_cos_lat"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def insert(self, point_id: int, lat: float, lon: float):
+        if not (np.isfinite(lat) and np.isfinite(lon)):
+            return
+        if self._size == len(self._lat):
+            self._grow(self._size + 1)
+
+        slot = self._size
+        self._ids[slot] = point_id
+        self._lat[slot] = math.radians(lat)
+        self._lon[slot] = math.radians(lon)
+        self._cos_lat[slot] = math.cos(self._lat[slot])
+        self._size += 1
+
+        cell = self._cell(lat, lon)
+        self._cells[cell].append(slot)
+        self._cell_arrays.pop(cell, None)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            self._bounds = [min(self._bounds[0], cell[0]), max(self._bounds[1], cell[0]),
+                            min(self._bounds[2], cell[1]), max(self._bounds[3], cell[1])]
+
+    def extend(self, point_ids, latitudes, longitudes):
+        """Vectorized bulk insert."""
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        finite = np.isfinite(lat) & np.isfinite(lon)
+        point_ids = np.asarray(point_ids, dtype=np.int64)[finite]
+        lat, lon = lat[finite], lon[finite]
+        if not len(lat):
+            return
+        if self._size + len(lat) > len(self._lat):
+            self._grow(self._size + len(lat))
+
+        slots = np.arange(self._size, self._size + len(lat))
+        self._ids[slots] = point_ids
+        self._lat[slots] = np.radians(lat)
+        self._lon[slots] = np.radians(lon)
+        self._cos_lat[slots] = np.cos(self._lat[slots])
+        self._size += len(lat)
+
+        cy = np.floor(lat / self.cell_degrees).astype(np.int64)
+        cx = np.floor(lon / self.cell_degrees).astype(np.int64)
+        order = np.lexsort((cx, cy))
+        starts = np.flatnonzero(np.r_[True, (np.diff(cy[order]) != 0) | (np.diff(cx[order]) != 0)])
+        for group in np.split(order, starts[1:]):
+            cell = (int(cy[group[0]]), int(cx[group[0]]))
+            self._cells[cell].extend(slots[group].tolist())
+            self._cell_arrays.pop(cell, None)
+
+        bounds = [int(cy.min()), int(cy.max()), int(cx.min()), int(cx.max())]
+        if self._bounds is not None:
+            bounds = [min(self._bounds[0], bounds[0]), max(self._bounds[1], bounds[1]),
+                      min(self._bounds[2], bounds[2]), max(self._bounds[3], bounds[3])]
+        self._bounds = bounds
+
+    def _slots(self, cell):
+        slots = self._cell_arrays.get(cell)
+        if slots is None:
+            slots = self._cell_arrays[cell] = np.array(self._cells[cell], dtype=np.intp)
+        return slots
+
+    def _ring(self, center, radius):
+        """Cells at Chebyshev distance `radius` from center that hold points."""
+        cy, cx = center
+        if radius == 0:
+            cells = [center]
+        else:
+            cells = [(cy - radius, x) for x in range(cx - radius, cx + radius + 1)]
+            cells += [(cy + radius, x) for x in range(cx - radius, cx + radius + 1)]
+            cells += [(y, cx - radius) for y in range(cy - radius + 1, cy + radius)]
+            cells += [(y, cx + radius) for y in range(cy - radius + 1, cy + radius)]
+        return [cell for cell in cells if cell in self._cells]
+
+    def _distances(self, lat, lon, slots):
+        return haversine_km(lat, lon, self._lat[slots], self._lon[slots], self._cos_lat[slots])
+
+    def _ring_lower_bound_km(self, lat, radius):
+        """Smallest distance from the query to any cell beyond `radius` rings."""
+        edge_lat = min(abs(lat) + (radius + 1) * self.cell_degrees, 89.9)
+        return radius * self.cell_degrees * _KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+
+    def _max_ring(self, center):
+        lat_min, lat_max, lon_min, lon_max = self._bounds
+        return max(abs(center[0] - lat_min), abs(center[0] - lat_max),
+                   abs(center[1] - lon_min), abs(center[1] - lon_max))
+
+    def knn(self, lat: float, lon: float, k: int, exclude=()):
+        """Ids and distances (km) of the k nearest points, nearest first."""
+        if self._size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        center = self._cell(lat, lon)
+        max_ring = self._max_ring(center)
+        found_slots, found_dist = [], []
+        count, radius = 0, 0
+        while radius <= max_ring:
+            cells = self._ring(center, radius)
+            if cells:
+                slots = np.concatenate([self._slots(cell) for cell in cells])
+                found_slots.append(slots)
+                found_dist.append(self._distances(lat, lon, slots))
+                count += len(slots)
+            # Stop once the k-th best can't be beaten by anything in the next ring
+            if count >= k + len(exclude):
+                dist = np.concatenate(found_dist)
+                kth = np.partition(dist, k + len(exclude) - 1)[k + len(exclude) - 1]
+                if kth <= self._ring_lower_bound_km(lat, radius):
+                    break
+            radius += 1
+
+        if not found_slots:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        slots = np.concatenate(found_slots)
+        dist = np.concatenate(found_dist)
+        ids = self._ids[slots]
+        if exclude:
+            keep = ~np.isin(ids, list(exclude))
+            ids, dist = ids[keep], dist[keep]
+
+        order = np.argsort(dist, kind="stable")[:k]
+        return ids[order], dist[order]
+
+    def within(self, lat: float, lon: float, radius_km: float):
+        """Ids and distances (km) of every point within radius_km, nearest first."""
+        if self._size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        lat_span = radius_km / _KM_PER_DEGREE
+        lon_span = radius_km / (_KM_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + lat_span, 89.9))), 1e-6))
+        y0, x0 = self._cell(lat - lat_span, lon - lon_span)
+        y1, x1 = self._cell(lat + lat_span, lon + lon_span)
+        lat_min, lat_max, lon_min, lon_max = self._bounds
+        cells = [
+            (y, x)
+            for y in range(max(y0, lat_min), min(y1, lat_max) + 1)
+            for x in range(max(x0, lon_min), min(x1, lon_max) + 1)
+            if (y, x) in self._cells
+        ]
+        if not cells:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        slots = np.concatenate([self._slots(cell) for cell in cells])
+        dist = self._distances(lat, lon, slots)
+        keep = dist <= radius_km
+        slots, dist = slots[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return self._ids[slots[order]], dist[order]
+
+
+def _cell_size(latitudes, longitudes) -> float:
+    """Cell edge giving roughly _POINTS_PER_CELL points per occupied area."""
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    finite = np.isfinite(lat) & np.isfinite(lon)
+    if finite.sum() < 2:
+        return DEFAULT_CELL_DEGREES
+    area = max(np.ptp(lat[finite]), 0.01) * max(np.ptp(lon[finite]), 0.01)
+    return float(np.clip(math.sqrt(area * _POINTS_PER_CELL / finite.sum()), 0.01, 5.0))
+
+
+class LandmarkIndex:
+    """Grid index over landmark coordinates with one sub-index per category.
+
+    Ids are whatever the caller inserts (row positions for a catalog DataFrame).
+    """
+
+    def __init__(self, cell_degrees: float = DEFAULT_CELL_DEGREES, category_cell_degrees: dict = None):
+        self.cell_degrees = cell_degrees
+        self._category_cell_degrees = category_cell_degrees or {}
+        self._all = _CellGrid(cell_degrees)
+        self._by_category = {}
+
+    def __len__(self):
+        return len(self._all)
+
+    @classmethod
+    def from_dataframe(cls, landmarks_df):
+        """Bulk build; cell sizes follow the density of the whole catalog and of each category."""
+        lat = landmarks_df["latitude"].to_numpy(dtype=np.float64)
+        lon = landmarks_df["longitude"].to_numpy(dtype=np.float64)
+        if "category" in landmarks_df:
+            categories = landmarks_df["category"].astype(str).str.lower().to_numpy()
+        else:
+            categories = np.full(len(landmarks_df), "", dtype=object)
+
+        category_cells = {
+            category: _cell_size(lat[categories == category], lon[categories == category])
+            for category in set(categories) if category
+        }
+        index = cls(_cell_size(lat, lon), category_cells)
+        positions = np.arange(len(landmarks_df))
+        index._all.extend(positions, lat, lon)
+        for category, cell_degrees in category_cells.items():
+            members = categories == category
+            grid = index._by_category[category] = _CellGrid(cell_degrees)
+            grid.extend(positions[members], lat[members], lon[members])
+        return index
+
+    def insert(self, point_id: int, lat: float, lon: float, category: str = None):
+        """Add one landmark; the index stays queryable, no rebuild needed."""
+        self._all.insert(point_id, lat, lon)
+        if isinstance(category, str) and category:
+            category = category.lower()
+            if category not in self._by_category:
+                cell_degrees = self._category_cell_degrees.get(category, self.cell_degrees)
+                self._by_category[category] = _CellGrid(cell_degrees)
+            self._by_category[category].insert(point_id, lat, lon)
+
+    def _grid(self, category):
+        if category and category.lower() != "all":
+            return self._by_category.get(category.lower())
+        return self._all
+
+    def knn(self, lat: float, lon: float, k: int, category: str = None, exclude=()):
+        """k nearest landmark ids and their distances (km), optionally within one category."""
+        grid = self._grid(category)
+        if grid is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return grid.knn(lat, lon, k, exclude=exclude)
+
+    def within(self, lat: float, lon: float, radius_km: float, category: str = None):
+        """Landmark ids and distances (km) within radius_km, nearest first."""
+        grid = self._grid(category)
+        if grid is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return grid.within(lat, lon, radius_km)
+
+
+_index_cache = {"df": None, "index": None}
+
+
+def get_landmark_index(landmarks_df) -> LandmarkIndex:
+    """Index for a catalog DataFrame, built once per DataFrame object."""
+    if _index_cache["df"] is not landmarks_df:
+        _index_cache["index"] = LandmarkIndex.from_dataframe(landmarks_df)
+        _index_cache["df"] = landmarks_df
+    return _index_cache["index"]
@@ -0,0 +1,91 @@
+import os
+import hashlib
+import threading
+import unicodedata
+
+from config import NARRATION_VOICE, NARRATION_RATE, NARRATION_PITCH, TTS_CACHE_MAX_MB
+from .artifact_store import store_artifact, link_for_run, run_ref
+from .database import (
+    add_artifact_ref,
+    release_artifact_refs,
+    get_tts_entry,
+    save_tts_entry,
+    get_tts_cache_size,
+    get_least_recent_tts_entries,
+    delete_tts_entry,
+)
+
+# Edge TTS always streams this output format
+NARRATION_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_narration(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so cosmetic edits still hit the cache."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def tts_cache_key(text: str, voice: str = NARRATION_VOICE, rate: str = NARRATION_RATE,
+                  pitch: str = NARRATION_PITCH, audio_format: str = NARRATION_FORMAT) -> str:
+    parts = [normalize_narration(text), voice, rate, pitch, audio_format]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def tts_ref(key: str) -> str:
+    return f"tts:{key}"
+
+
+def _count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_cached_narration(key: str, run_id: str, name: str):
+    """Link a cached narration into the run and return its path, or None on a miss."""
+    entry = get_tts_entry(key)
+    if not entry or not os.path.exists(entry["path"]):
+        _count("misses")
+        return None
+
+    # The run holds its own reference so an LRU eviction can't pull the file from under it
+    add_artifact_ref(entry["sha256"], entry["path"], entry["size"], run_ref(run_id))
+    _count("hits")
+    return link_for_run(entry["path"], run_id, name)
+
+
+def cache_narration(key: str, audio_path: str, run_id: str, name: str, voice: str = NARRATION_VOICE) -> str:
+    """Store freshly synthesized narration in the cache and return its per-run path."""
+    sha256, object_file = store_artifact(audio_path, tts_ref(key))
+    size = os.path.getsize(object_file)
+    add_artifact_ref(sha256, object_file, size, run_ref(run_id))
+    save_tts_entry(key, sha256, object_file, size, voice)
+    enforce_tts_budget()
+    return link_for_run(object_file, run_id, name)
+
+
+def enforce_tts_budget(max_bytes: int = None):
+    """Evict least recently used narration until the cache fits its size budget."""
+    max_bytes = TTS_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    excess = get_tts_cache_size() - max_bytes
+    if excess <= 0:
+        return 0
+
+    evicted = 0
+    for entry in get_least_recent_tts_entries(limit=100):
+        if excess <= 0:
+            break
+        if delete_tts_entry(entry["_id"]):
+            # The artifact GC deletes the file once no run references it either
+            release_artifact_refs(tts_ref(entry["_id"]), sha256=entry.get("sha256"))
+            excess -= entry.get("size", 0)
+            evicted += 1
+    return evicted
+
+
+def get_tts_cache_stats() -> dict:
+    """Hits, misses and hit ratio of narration lookups in this process."""
+    with _stats_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_ratio": _stats["hits"] / lookups if lookups else 0.0}
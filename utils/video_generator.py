@@ -1,8 +1,63 @@
 import os
 import time
+import uuid
+import socket
+import datetime
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from google import genai
-from config import VEO_MODEL
-from .database import get_cached_video, save_cached_video, get_video_cache_stats
+from config import (
+    VEO_MODEL,
+    VIDEO_LEASE_TTL_SECONDS,
+    VIDEO_LEASE_POLL_SECONDS,
+    VIDEO_LEASE_RESULT_TTL_SECONDS,
+    SEMANTIC_CACHE_ENABLED,
+    VIDEO_CACHE_TTL_DAYS,
+    VIDEO_CACHE_TOUCH_SECONDS,
+    VIDEO_CACHE_STATS_TTL_SECONDS,
+    ARTIFACT_GC_GRACE_SECONDS,
+)
+from .database import (
+    get_cached_video,
+    touch_cached_video,
+    save_cached_video,
+    update_cached_video,
+    get_cached_video_keys,
+    get_video_cache_stats,
+    get_artifact_refs,
+    acquire_video_lease,
+    get_video_lease,
+    publish_video_lease,
+    release_video_lease,
+    release_artifact_refs,
+    add_artifact_ref,
+)
+from .artifact_store import store_artifact, run_ref
+from .popularity import record_request, should_admit
+from .semantic_cache import (
+    find_similar_cached_video,
+    index_cached_video,
+    remove_cached_video,
+    invalidate_semantic_cache,
+)
+from .renditions import schedule_renditions
+
+VIDEO_CACHE_TTL_SECONDS = VIDEO_CACHE_TTL_DAYS * 24 * 3600 or None
+
+# Sidebar stats, refreshed at most every VIDEO_CACHE_STATS_TTL_SECONDS
+_stats_cache = {"stats": None, "at": 0.0}
+
+# In-flight generations in this process, keyed by cache key
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Single-flight metrics
+_singleflight_stats = {
+    "generations_started": 0,
+    "coalesced_in_process": 0,
+    "coalesced_cross_process": 0,
+    "lease_takeovers": 0,
+}
 
 
 def generate_video_with_veo(
@@ -48,32 +103,40 @@ def generate_video_with_veo(
     return output_path
 
 
-# CACHING WRAPPER FUNCTION
-def generate_or_get_cached_video(
-    landmark_name: str,
-    prompt: str,
-    story_type: str = "default",
-    size: str = "832*480",
-    force_regenerate: bool = False
-):
+def _video_cache_key(landmark_name: str, story_type: str) -> str:
+    return f"{landmark_name.lower()}::{story_type}"
 
 
-    print(f"🔍 Checking cache for video: {landmark_name} ({story_type})")
+def _count(metric: str):
+    with _inflight_lock:
+        _singleflight_stats[metric] += 1
 
-    # Check cache first (unless forced regeneration)
-    if not force_regenerate:
-        cached_video = get_cached_video(landmark_name, story_type)
-        if cached_video:
-            print(f"✅ Found cached video for {landmark_name}")
-            return cached_video["video_path"], True
 
-    # Generate new video
+def get_singleflight_stats():
+    """Get counters for generations started vs. requests coalesced onto an existing job."""
+    with _inflight_lock:
+        return dict(_singleflight_stats)
+
+
+def _generate_and_cache(landmark_name, prompt, story_type, size, run_id=None, lease_owner=None):
+    """Run one Veo generation and store the result in the cache.
+
+    A clip refused by cache admission is referenced by run_id instead, so the session
+    that asked for it keeps it until the run expires, and published on the lease held by
+    lease_owner so requests waiting in other processes pick it up instead of generating.
+    """
     print(f"🎬 Generating new video for {landmark_name}")
-    output_path = f"temp_video_{int(time.time())}.mp4"
+    output_path = f"temp_video_{uuid.uuid4().hex}.mp4"
+    _count("generations_started")
 
     try:
         # Generate the video using Veo
-        video_path = generate_video_with_veo(prompt, output_path)
+        generate_video_with_veo(prompt, output_path)
+
+        # Move into the content-addressed store; the cache entry holds the reference
+        cache_ref = f"cached_video:{_video_cache_key(landmark_name, story_type)}"
+        previous = get_cached_video(landmark_name, story_type)
+        sha256, video_path = store_artifact(output_path, cache_ref)
 
         # Save to cache
         metadata = {
@@ -81,11 +144,48 @@ def generate_or_get_cached_video(
             "size": size,
             "landmark": landmark_name,
             "story_type": story_type,
-            "original_filename": os.path.basename(video_path)
+            "sha256": sha256,
+            "original_filename": os.path.basename(output_path)
         }
 
-        if save_cached_video(landmark_name, story_type, video_path, metadata):
+        # Admission: when the cache is full, one-off requests must not evict popular clips
+        admit, victim = (True, None) if previous else should_admit(landmark_name, story_type)
+        if not admit:
+            print(f"🚫 Not caching {landmark_name} ({story_type}): less popular than every cached video")
+            # Hand the clip to the run before dropping the cache ref; without a run it stays
+            # on disk for the artifact GC grace period
+            if run_id:
+                add_artifact_ref(sha256, video_path, os.path.getsize(video_path), run_ref(run_id))
+            if lease_owner:
+                publish_video_lease(
+                    _video_cache_key(landmark_name, story_type), lease_owner, video_path, sha256,
+                    VIDEO_LEASE_RESULT_TTL_SECONDS
+                )
+            release_artifact_refs(cache_ref, sha256=sha256)
+            return video_path, False
+        if victim:
+            print(f"♻️ Evicting less popular video {victim[0]} ({victim[1]})")
+            clear_video_cache(*victim)
+
+        if previous:
+            # Refresh: replace the entry instead of adding a second one for the same key
+            saved = update_cached_video(landmark_name, story_type, video_path, metadata, ttl_seconds=VIDEO_CACHE_TTL_SECONDS)
+            old_sha256 = previous.get("metadata", {}).get("sha256")
+            if saved and old_sha256 and old_sha256 != sha256:
+                release_artifact_refs(cache_ref, sha256=old_sha256)
+        else:
+            saved = save_cached_video(landmark_name, story_type, video_path, metadata, ttl_seconds=VIDEO_CACHE_TTL_SECONDS)
+            _stats_cache["stats"] = None
+
+        if saved:
             print(f"💾 Video cached successfully for {landmark_name}")
+            index_cached_video(landmark_name, prompt, {
+                "story_type": story_type,
+                "video_path": video_path,
+                "metadata": metadata
+            })
+            # Lower-bitrate renditions are transcoded in the background for slow connections
+            schedule_renditions(landmark_name, story_type, video_path)
         else:
             print(f"⚠️ Failed to cache video for {landmark_name}")
 
@@ -99,9 +199,163 @@ def generate_or_get_cached_video(
         raise
 
 
+def _take_published_video(lease, run_id=None):
+    """Video path published on a lease for a clip cache admission refused, if still on disk."""
+    if not lease or lease.get("status") != "done":
+        return None
+    video_path = lease.get("video_path")
+    if not video_path or not os.path.exists(video_path):
+        return None
+    # The publisher's run holds the clip; this run needs its own reference to keep it
+    if run_id and lease.get("sha256"):
+        add_artifact_ref(lease["sha256"], video_path, os.path.getsize(video_path), run_ref(run_id))
+    return video_path
+
+
+def _generate_with_lease(landmark_name, prompt, story_type, size, force_regenerate, run_id=None):
+    """Generate under a Mongo lease so other processes wait instead of starting a second Veo job."""
+    cache_key = _video_cache_key(landmark_name, story_type)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    waited = False
+    previous_lease = None
+
+    while True:
+        if acquire_video_lease(cache_key, owner, VIDEO_LEASE_TTL_SECONDS):
+            if previous_lease is not None:
+                _count("lease_takeovers")
+            try:
+                # Another process may have finished while we were waiting for the lease
+                if waited or not force_regenerate:
+                    cached_video = get_cached_video(landmark_name, story_type)
+                    if cached_video:
+                        return cached_video["video_path"], True
+                return _generate_and_cache(landmark_name, prompt, story_type, size, run_id, owner)
+            finally:
+                release_video_lease(cache_key, owner)
+
+        # A lease published for an uncached clip answers this request as well
+        previous_lease = get_video_lease(cache_key)
+        video_path = _take_published_video(previous_lease, run_id)
+        if video_path:
+            print(f"✅ Picked up uncached video generated by another worker for {landmark_name}")
+            return video_path, True
+
+        if not waited:
+            print(f"⏳ Video for {landmark_name} ({story_type}) is being generated elsewhere, waiting...")
+            _count("coalesced_cross_process")
+            waited = True
+
+        time.sleep(VIDEO_LEASE_POLL_SECONDS)
+
+        cached_video = get_cached_video(landmark_name, story_type)
+        if cached_video:
+            print(f"✅ Picked up video generated by another worker for {landmark_name}")
+            return cached_video["video_path"], True
+
+        # Lease gone without a result means the owner failed; loop and try to take over
+
+
+# CACHING WRAPPER FUNCTION
+def generate_or_get_cached_video(
+    landmark_name: str,
+    prompt: str,
+    story_type: str = "default",
+    size: str = "832*480",
+    force_regenerate: bool = False,
+    track_request: bool = True,
+    run_id: str = None
+):
+
+
+    print(f"🔍 Checking cache for video: {landmark_name} ({story_type})")
+
+    # Popularity feeds cache admission and the off-peak warmer (which passes track_request=False)
+    if track_request:
+        record_request(landmark_name, story_type, prompt)
+
+    # Check cache first (unless forced regeneration)
+    if not force_regenerate:
+        cached_video = get_cached_video(landmark_name, story_type)
+        if cached_video:
+            print(f"✅ Found cached video for {landmark_name}")
+            touch_cached_video(landmark_name, story_type, VIDEO_CACHE_TOUCH_SECONDS, VIDEO_CACHE_TTL_SECONDS)
+            return cached_video["video_path"], True
+
+        # Near-duplicate prompt for the same landmark (e.g. a reworded or repeated shot)
+        if SEMANTIC_CACHE_ENABLED:
+            similar_video, similarity = find_similar_cached_video(landmark_name, prompt, story_type)
+            if similar_video:
+                # The index may lag behind TTL expiry in Mongo; only serve what is still cached
+                current = get_cached_video(landmark_name, similar_video["story_type"])
+                if current and current["video_path"] == similar_video["video_path"] and os.path.exists(current["video_path"]):
+                    print(f"✅ Found similar cached video for {landmark_name} (similarity {similarity:.2f})")
+                    touch_cached_video(landmark_name, similar_video["story_type"], VIDEO_CACHE_TOUCH_SECONDS, VIDEO_CACHE_TTL_SECONDS)
+                    return current["video_path"], True
+                remove_cached_video(landmark_name, similar_video["story_type"])
+
+    # Single-flight: join a generation already running in this process
+    cache_key = _video_cache_key(landmark_name, story_type)
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[cache_key] = future
+        else:
+            _singleflight_stats["coalesced_in_process"] += 1
+
+    if not is_leader:
+        print(f"⏳ Joining in-flight generation for {landmark_name} ({story_type})")
+        try:
+            video_path, _ = future.result(timeout=VIDEO_LEASE_TTL_SECONDS)
+            return video_path, True
+        except FutureTimeoutError:
+            # The leader looks hung: its lease expires by now, so go through the lease and cache
+            print(f"⚠️ In-flight generation for {landmark_name} ({story_type}) is taking too long, retrying via lease")
+            return _generate_with_lease(landmark_name, prompt, story_type, size, False, run_id)
+
+    try:
+        result = _generate_with_lease(landmark_name, prompt, story_type, size, force_regenerate, run_id)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+
 def get_video_cache_info():
-    """Get information about the video cache."""
-    return get_video_cache_stats()
+    """Get information about the video cache (cached for VIDEO_CACHE_STATS_TTL_SECONDS)."""
+    now = time.time()
+    if _stats_cache["stats"] is None or now - _stats_cache["at"] >= VIDEO_CACHE_STATS_TTL_SECONDS:
+        _stats_cache["stats"] = get_video_cache_stats()
+        _stats_cache["at"] = now
+    return _stats_cache["stats"]
+
+
+def release_expired_video_refs(grace_seconds: int = ARTIFACT_GC_GRACE_SECONDS):
+    """Release the artifact references of cache entries MongoDB removed by TTL expiry.
+
+    A fresh clip is referenced before its cache entry is written, so only references
+    older than grace_seconds are considered. Does nothing when the cache entries can't
+    be read, so a failed read never releases the references of live entries.
+    """
+    referenced_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=grace_seconds)
+    refs = get_artifact_refs("cached_video:", referenced_before)
+    keys = get_cached_video_keys()
+    if not refs or keys is None:
+        return 0
+    live = {f"cached_video:{_video_cache_key(name, story_type)}" for name, story_type in keys}
+    expired = [(ref, sha256) for ref, sha256 in refs if ref not in live]
+    for ref, sha256 in expired:
+        release_artifact_refs(ref, sha256=sha256)
+        name, _, story_type = ref[len("cached_video:"):].partition("::")
+        remove_cached_video(name, story_type)
+    if expired:
+        _stats_cache["stats"] = None
+    return len(expired)
 
 
 def clear_video_cache(landmark_name: str = None, story_type: str = None):
@@ -112,6 +366,8 @@ def clear_video_cache(landmark_name: str = None, story_type: str = None):
         print("❌ Videos collection not available")
         return False
 
+    _stats_cache["stats"] = None
+
     try:
         if landmark_name and story_type:
             # Delete specific video
@@ -119,11 +375,21 @@ def clear_video_cache(landmark_name: str = None, story_type: str = None):
                 "landmark_name": landmark_name.lower(),
                 "story_type": story_type
             })
+            remove_cached_video(landmark_name, story_type)
+            # The stored file is removed by artifact GC once nothing else references it
+            release_artifact_refs(f"cached_video:{_video_cache_key(landmark_name, story_type)}")
             print(f"🗑️ Deleted cached video: {landmark_name} ({story_type})")
             return result.deleted_count > 0
         else:
             # Delete all videos
+            keys = [
+                _video_cache_key(doc["landmark_name"], doc["story_type"])
+                for doc in videos_collection.find({}, {"landmark_name": 1, "story_type": 1})
+            ]
             result = videos_collection.delete_many({})
+            invalidate_semantic_cache()
+            for key in keys:
+                release_artifact_refs(f"cached_video:{key}")
             print(f"🗑️ Cleared all cached videos ({result.deleted_count} videos)")
             return result.deleted_count > 0
 
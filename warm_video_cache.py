@@ -0,0 +1,23 @@
+import argparse
+
+from config import CACHE_WARM_TOP_K, CACHE_WARM_VEO_BUDGET, CACHE_WARM_REFRESH_DAYS
+from utils.database import connect_to_db
+from utils.popularity import warm_popular_videos, get_top_popular
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate videos for the most requested landmarks.")
+    parser.add_argument("--top-k", type=int, default=CACHE_WARM_TOP_K)
+    parser.add_argument("--budget", type=int, default=CACHE_WARM_VEO_BUDGET, help="Maximum Veo jobs to start")
+    parser.add_argument("--refresh-days", type=int, default=CACHE_WARM_REFRESH_DAYS)
+    parser.add_argument("--now", action="store_true", help="Run even outside the off-peak window")
+    parser.add_argument("--show", action="store_true", help="Only print the current top-K")
+    args = parser.parse_args()
+
+    connect_to_db()
+
+    if args.show:
+        for doc in get_top_popular(args.top_k):
+            print(f"{doc['current_score']:8.2f}  {doc['landmark_name']} ({doc['story_type']})")
+    else:
+        warm_popular_videos(top_k=args.top_k, veo_budget=args.budget, refresh_days=args.refresh_days, ignore_window=args.now)